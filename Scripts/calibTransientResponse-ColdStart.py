@@ -39,7 +39,7 @@ def store_setup(id_tag):
             new_name)
 
 poseList = Poses.from_file(r"C:\3DScanner\Scripts\Tests\poses15Tilt.csv")
-with DevConnection() as dago:
+with DevConnection(telemetry_interval=60) as dago:
     dago.wait_move = False
     dago.calibrate_position('3DScanner')
     dago.new_home()
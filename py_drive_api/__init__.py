@@ -1,7 +1,34 @@
-from .scan_platform import ScanPlatform
-from .poses import Poses
-from .ui_scripting import UI_Scripting as ui
-from .dev_connection import DevConnection
-from sys import base_prefix
-from os.path import join
-logs_dir = join(base_prefix, 'Lib', 'site-packages', 'py_drive_api')
\ No newline at end of file
+"""
+Scan platform and 3D Scan gui scripting.
+
+The names below are imported on first use (PEP 562), so a script only
+loads the backends it needs: ui doesn't load zaber_motion, Poses loads
+neither it nor pyautogui. Importing the package touches no files,
+logging is set up when a connection, platform or gui client is made.
+"""
+from importlib import import_module
+
+# public name: (module, attribute)
+_LAZY = {
+    'ScanPlatform': ('.scan_platform', 'ScanPlatform'),
+    'Poses': ('.poses', 'Poses'),
+    'ui': ('.ui_scripting', 'UI_Scripting'),
+    'DevConnection': ('.dev_connection', 'DevConnection'),
+    'logs_dir': ('.log_config', 'logs_dir'),
+    'configure_logging': ('.log_config', 'configure'),
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module, attribute = _LAZY[name]
+    value = getattr(import_module(module, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,96 @@
+"""
+When to save the project file while scanning.
+
+Saving a .3dscanprojzip rewrites the whole project, so saving after every
+scan costs more with each scan in the session. An AutosavePolicy lets
+UI_Scripting.Scan() coalesce saves: every N scans, every T seconds, and
+at campaign boundaries and exit, with UI_Scripting.flushAutosave() to
+force one.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AutosavePolicy():
+    """
+    Counts the scans added since the project was last saved and decides
+    when the next save is due. The save itself is done by UI_Scripting.
+
+    Parameters
+    ----------
+    every_scans : int, optional
+        save once this many scans are unsaved. 1 saves after every scan,
+        None never saves on count.
+    every_seconds : float, optional
+        save when a scan is added this long after the last save. checked
+        as scans are added, there is no timer thread.
+    on_boundaries : bool
+        flush unsaved scans before the project is cleared or saved to a
+        new path.
+    on_exit : bool
+        flush unsaved scans when the interpreter exits, including after
+        an unhandled exception.
+    clock : module or SimulationClock
+        time source for every_seconds.
+
+    Attributes
+    ----------
+    pending : int
+        scans added since the last save.
+    saves : int
+        saves done under this policy.
+    """
+    def __init__(self, every_scans=1, every_seconds=None, on_boundaries=True, on_exit=True, clock=time):
+        if every_scans is not None and every_scans < 1:
+            raise ValueError(f'every_scans must be at least 1, got {every_scans}.')
+        self.every_scans = every_scans
+        self.every_seconds = every_seconds
+        self.on_boundaries = on_boundaries
+        self.on_exit = on_exit
+        self.clock = clock
+        self.pending = 0
+        self.saves = 0
+        self.last_save = None
+
+    def scan_added(self):
+        """
+        count one more unsaved scan. returns True if a save is due.
+        """
+        if self.last_save is None:
+            self.last_save = self.clock.time()
+        self.pending += 1
+        return self.due()
+
+    def due(self):
+        if not self.pending:
+            return False
+        if self.every_scans is not None and self.pending >= self.every_scans:
+            return True
+        if self.every_seconds is not None:
+            return self.clock.time() - self.last_save >= self.every_seconds
+        return False
+
+    def saved(self):
+        """
+        the project was saved, nothing is pending.
+        """
+        if self.pending:
+            logger.debug(f'Autosave covered {self.pending} scan(s).')
+        self.pending = 0
+        self.saves += 1
+        self.last_save = self.clock.time()
+
+    def discarded(self):
+        """
+        the project was cleared, the pending scans are gone.
+        """
+        if self.pending:
+            logger.warning(f'{self.pending} unsaved scan(s) discarded with the project.')
+        self.pending = 0
+        self.last_save = None
+
+    def __repr__(self):
+        return (f'AutosavePolicy(every_scans={self.every_scans}, every_seconds={self.every_seconds}, '
+                f'pending={self.pending})')
@@ -1,37 +1,16 @@
 import logging
 import math
-import os
 
 from zaber_motion import Units
 from zaber_motion.ascii import Axis, Connection, Device
+try:
+    from zaber_motion.ascii import GetSetting
+except ImportError: # zaber-motion without batched setting reads
+    GetSetting = None
 
-from ..py_drive_api import logs_dir
+from . import kinematics
 from .ref_variables import RefVariables
 
-direntries = os.listdir(logs_dir)
-log_path = os.path.join(logs_dir, 'logs')
-if 'logs' not in direntries:
-    os.makedirs(log_path)
-Logs = {
-    'INFO.log': logging.INFO,
-    'WARNING.log': logging.WARNING,
-    'DEBUG.log': logging.DEBUG
-}
-levels = [Logs[l] for l in Logs]
-log_files = [os.path.join(log_path, f) for f in Logs]
-h = 0
-handlers = []
-for log_file in log_files:
-    handler = logging.FileHandler(log_file, mode='a')
-    handler.setLevel(levels[h])
-    handlers.append(handler)
-logging.basicConfig(
-    format='%(asctime)s %(module)s \t\t%(message)s',
-    datefmt='%y%m%d %H%M%S',
-    style='%',
-    level=logging.NOTSET,
-    handlers=handlers
-)
 logger = logging.getLogger(__name__)
 # generic axis class used for methods applicable to all devices
 
@@ -64,6 +43,8 @@ class BaseAxis(Connection, Device, Axis):
         upper and lower limits of this axis to avoid collision
     type : str
         'lin' or 'rot' denoting the axis type
+    recorder : TelemetryRecorder
+        records the positions read while it is set, None by default
 
     Methods
     -------
@@ -105,6 +86,9 @@ class BaseAxis(Connection, Device, Axis):
         self._home = BaseAxis._get_home(self.label,math.degrees(BaseAxis._XANG),target_tilt_deg)
         self._wait_move = True
         self._settings = {}
+        self._settings_cached = False
+        self._unsupported_settings = set()
+        self.recorder = None
         if self.label[-3:] == 'lin':
             self.units = Units.LENGTH_MILLIMETRES
             self._bounds = (-375, 375)
@@ -121,16 +105,63 @@ class BaseAxis(Connection, Device, Axis):
             wait_move = self._wait_move
         except AttributeError:
             wait_move = True
-        super(BaseAxis, self).home(wait_move)
+        self._seek_home(wait_move)
+        speed = self._return_home(wait_move)
+        return self._finish_home(speed)
+
+    # homing is split into seeking the home sensor and returning to self._home,
+    # so that ScanPlatform.home_all() can run several axes through each phase
+    # at the same time.
+    def _seek_home(self, wait_move=False):
+        self.home(wait_move)
+        return None
+
+    # speed and acceleration of moves from the device settings, in mm/s and
+    # mm/s^2, or rad/s and rad/s^2 for rotary axes
+    def motion_limits(self):
+        if self._type == 'rot':
+            units = (Units.ANGULAR_VELOCITY_RADIANS_PER_SECOND,
+                     Units.ANGULAR_ACCELERATION_RADIANS_PER_SECOND_SQUARED)
+        else:
+            units = (Units.VELOCITY_MILLIMETRES_PER_SECOND,
+                     Units.ACCELERATION_MILLIMETRES_PER_SECOND_SQUARED)
+        return (self._device.settings.get('maxspeed', units[0]),
+                self._device.settings.get('accel', units[1]))
+
+    # returns the maxspeed to restore with _finish_home() once idle
+    def _return_home(self, wait_move=False):
         speed = self._device.settings.get('maxspeed')
         self._device.settings.set('maxspeed', speed * 1.2)
-        super(BaseAxis, self).move_absolute(
-            self._home, self.units, wait_move)
+        self.move_absolute(self._home, self.units, wait_move)
+        return speed
+
+    def _finish_home(self, speed):
+        self._device.settings.set('maxspeed', speed)
         home_axis = f'{self} was homed.'
         logger.info(home_axis)
-        self._device.settings.set('maxspeed', speed)
         return home_axis
 
+    # motion commands go to the axis object of the device. on hardware that is
+    # the zaber_motion Axis these methods would otherwise reach through
+    # inheritance, in simulation it is a simulation.SimulatedZaberAxis.
+    def home(self, wait_until_idle=True):
+        return self._axis.home(wait_until_idle)
+
+    def move_absolute(self, position, unit=Units.NATIVE, wait_until_idle=True):
+        return self._axis.move_absolute(position, unit, wait_until_idle)
+
+    def move_relative(self, position, unit=Units.NATIVE, wait_until_idle=True):
+        return self._axis.move_relative(position, unit, wait_until_idle)
+
+    def get_position(self, unit=Units.NATIVE):
+        return self._axis.get_position(unit)
+
+    def wait_until_idle(self, throw_error_on_fault=True):
+        return self._axis.wait_until_idle(throw_error_on_fault)
+
+    def stop(self, wait_until_idle=True):
+        return self._axis.stop(wait_until_idle)
+
     # method to get/set the units for a move position from an external file.
     def _set_units(self, key):
         if isinstance(key, str):
@@ -138,14 +169,14 @@ class BaseAxis(Connection, Device, Axis):
             if self._type == 'lin':
                 if key.find('mm') >= 0:
                     self.units = Units.LENGTH_MILLIMETRES
-                    logger.debug(f'{self} changed units to mm.')
+                    logger.debug('%s changed units to mm.', self)
             if self._type == 'rot':
                 if key.find('deg') >= 0:
                     self.units = Units.ANGLE_DEGREES
-                    logger.debug(f'{self} changed units to deg.')
+                    logger.debug('%s changed units to deg.', self)
                 if key.find('rad') >= 0:
                     self.units = Units.ANGLE_RADIANS
-                    logger.debug(f'{self} changed units to rad.')
+                    logger.debug('%s changed units to rad.', self)
         if isinstance(key, Units):
             self.units = key
         else:
@@ -177,7 +208,7 @@ class BaseAxis(Connection, Device, Axis):
                 else:
                     _in_bounds = False
                     checked = True
-                    logger.warning(f'{self} triggered bounds warning!')
+                    logger.warning('%s triggered bounds warning!', self)
             elif self.label == 'x_rot' and BaseAxis._YPOS > 725:
                 dist = 811 - BaseAxis._YPOS
                 limit = math.atan(dist / 115)
@@ -187,7 +218,7 @@ class BaseAxis(Connection, Device, Axis):
                 else:
                     _in_bounds = False
                     checked = True
-                    logger.warning(f'{self} triggered bounds warning!')
+                    logger.warning('%s triggered bounds warning!', self)
         elif self._type == 'lin':
             if self.label == 'y_lin' and value > 725:
                 dist = 811 - value
@@ -198,7 +229,7 @@ class BaseAxis(Connection, Device, Axis):
                 else:
                     _in_bounds = False
                     checked = True
-                    logger.warning(f'{self} triggered bounds warning!')
+                    logger.warning('%s triggered bounds warning!', self)
             elif self.label == 'z_lin' and value > 240:
                 dist = 590 - value
                 limit = math.atan(dist / 150)
@@ -208,14 +239,14 @@ class BaseAxis(Connection, Device, Axis):
                 else:
                     _in_bounds = False
                     checked = True
-                    logger.warning(f'{self} triggered bounds warning!')
+                    logger.warning('%s triggered bounds warning!', self)
         if not checked:
             if value > self._bounds[0] and value < self._bounds[1]:
                 _in_bounds = True
                 checked = True
             else:
                 _in_bounds = False
-                logger.warning(f'{self} triggered bounds warning!')
+                logger.warning('%s triggered bounds warning!', self)
         return _in_bounds
 
     # current setting for axis 'self.' returns True if
@@ -229,7 +260,7 @@ class BaseAxis(Connection, Device, Axis):
     @wait_move.setter
     def wait_move(self, value: bool):
         self._wait_move = value
-        logger.debug(f'{self} set wait move to {value}')
+        logger.debug('%s set wait move to %s', self, value)
         return None
 
     # check working distance
@@ -254,9 +285,7 @@ class BaseAxis(Connection, Device, Axis):
     @property
     def position(self):
         pos = self.get_position(self.units)
-        message = (f'{self} position query:' + '\n\t\t\t\t' +
-                   f'position: {pos}')
-        logger.debug(message)
+        logger.debug('%s position query:\n\t\t\t\tposition: %s', self, pos)
         if self.label == 'x_rot':
             BaseAxis._XANG = pos
         if self.label == 'y_rot':
@@ -265,6 +294,7 @@ class BaseAxis(Connection, Device, Axis):
             BaseAxis._YPOS = pos
         if self.label == 'z_lin':
             BaseAxis._ZPOS = pos
+        if self.recorder is not None: self.recorder.record(position=pos)
         return pos
 
     # call whenever you want to log current temperature of associated device
@@ -309,15 +339,8 @@ class BaseAxis(Connection, Device, Axis):
         home positions. 
         tilt is in degrees!
         """
-        WD = BaseAxis._WD
-        target_tilt = math.radians(target_tilt_deg)
-        scanner_tilt = math.radians(scanner_tilt_deg)
-        positions = {
-            'target_tilt': target_tilt+scanner_tilt,
-            'y_lin': 355.1 + WD * math.sin(scanner_tilt),
-            'z_lin': 286.511 + WD - (WD * math.cos(scanner_tilt)),
-            'x_rot': scanner_tilt-0.04345051714379008,
-            'y_rot': 0}
+        homes = kinematics.home_positions(scanner_tilt_deg, target_tilt_deg, BaseAxis._WD)
+        positions = dict(zip(kinematics.AXES, homes.tolist()))
         _get_home = positions.get(axis_label, "Invalid Label")
         return _get_home
 
@@ -345,27 +368,48 @@ class BaseAxis(Connection, Device, Axis):
         except:
             return None
 
+    # read several settings from the device in as few transactions as the
+    # library allows. settings the device doesn't answer are left out, and
+    # remembered so they don't fail the batched reads after.
+    def _read_settings(self, names):
+        names = [a for a in names if a not in self._unsupported_settings]
+        if GetSetting is not None and hasattr(self._device.settings, 'get_many'):
+            try:
+                results = self._device.settings.get_many(
+                    *[GetSetting(a) for a in names])
+                return {r.setting: r.values[0] for r in results}
+            except Exception:
+                logger.debug('%s batched settings read failed. Reading one at a time.', self)
+        values = {}
+        for a in names:
+            try:
+                values[a] = self._device.settings.get(a)
+            except Exception:
+                self._unsupported_settings.add(a)
+                logger.debug('%s: %s is invalid for this device.', self, a)
+        return values
+
     # get settings from connected devices using string arguments
     # to return a specific setting like driver temp use the form:
     #       self.settings['device']['driver.temperature']
+    # all settings are read once and cached for the session. use
+    # refresh_settings() to re-read the values that change at runtime.
     @property
     def settings(self):
-        if self._settings=={}:
-            arg = []
-            val = []
-            for a in RefVariables.DEV_ARGS:
-                try:
-                    val.append(self._device.settings.get(a))
-                    arg.append(a)
-                except BaseException:
-                    f'{a} is invalid for this device.'
-            self._settings = dict(zip(arg,val))
-        else:
-            for a in RefVariables.NON_PERSISTENT:
-                try:
-                    self._settings[a] = self._device.settings.get(a)
-                except BaseException:
-                    pass
+        if not self._settings_cached:
+            self._settings.update(self._read_settings(RefVariables.DEV_ARGS))
+            self._settings_cached = True
+        return self._settings
+
+    def refresh_settings(self, names=None):
+        """
+        re-reads the settings in 'names', or all of the non-persistent
+        settings this device supports if none are given, and returns
+        the updated settings cache.
+        """
+        if names is None:
+            names = [a for a in RefVariables.NON_PERSISTENT if a in self.settings]
+        self._settings.update(self._read_settings(names))
         return self._settings
 
     # for changing a device setting during a test. settings not saved after
@@ -0,0 +1,452 @@
+"""
+Benchmark harness for calibration campaign throughput.
+
+Runs standard workloads (Poses.from_file -> ScanPlatform.move ->
+ui.addCalibrationView -> ui.calibrate, and turntable scans) end to end and
+reports per-phase latency percentiles, poses per hour and the number of
+serial and json rpc transactions, optionally compared against a stored
+baseline.
+
+Backends
+--------
+simulated : SimulatedRig for the axes and the ui_server stand-in for the
+    gui, all on the rig's virtual clock. fast, and deterministic for a
+    given failure rate and seed.
+replay : SimulatedRig for the axes, and gui responses and latencies
+    replayed from a session recorded with RecordingTransport.
+hardware : the real platform through DevConnection() and the gui on
+    stdin / stdout. pass a recording path to record the gui session.
+
+Example
+-------
+    python -m py_drive_api.benchmark golden hybrid30 --baseline baseline.json
+"""
+import argparse
+import json
+import logging
+import math
+import tempfile
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import partial
+from os.path import dirname, join
+
+from zaber_motion import Units
+
+from .dev_connection import DevConnection
+from .pipeline import Pipeline
+from .poses import Poses
+from .retry_policy import RetryPolicy
+from .rpc_stats import RpcStats
+from .simulation import SimulatedRig
+from .ui_scripting import UI_Scripting as ui
+from .ui_server import FailureModel, LineTransport, ScanSoftwareServer
+
+logger = logging.getLogger(__name__)
+
+HYBRID_30_POSE = join(dirname(__file__), 'include', '30pose-hybrid.csv')
+OUTPUT_DIR = join(tempfile.gettempdir(), 'py_drive_api-benchmark')
+
+
+def percentile(values, q):
+    """
+    q-th percentile (0-100) of 'values', interpolating linearly
+    between the closest ranks.
+    """
+    values = sorted(values)
+    if not values:
+        return math.nan
+    rank = (len(values) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class PhaseTimer():
+    """
+    Collects the duration of every occurrence of each named phase,
+    measured on 'clock'.
+    """
+    def __init__(self, clock=time):
+        self.clock = clock
+        self.durations = defaultdict(list)
+
+    @contextmanager
+    def phase(self, name):
+        start = self.clock.time()
+        try:
+            yield
+        finally:
+            self.durations[name].append(self.clock.time() - start)
+
+    def summary(self):
+        return {name: {
+                    'count': len(d),
+                    'total': sum(d),
+                    'mean': sum(d) / len(d),
+                    'p50': percentile(d, 50),
+                    'p90': percentile(d, 90),
+                    'p99': percentile(d, 99),
+                    'max': max(d)}
+                for name, d in self.durations.items()}
+
+
+########################### GUI BACKENDS ###########################
+class ReplayUI(LineTransport):
+    """
+    Answers json rpc requests with the responses and latencies of a
+    session recorded by RecordingTransport. responses are replayed in
+    order per method, requests the recording has no more responses for
+    get an error.
+    """
+    def __init__(self, clock, recording):
+        super(ReplayUI, self).__init__(clock)
+        self.records = defaultdict(deque)
+        with open(recording) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records[record['method']].append(record)
+
+    def _respond(self, request):
+        records = self.records[request['method']]
+        if not records:
+            logger.warning(f'Recording has no response left for {request["method"]}.')
+            return {'jsonrpc': '2.0', 'id': request.get('id'),
+                    'error': {'code': -32000, 'message': 'not in recording'}}
+        record = records.popleft()
+        self.clock.sleep(record['latency'])
+        response = dict(record['response'])
+        response['id'] = request.get('id')
+        return response
+
+
+class RecordingTransport():
+    """
+    Passes json rpc traffic through to 'reader' / 'writer' (the real gui
+    on stdin / stdout by default), and records each request with its
+    response and latency to 'path' for ReplayUI.
+    """
+    def __init__(self, path, reader=None, writer=None):
+        import sys
+        self.reader = reader if reader is not None else sys.stdin
+        self.writer = writer if writer is not None else sys.stdout
+        self.calls = Counter()
+        self.messages = 0
+        self._file = open(path, 'w')
+        self._buffer = ''
+        self._pending = None
+
+    def write(self, text):
+        self._buffer += text
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            requests = request if isinstance(request, list) else [request]
+            self.calls.update(r['method'] for r in requests)
+            self.messages += 1
+            self._pending = (requests, time.perf_counter())
+        return self.writer.write(text)
+
+    def flush(self):
+        return self.writer.flush()
+
+    def readline(self):
+        line = self.reader.readline()
+        if self._pending is not None:
+            requests, start = self._pending
+            self._pending = None
+            latency = (time.perf_counter() - start) / len(requests)
+            try:
+                responses = json.loads(line)
+            except ValueError:
+                responses = {'error': {'code': -32700, 'message': line.strip()}}
+            if not isinstance(responses, list):
+                responses = [responses] * len(requests)
+            # batch responses may come in any order
+            by_id = {r.get('id'): r for r in responses if isinstance(r, dict)}
+            for request, response in zip(requests, responses):
+                self._file.write(json.dumps({
+                    'method': request['method'],
+                    'params': request.get('params'),
+                    'latency': latency,
+                    'response': by_id.get(request.get('id'), response)}) + '\n')
+            self._file.flush()
+        return line
+
+    def close(self):
+        self._file.close()
+
+
+############################ WORKLOADS ############################
+# each workload runs on a started ScanPlatform, times its phases with
+# 'timer' and returns the number of poses or views it captured.
+def golden(platform, timer):
+    with timer.phase('home'):
+        platform.home_all()
+    for pose in Poses.GOLDEN:
+        with timer.phase('move'):
+            platform.move2pose(pose)
+        with timer.phase('capture'):
+            ui.addCalibrationView(f'golden{pose}')
+    with timer.phase('calibrate'):
+        ui.calibrate(join(OUTPUT_DIR, 'golden.zip'))
+    return len(Poses.GOLDEN)
+
+
+def hybrid30(platform, timer, pose_file=HYBRID_30_POSE, ordered=False):
+    poses = Poses.from_file(pose_file)
+    with timer.phase('home'):
+        platform.home_all()
+    with timer.phase('validate'):
+        platform.validate_poses(poses)
+    if ordered:
+        with timer.phase('order'):
+            poses = platform.optimize_pose_order(poses).apply(poses)
+    for pose in poses:
+        with timer.phase('move'):
+            platform.move(pose[-1])
+        with timer.phase('capture'):
+            ui.addCalibrationView(name=f'pose{pose[0]}', target_type=pose[1])
+    with timer.phase('calibrate'):
+        ui.calibrate(join(OUTPUT_DIR, 'hybrid30.zip'))
+    return len(poses)
+
+
+def turntable(platform, timer, views=4):
+    with timer.phase('clear'):
+        ui.clearProject()
+    with timer.phase('home'):
+        platform.home_all()
+    for _ in range(views):
+        with timer.phase('scan'):
+            ui.Scan()
+        with timer.phase('move'):
+            platform.yrot.move_relative(360 / views, Units.ANGLE_DEGREES, True)
+    with timer.phase('move'):
+        platform.yrot.move(0)
+    return views
+
+
+# the 30 poses in sets, exporting the views of each set for offline
+# calibration. pipelined, the export runs while moving to the next set.
+def export_sets(platform, timer, set_size=10, pipelined=True, pose_file=HYBRID_30_POSE):
+    poses = Poses.from_file(pose_file)
+    with timer.phase('home'):
+        platform.home_all()
+    with Pipeline(platform) as pipeline:
+        for n in range(0, len(poses), set_size):
+            for pose in poses[n:n + set_size]:
+                with timer.phase('move'):
+                    platform.move(pose[-1])
+                with timer.phase('capture'):
+                    pipeline.capture_view(f'pose{pose[0]}', pose[1])
+            with timer.phase('export'):
+                path = join(OUTPUT_DIR, f'set{n // set_size + 1}.zip')
+                if pipelined:
+                    pipeline.export_calibration_views(path)
+                    pipeline.clear_views()
+                else:
+                    ui.exportCalibrationViews(path)
+                    ui.clearViews()
+    return len(poses)
+
+
+# a turntable scan session saved to a project. the default saves after
+# every scan, autosave_every coalesces the saves.
+def scan_session(platform, timer, scans=30, autosave_every=1):
+    policy = ui.AUTOSAVE
+    ui.setAutosave(every_scans=autosave_every, clock=getattr(platform, 'clock', time))
+    try:
+        with timer.phase('clear'):
+            ui.clearProject()
+            ui.saveProject(join(OUTPUT_DIR, 'scan_session.3dscanprojzip'))
+        with timer.phase('home'):
+            platform.home_all()
+        for n in range(scans):
+            with timer.phase('move'):
+                platform.yrot.move_degrees(n * 360 / scans)
+            with timer.phase('scan'):
+                ui.Scan()
+        with timer.phase('move'):
+            platform.yrot.move(0)
+        with timer.phase('save'):
+            ui.flushAutosave()
+    finally:
+        ui.AUTOSAVE = policy
+    return scans
+
+
+WORKLOADS = {
+    'golden': golden,
+    'hybrid30': hybrid30,
+    'hybrid30_ordered': partial(hybrid30, ordered=True),
+    'turntable': turntable,
+    'export_sets': export_sets,
+    'export_sets_blocking': partial(export_sets, pipelined=False),
+    'scan_session': scan_session,
+    'scan_session_autosave10': partial(scan_session, autosave_every=10),
+}
+
+
+############################## RUNNER ##############################
+def run(workload, backend='simulated', recording=None, failure_rate=0.0, seed=0, **kwargs):
+    """
+    run one workload on 'backend' and return its results as a dict.
+    'recording' is the session file to replay for backend='replay', or
+    the file to record to for backend='hardware'. 'failure_rate' is the
+    probability of each simulated gui request failing. other keyword
+    arguments go to the workload.
+    """
+    rig = None
+    if backend in ('simulated', 'replay'):
+        rig = SimulatedRig()
+        clock = rig.clock
+        if backend == 'simulated':
+            transport = ScanSoftwareServer(
+                clock, failures=FailureModel(failure_rate, seed), artifacts=False)
+        else:
+            transport = ReplayUI(clock, recording)
+        connection = DevConnection(simulate=rig)
+    elif backend == 'hardware':
+        clock = time
+        transport = RecordingTransport(recording) if recording else None
+        connection = DevConnection()
+    else:
+        raise ValueError(f'Unknown benchmark backend {backend}.')
+    timer = PhaseTimer(clock)
+    rpc_start = ui.id
+    retry, stats = ui.RETRY, ui.STATS
+    ui.STATS = RpcStats(clock)
+    ui.RETRY = RetryPolicy(clock=clock, seed=seed, observer=ui.STATS.retried)
+    if transport is not None:
+        ui.connect(transport, transport)
+    try:
+        if not connection.start():
+            raise ConnectionError('Benchmark could not start the scan platform.')
+        start = clock.time()
+        poses = WORKLOADS[workload](connection.get_platform(), timer, **kwargs)
+        elapsed = clock.time() - start
+    finally:
+        connection.__close__()
+        ui.connect()
+        retries, ui.RETRY = ui.RETRY, retry
+        rpc_stats, ui.STATS = ui.STATS, stats
+        if isinstance(transport, RecordingTransport):
+            transport.close()
+    transactions = {'rpc': ui.id - rpc_start}
+    if hasattr(transport, 'messages'):
+        transactions['rpc_messages'] = transport.messages
+    if rig is not None:
+        transactions.update(rig.transactions)
+    return {
+        'workload': workload,
+        'backend': backend,
+        'poses': poses,
+        'elapsed': elapsed,
+        'poses_per_hour': 3600 * poses / elapsed if elapsed else math.inf,
+        'phases': timer.summary(),
+        'transactions': transactions,
+        'rpc_calls': dict(transport.calls) if transport is not None else {},
+        'rpc_failures': dict(getattr(transport, 'failures', {})),
+        'retries': retries.summary(),
+        'rpc_latency': rpc_stats.summary(),
+    }
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    compare 'results' ({workload: result}) against a baseline of the
+    same form. returns a list of (workload, metric, baseline, current)
+    for each metric that is worse than the baseline by more than
+    'tolerance' (a fraction). poses per hour is better when higher,
+    phase percentiles and transaction counts when lower.
+    """
+    regressions = []
+    for workload, result in results.items():
+        base = baseline.get(workload)
+        if base is None:
+            continue
+        metrics = [('poses_per_hour', base['poses_per_hour'], result['poses_per_hour'], True)]
+        for phase, stats in base['phases'].items():
+            if phase in result['phases']:
+                for p in ('p50', 'p90'):
+                    metrics.append((f'{phase}.{p}', stats[p], result['phases'][phase][p], False))
+        for kind, count in base['transactions'].items():
+            if kind in result['transactions']:
+                metrics.append((f'transactions.{kind}', count, result['transactions'][kind], False))
+        for metric, old, new, higher_is_better in metrics:
+            change = (new - old) / old if old else 0.0
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((workload, metric, old, new))
+    return regressions
+
+
+def format_report(results, regressions=None):
+    lines = []
+    for workload, r in results.items():
+        lines.append(f'{workload} ({r["backend"]}): {r["poses"]} poses in {r["elapsed"]:.1f}s, '
+                     f'{r["poses_per_hour"]:.1f} poses/hour')
+        lines.append(f'  {"phase":<12}{"n":>5}{"mean":>10}{"p50":>10}{"p90":>10}{"p99":>10}{"max":>10}')
+        for phase, s in r['phases'].items():
+            lines.append(f'  {phase:<12}{s["count"]:>5}{s["mean"]:>10.3f}{s["p50"]:>10.3f}'
+                         f'{s["p90"]:>10.3f}{s["p99"]:>10.3f}{s["max"]:>10.3f}')
+        lines.append('  transactions: ' + ', '.join(f'{k} {v}' for k, v in r['transactions'].items()))
+        slowest = list(r.get('rpc_latency', {}).items())[:3]
+        if slowest:
+            lines.append('  gui time: ' + ', '.join(
+                f'{method} {s["total"]:.1f}s ({s["count"]}x, p90 {s["p90"]:.2f}s)' for method, s in slowest))
+        for method, s in r.get('retries', {}).items():
+            if s['failures'] or s['rejected']:
+                lines.append(f'  retries {method}: {s["failures"]} failed attempts, {s["recovered"]} recovered, '
+                             f'{s["exhausted"]} exhausted, {s["rejected"]} rejected, {s["retry_time"]:.1f}s waiting')
+    if regressions is not None:
+        if regressions:
+            lines.append('Regressions against baseline:')
+            lines += [f'  {w} {m}: {old:.3f} -> {new:.3f}' for w, m, old, new in regressions]
+        else:
+            lines.append('No regressions against baseline.')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Calibration campaign throughput benchmark.')
+    parser.add_argument('workloads', nargs='*', help=f'any of {", ".join(WORKLOADS)}, all by default')
+    parser.add_argument('--backend', default='simulated', choices=['simulated', 'replay', 'hardware'])
+    parser.add_argument('--recording', help='session file to replay, or to record on hardware')
+    parser.add_argument('--baseline', help='json baseline to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--batch', action='store_true', help='send gui setup sequences as json rpc batches')
+    parser.add_argument('--max-in-flight', type=int, default=ui.MAX_IN_FLIGHT)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='simulated gui request failure rate')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    unknown = [w for w in args.workloads if w not in WORKLOADS]
+    if unknown:
+        parser.error(f'unknown workloads {unknown}, choose from {list(WORKLOADS)}')
+    ui.BATCH_REQUESTS = args.batch
+    ui.MAX_IN_FLIGHT = args.max_in_flight
+    results = {w: run(w, args.backend, args.recording, args.failure_rate, args.seed)
+               for w in args.workloads or WORKLOADS}
+    regressions = None
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(format_report(results, regressions))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
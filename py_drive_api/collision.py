@@ -0,0 +1,269 @@
+"""
+Collision checks of whole pose lists, before anything moves.
+
+ScanPlatform.move() moves one axis after another, and every axis move is
+checked by BaseAxis._in_bounds against where the other axes are. A move
+that fails the check is skipped with a warning and the pose continues.
+CollisionChecker replays that sequence for every axis move of a pose
+list at once. It uses the same z_lin / y_rot and y_lin / x_rot envelopes
+and returns a CollisionReport with every move that would be skipped.
+"""
+import itertools
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# the axes with collision envelopes, in the column order of the states
+AXES = ('z_lin', 'y_lin', 'x_rot', 'y_rot')
+Z, Y, X, R = range(len(AXES))
+# axes whose envelopes depend on each other, see ScanPlatform.COLLISION_PAIRS
+PAIRS = ((Z, R), (Y, X))
+
+# envelope geometry in mm, from the solidworks assembly. see
+# BaseAxis._in_bounds
+Z_LIN_ENVELOPE = 240 # y_rot is limited with z_lin past this
+Z_LIN_PIVOT = 590
+TURNTABLE_RADIUS = 150
+Y_LIN_CLEAR = (200, 420) # y_rot is free with y_lin outside these
+Y_LIN_ENVELOPE = 725 # x_rot is limited with y_lin past this
+Y_LIN_PIVOT = 811
+SCANNER_RADIUS = 115
+
+# how an axis turns the position given to move() into its target. see
+# the _move_target() methods of the zaber axes.
+AxisLimits = namedtuple('AxisLimits', ['home', 'bounds', 'rotary', 'direction'])
+# a move that would be skipped. 'pose' is the index in the pose list,
+# 'position' what the axis move() gets, 'target' the absolute target.
+Collision = namedtuple('Collision', ['pose', 'axis', 'position', 'target', 'reason'])
+
+
+class CollisionReport():
+    """
+    Outcome of CollisionChecker.check().
+
+    Attributes
+    ----------
+    ok : bool
+        True if no move of any pose would be skipped.
+    collisions : list
+        the Collision of every move that would be skipped, in move order.
+    poses : int
+        poses checked.
+    moves : int
+        axis moves checked.
+    final : dict
+        {axis: absolute position} the platform would end up in.
+    seconds : float
+        time the check took.
+    """
+    def __init__(self, collisions, poses, moves, final, seconds):
+        self.collisions = collisions
+        self.poses = poses
+        self.moves = moves
+        self.final = final
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return not self.collisions
+
+    def failed_poses(self):
+        """
+        sorted indices of the poses with a skipped move.
+        """
+        return sorted({c.pose for c in self.collisions})
+
+    def format(self):
+        lines = [f'{self.poses} poses, {self.moves} moves checked in {self.seconds * 1e3:.1f} ms: '
+                 + ('no collisions' if self.ok else f'{len(self.collisions)} moves would be skipped')]
+        for c in self.collisions:
+            lines.append(f'  pose {c.pose}: {c.axis} to {c.position:.4g} ({c.target:.4g}) {c.reason}')
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.format()
+
+
+class CollisionChecker():
+    """
+    Replays the axis moves of a pose list against the envelopes of
+    BaseAxis._in_bounds, with numpy over all moves at once.
+
+    Parameters
+    ----------
+    limits : dict
+        {axis label: AxisLimits} of the zaber axes. moves of other axes,
+        like the target tilt, are never checked and don't count.
+    """
+    def __init__(self, limits):
+        self.limits = {label: limits[label] for label in AXES if label in limits}
+
+    def check(self, moves, start, coordinated=False):
+        """
+        check 'moves', a list of (pose, axis label, position, degrees)
+        with the position each axis move() gets in move order, starting
+        from the {axis: absolute position} 'start'. rotary positions in
+        degrees have 'degrees' set. with 'coordinated' every pose is
+        checked in every mix of its start and end positions and is
+        skipped as a whole, like ScanPlatform.move_coordinated(). returns
+        a CollisionReport.
+        """
+        began = time.perf_counter()
+        moves = [m for m in moves if m[1] in self.limits]
+        if coordinated: # only the last move of an axis in a pose is made
+            last = {(m[0], m[1]): i for i, m in enumerate(moves)}
+            moves = [moves[i] for i in sorted(last.values())]
+        pose = np.array([m[0] for m in moves], dtype=int)
+        axis = np.array([AXES.index(m[1]) for m in moves], dtype=int)
+        position = np.array([m[2] for m in moves], dtype=float)
+        degrees = np.array([bool(m[3]) for m in moves], dtype=bool)
+        checked, target = self.__targets(axis, position, degrees)
+        initial = np.array([start.get(a, np.nan) for a in AXES], dtype=float)
+        accepted = np.ones(len(moves), dtype=bool)
+        while True: # until the skipped moves agree with the states they cause
+            if coordinated:
+                ok, move_ok, reason = self.__pose_in_bounds(pose, axis, target, accepted, initial)
+            else:
+                states = CollisionChecker.__states(axis, target, accepted, initial)
+                move_ok, reason = self.__in_bounds(axis, checked, states)
+                ok = move_ok
+            changed = np.flatnonzero(ok != accepted)
+            if not len(changed):
+                break
+            # moves before the first change saw the right states, so they
+            # are settled. the rest is checked again with the new guess.
+            accepted[changed[0]:] = ok[changed[0]:]
+        final = CollisionChecker.__states(axis, target, accepted, initial, after=True)
+        collisions = [Collision(int(pose[i]), AXES[axis[i]], float(position[i]), float(target[i]),
+                                reason[i] if not move_ok[i] else 'pose rejected')
+                      for i in np.flatnonzero(~accepted)]
+        return CollisionReport(collisions, len(set(pose.tolist())), len(moves),
+                               dict(zip(AXES, final.tolist())), time.perf_counter() - began)
+
+    # the value _in_bounds checks and the absolute target of every move.
+    # linear axes check the absolute target, rotary axes the position
+    # relative to home in radians.
+    def __targets(self, axis, position, degrees):
+        home = np.array([self.limits[a].home if a in self.limits else np.nan for a in AXES])
+        direction = np.array([self.limits[a].direction if a in self.limits else 1 for a in AXES])
+        rotary = np.array([a in self.limits and self.limits[a].rotary for a in AXES])[axis]
+        radians = np.where(degrees, np.radians(position), position)
+        checked = np.where(rotary, radians, home[axis] + position)
+        target = np.where(rotary, (radians + home[axis]) * direction[axis], checked)
+        return checked, target
+
+    # the value _in_bounds checks for 'axis' at the absolute 'target'
+    def __checked(self, axis, target):
+        home = np.array([self.limits[a].home if a in self.limits else np.nan for a in AXES])
+        direction = np.array([self.limits[a].direction if a in self.limits else 1 for a in AXES])
+        rotary = np.array([a in self.limits and self.limits[a].rotary for a in AXES])[axis]
+        return np.where(rotary, target * direction[axis] - home[axis], target)
+
+    # the absolute position of every axis before each move (or after the
+    # last one), from the accepted moves before it.
+    @staticmethod
+    def __states(axis, target, accepted, initial, after=False):
+        n = len(axis)
+        if not n:
+            return initial.copy() if after else np.empty((0, len(AXES)))
+        states = np.empty((n + 1, len(AXES)))
+        index = np.arange(n)
+        for a in range(len(AXES)):
+            last = np.maximum.accumulate(np.where((axis == a) & accepted, index, -1))
+            last = np.concatenate([[-1], last]) # the state before move i
+            states[:, a] = np.where(last >= 0, target[np.maximum(last, 0)], initial[a])
+        return states[-1] if after else states[:-1]
+
+    # states for coordinated moves: every move of a pose sees the pose it
+    # ends in, from the accepted poses before it.
+    @staticmethod
+    def __pose_states(pose, axis, target, accepted, initial):
+        before = CollisionChecker.__states(axis, target, accepted, initial)
+        if not len(pose):
+            return before
+        states = np.empty_like(before)
+        first = np.flatnonzero(np.concatenate([[True], pose[1:] != pose[:-1]]))
+        group = np.cumsum(np.concatenate([[False], pose[1:] != pose[:-1]]))
+        states[:] = before[first[group]] # the state at the start of each pose
+        for a in range(len(AXES)):
+            # the last target of axis 'a' in each pose, overriding the start
+            moving = axis == a
+            last = np.full(len(first), -1)
+            np.maximum.at(last, group[moving], np.flatnonzero(moving))
+            has = last[group] >= 0
+            states[has, a] = target[last[group][has]]
+        return states
+
+    # coordinated poses: the axes of a pose move together, so every axis of
+    # a collision pair with a moving axis is checked in every combination
+    # of the start and end positions of the axes, and other moving axes at
+    # their end from the start. returns whether the pose of each move
+    # passes, and whether and why the axis of the move fails in it.
+    def __pose_in_bounds(self, pose, axis, target, accepted, initial):
+        if not len(pose):
+            return np.ones(0, dtype=bool), np.ones(0, dtype=bool), []
+        new = np.concatenate([[True], pose[1:] != pose[:-1]])
+        first = np.flatnonzero(new)
+        group = np.cumsum(new) - 1
+        start = CollisionChecker.__states(axis, target, accepted, initial)[first]
+        end = CollisionChecker.__pose_states(pose, axis, target, accepted, initial)[first]
+        moving = np.zeros(start.shape, dtype=bool)
+        moving[group, axis] = True
+        paired = np.zeros_like(moving)
+        for pair in PAIRS:
+            if all(AXES[a] in self.limits for a in pair):
+                paired[:, pair] |= moving[:, pair].any(axis=1, keepdims=True)
+        corners = np.array(list(itertools.product((False, True), repeat=len(AXES))))
+        # corners that only switch moving axes, the others are duplicates
+        distinct = ~(corners[None] & ~moving[:, None]).any(axis=2)
+        g, c, a = np.nonzero(distinct[:, :, None] & paired[:, None])
+        corner = corners[c]
+        g_, a_ = np.nonzero(moving & ~paired)
+        unpaired = np.zeros((len(g_), len(AXES)), dtype=bool)
+        unpaired[np.arange(len(g_)), a_] = True # an axis doesn't check its own state
+        g, a = np.concatenate([g, g_]), np.concatenate([a, a_])
+        states = np.where(np.concatenate([corner, unpaired]) & moving[g], end[g], start[g])
+        value = self.__checked(a, states[np.arange(len(a)), a])
+        ok, _ = self.__in_bounds(a, value, states, reasons=False)
+        failed = np.flatnonzero(~ok)
+        pose_ok = np.ones(len(first), dtype=bool)
+        pose_ok[g[failed]] = False
+        # the first reason the axis of each move fails in its pose
+        key, index = np.unique(g[failed] * len(AXES) + a[failed], return_index=True)
+        failed = failed[index]
+        _, reasons = self.__in_bounds(a[failed], value[failed], states[failed])
+        found = np.minimum(np.searchsorted(key, group * len(AXES) + axis), max(len(key) - 1, 0))
+        move_ok = ~(key[found] == group * len(AXES) + axis) if len(key) else np.ones(len(axis), dtype=bool)
+        reason = [reasons[found[i]] if not move_ok[i] else None for i in range(len(axis))]
+        return pose_ok[group], move_ok, reason
+
+    # BaseAxis._in_bounds for every move at once, with the positions of
+    # the other axes in 'states'. returns ok and the reason per move, or
+    # None without 'reasons'.
+    def __in_bounds(self, axis, value, states, reasons=True):
+        lower = np.array([self.limits[a].bounds[0] if a in self.limits else -np.inf for a in AXES])[axis]
+        upper = np.array([self.limits[a].bounds[1] if a in self.limits else np.inf for a in AXES])[axis]
+        z, y, x, r = (states[:, i] for i in (Z, Y, X, R))
+        in_bounds = (value > lower) & (value < upper)
+        with np.errstate(invalid='ignore'):
+            # z_lin past the envelope limits the turntable angle. like
+            # _in_bounds this compares x_rot with the upper limit.
+            z_limit = np.arctan((Z_LIN_PIVOT - value) / TURNTABLE_RADIUS)
+            z_ok = np.where(value > Z_LIN_ENVELOPE, (r > -z_limit) & (x < z_limit), in_bounds)
+            y_limit = np.arctan((Y_LIN_PIVOT - value) / SCANNER_RADIUS)
+            y_ok = np.where(value > Y_LIN_ENVELOPE, (x > -y_limit) & (x < y_limit), in_bounds)
+            r_limit = np.arctan((Z_LIN_PIVOT - z) / TURNTABLE_RADIUS)
+            r_clear = (value > -r_limit) & (value < r_limit) | (y < Y_LIN_CLEAR[0]) | (y > Y_LIN_CLEAR[1])
+            r_ok = np.where(z > Z_LIN_ENVELOPE, r_clear, in_bounds)
+            x_limit = np.arctan((Y_LIN_PIVOT - y) / SCANNER_RADIUS)
+            x_ok = np.where(y > Y_LIN_ENVELOPE, (value > -x_limit) & (value < x_limit), in_bounds)
+        ok = np.choose(axis, [z_ok, y_ok, x_ok, r_ok])
+        if not reasons:
+            return ok, None
+        envelope = np.choose(axis, [value > Z_LIN_ENVELOPE, value > Y_LIN_ENVELOPE,
+                                    y > Y_LIN_ENVELOPE, z > Z_LIN_ENVELOPE])
+        reasons = np.where(envelope, np.where(np.isin(axis, (Z, R)), 'z_lin/y_rot envelope',
+                                              'y_lin/x_rot envelope'), 'out of bounds')
+        return ok, reasons.tolist()
+
@@ -5,11 +5,14 @@ import logging
 from zaber_motion.ascii import Connection
 from zaber_motion.exceptions import NoDeviceFoundException
 
+from .jsonrpc import print_line
+from .log_config import configure as configure_logging
 from .scan_platform import ScanPlatform
 from .oriental_motor.exception_lib import CommunicationError
 from .oriental_motor.modbus_controller import ModbusController as mc
 from .oriental_motor.rotary_axis import RotaryAxis as OMRotaryAxis
 from .oriental_motor.serial_com import SerialCom as sc
+from .simulation import SimulatedRig
 from .ui_scripting import UI_Scripting
 
 logger = logging.getLogger(__name__)
@@ -21,25 +24,39 @@ class DevConnection():
     that objects are instantiated correctly.
     This will return a ScanPlatform() instance on a connected
     serial com port. 
+    With simulate=True (or a SimulatedRig instance) the platform 
+    runs on simulated hardware instead, see simulation.py.
     """
     def __init__(
         self, 
         working_distance=ScanPlatform.DEFAULT_WORK_DISTANCE, 
         scanner_tilt_deg=ScanPlatform.DEFAULT_SCANNER_TILT, 
-        target_tilt_deg=ScanPlatform.DEFAULT_TARGET_TILT
+        target_tilt_deg=ScanPlatform.DEFAULT_TARGET_TILT,
+        telemetry_interval=None,
+        simulate=False
         ):
+        configure_logging()
         self.WD = working_distance
         self.scanner_tilt = scanner_tilt_deg
         self.target_tilt = radians(target_tilt_deg)
         self.dev_controller = None
         self.dago_object = None
         self.tilt_axis = None
+        self.telemetry_interval = telemetry_interval # seconds, None to not sample temperatures
+        self.simulation = None
+        if simulate:
+            self.simulation = simulate if isinstance(simulate, SimulatedRig) else SimulatedRig()
+            self.devices = None
+            return None
         try:
             self.devices = sc.detect_devices()
         except:
             raise ConnectionError('Check connection. Devices were not detected!')
     
     def __close__(self):
+        if self.dago_object is not None:
+            self.dago_object.stop_telemetry()
+            self.dago_object.stop_recording()
         if self.dev_controller is not None: 
             try:
                 self.dago_object.xrot.move_absolute(
@@ -60,6 +77,13 @@ class DevConnection():
         return False
 
     def __start_controller(self):
+        if self.simulation is not None:
+            self.dev_controller = self.simulation.zaber
+            if self.simulation.modbus_port.drivers:
+                self.tilt_axis = OMRotaryAxis(
+                    self.simulation.modbus_controller(), self.WD, self.scanner_tilt, self.target_tilt)
+            logger.info('Running on a simulated scan platform.')
+            return True
         if self.devices is not None:
             for dev in self.devices:
                 try:
@@ -75,7 +99,7 @@ class DevConnection():
                     if ready:
                         self.tilt_axis = OMRotaryAxis(port, self.WD, self.scanner_tilt, self.target_tilt)
                         logger.info(f'Oriental motor tilt axis found on port {dev.device}!')
-                    else: print(f'alarms: {port.GetAlarm(3)}',f'reset: {port.AlarmReset(3)}')
+                    else: print_line(f'alarms: {port.GetAlarm(3)}',f'reset: {port.AlarmReset(3)}')
                     if not ready: port.PortClose()
             return True
         return False
@@ -88,6 +112,8 @@ class DevConnection():
                 scanner_tilt_deg=self.scanner_tilt, 
                 target_tilt_deg=self.target_tilt,
                 OMTiltAxisSerialDevice=self.tilt_axis)
+            if self.telemetry_interval is not None:
+                self.dago_object.start_telemetry(self.telemetry_interval)
             return True
         return False
     
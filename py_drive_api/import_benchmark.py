@@ -0,0 +1,112 @@
+"""
+Import time of the package, measured in fresh interpreters.
+
+Each statement runs in a new python process, so nothing is cached
+between runs. The time of starting an interpreter that imports nothing
+is subtracted, and python -X importtime shows which modules were the
+heaviest to load.
+
+Run python -m py_drive_api.import_benchmark [--runs 10].
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+STATEMENTS = {
+    'package': 'import py_drive_api',
+    'ui': 'from py_drive_api import ui',
+    'Poses': 'from py_drive_api import Poses',
+    'DevConnection': 'from py_drive_api import DevConnection',
+}
+
+
+def _run(statement, python=sys.executable):
+    start = perf_counter()
+    process = subprocess.run([python, '-X', 'importtime', '-c', statement],
+                             capture_output=True, text=True)
+    elapsed = perf_counter() - start
+    if process.returncode:
+        raise RuntimeError(f'{statement!r} failed:\n{process.stderr[-2000:]}')
+    return elapsed, process.stderr
+
+
+# {module: cumulative seconds} from the -X importtime report
+def _import_times(report):
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def measure(statement, runs=10, python=sys.executable):
+    """
+    time 'statement' in 'runs' fresh interpreters. returns the median
+    and min in seconds, and the heaviest modules outside the package
+    with their cumulative import time.
+    """
+    times = []
+    report = ''
+    for _ in range(runs):
+        elapsed, report = _run(statement, python)
+        times.append(elapsed)
+    modules = _import_times(report)
+    heaviest = sorted(((m, t) for m, t in modules.items()
+                       if m.split('.')[0] not in ('py_drive_api', 'encodings', 'site')),
+                      key=lambda mt: -mt[1])[:5]
+    return {
+        'statement': statement,
+        'median': statistics.median(times),
+        'min': min(times),
+        'modules': len(modules),
+        'heaviest': heaviest,
+    }
+
+
+def run(statements=None, runs=10, python=sys.executable):
+    """
+    measure every statement, with the bare interpreter start up time
+    subtracted. returns {name: result}.
+    """
+    statements = STATEMENTS if statements is None else statements
+    startup = measure('pass', runs, python)['median']
+    results = {}
+    for name, statement in statements.items():
+        result = measure(statement, runs, python)
+        result['import'] = max(0.0, result['median'] - startup)
+        results[name] = result
+    return results
+
+
+def format_report(results):
+    lines = [f'{"import":<16}{"seconds":>10}{"modules":>10}  heaviest modules']
+    for name, r in results.items():
+        heaviest = ', '.join(f'{m} {t:.3f}' for m, t in r['heaviest'][:3])
+        lines.append(f'{name:<16}{r["import"]:>10.3f}{r["modules"]:>10}  {heaviest}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import time of py_drive_api.')
+    parser.add_argument('statements', nargs='*', help=f'any of {", ".join(STATEMENTS)}, all by default')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.statements if s not in STATEMENTS]
+    if unknown:
+        parser.error(f'unknown statements {unknown}, choose from {list(STATEMENTS)}')
+    results = run({s: STATEMENTS[s] for s in args.statements or STATEMENTS}, args.runs)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(format_report(results))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+"""
+JSON-RPC 2.0 client over a line based transport, e.g. the stdin / stdout
+pipes the 3D Scan gui gives the scripts it launches.
+
+Requests get an id and return a future. Responses are matched back to
+their request by id, so several requests can be in flight at once where
+the host application allows it. Responses without a usable id resolve
+the oldest request still waiting, which is how the gui answered before
+ids were checked.
+
+There is no background reader thread. Whoever waits on a future reads
+responses off the transport until theirs arrives, resolving any other
+futures on the way.
+
+The gui reads requests and script output from the same stdout pipe.
+Requests and print_line() write whole lines under OUTPUT_LOCK, so output
+from one thread can't split a request sent by another.
+"""
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from itertools import count
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+# held for every line written to the transport or printed by the package
+OUTPUT_LOCK = threading.RLock()
+
+
+def print_line(*values, sep=' ', file=None):
+    """
+    print() for output that shares stdout with json rpc requests. the
+    line and its newline go out in one write under OUTPUT_LOCK.
+    """
+    file = sys.stdout if file is None else file
+    with OUTPUT_LOCK:
+        file.write(sep.join(str(v) for v in values) + '\n')
+        file.flush()
+
+
+class JsonRpcError(Exception):
+    """
+    transport level failure of a request: no response, or a response
+    that could not be parsed.
+    """
+    pass
+
+
+class RpcFuture():
+    """
+    Pending result of one request.
+
+    Methods
+    -------
+    done() : bool
+        True once the response has arrived.
+    result(timeout: float) : dict
+        the response object. raises JsonRpcError if the request failed
+        at the transport level, TimeoutError if 'timeout' passed first.
+    """
+    def __init__(self, client, request_id, method, params=None):
+        self.client = client
+        self.id = request_id
+        self.method = method
+        self.params = params
+        self.batch = None
+        self.sent = None # send time, for callers that time requests
+        self._event = threading.Event()
+        self._response = None
+        self._error = None
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        self.client._wait(self, timeout)
+        if self._error is not None:
+            raise self._error
+        return self._response
+
+    def _resolve(self, response=None, error=None):
+        self._response = response
+        self._error = error
+        self._event.set()
+
+    def __repr__(self):
+        return f'RpcFuture({self.id}, {self.method}, done={self.done()})'
+
+
+class JsonRpcClient():
+    """
+    JSON-RPC 2.0 client writing one request per line to 'writer' and
+    reading one response per line from 'reader'.
+
+    Parameters
+    ----------
+    reader, writer : file-like
+        the transport. only readline(), write() and flush() are used.
+    max_in_flight : int
+        requests allowed to wait for a response at the same time.
+        sending another one first waits for the oldest.
+    """
+    def __init__(self, reader, writer, max_in_flight=1):
+        self.reader = reader
+        self.writer = writer
+        self.max_in_flight = max(1, max_in_flight)
+        self._ids = count(1)
+        self._pending = OrderedDict()
+        self._send_lock = threading.RLock()
+        self._read_lock = threading.Lock()
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    @staticmethod
+    def request(method, params=None, request_id=None):
+        """
+        returns the json rpc 2.0 request object. a single parameter is
+        sent in a list, as the gui expects.
+        """
+        request = {'jsonrpc': '2.0', 'method': method, 'id': request_id}
+        if params is not None:
+            request['params'] = list(params) if isinstance(params, (list, tuple)) else [params]
+        return request
+
+    def call_async(self, method, params=None, request_id=None):
+        """
+        send a request and return its RpcFuture without waiting for the
+        response. 'request_id' defaults to the next id of this client.
+        """
+        with self._send_lock:
+            while len(self._pending) >= self.max_in_flight:
+                self._wait(next(iter(self._pending.values())))
+            if request_id is None:
+                request_id = next(self._ids)
+            future = RpcFuture(self, request_id, method, params)
+            self._pending[request_id] = future
+            self._write(JsonRpcClient.request(method, params, request_id))
+        return future
+
+    def resolved(self, method, params=None, result=True):
+        """
+        an RpcFuture that is already done with 'result', for a request
+        that didn't need to be sent. its id is None.
+        """
+        future = RpcFuture(self, None, method, params)
+        future._resolve({'jsonrpc': '2.0', 'result': result, 'id': None})
+        return future
+
+    def batch_async(self, calls, request_ids=None):
+        """
+        send several requests, given as (method, params) tuples, as one
+        json rpc batch. returns their RpcFutures in the same order. a
+        batch counts as one message against max_in_flight.
+        """
+        with self._send_lock:
+            while len(self._pending) >= self.max_in_flight:
+                self._wait(next(iter(self._pending.values())))
+            if request_ids is None:
+                request_ids = [next(self._ids) for _ in calls]
+            futures = [RpcFuture(self, i, m, p) for i, (m, p) in zip(request_ids, calls)]
+            for future in futures:
+                future.batch = futures
+                self._pending[future.id] = future
+            self._write([JsonRpcClient.request(f.method, f.params, f.id) for f in futures])
+        return futures
+
+    def batch(self, calls, timeout=None):
+        """
+        send a batch and wait for all of its response objects.
+        """
+        return [f.result(timeout) for f in self.batch_async(calls)]
+
+    def call(self, method, params=None, request_id=None, timeout=None):
+        """
+        send a request and wait for its response object.
+        """
+        return self.call_async(method, params, request_id).result(timeout)
+
+    def _write(self, message):
+        line = json.dumps(message) + '\n'
+        with OUTPUT_LOCK:
+            self.writer.write(line)
+            self.writer.flush()
+
+    # read responses until 'future' is resolved. only one thread reads at a
+    # time, the others wait for it to resolve their futures. 'timeout' can't
+    # interrupt a read that is already blocked on the transport.
+    def _wait(self, future, timeout=None):
+        deadline = None if timeout is None else monotonic() + timeout
+        while not future.done():
+            if self._read_lock.acquire(blocking=False):
+                try:
+                    if not future.done():
+                        self._read_response()
+                finally:
+                    self._read_lock.release()
+                continue
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f'No response to {future} after {timeout}s.')
+            future._event.wait(0.01 if remaining is None else min(0.01, remaining))
+        return future
+
+    def _read_response(self):
+        line = self.reader.readline()
+        try:
+            response = json.loads(line)
+            if not isinstance(response, (dict, list)):
+                raise ValueError(line)
+        except ValueError:
+            self._resolve_oldest(error=JsonRpcError(
+                f'Invalid response, expected a json object: {line.strip()!r}'))
+            return None
+        if isinstance(response, list): # batch response
+            for r in response:
+                self._resolve(r)
+        else:
+            self._resolve(response)
+        return None
+
+    def _resolve(self, response):
+        request_id = response.get('id') if isinstance(response, dict) else None
+        future = self._pending.pop(request_id, None)
+        if future is None:
+            return self._resolve_oldest(response)
+        future._resolve(response)
+        return future
+
+    # a single response to a batch (e.g. a parse error) answers all of it
+    def _resolve_oldest(self, response=None, error=None):
+        if not self._pending:
+            logger.warning(f'Unexpected json rpc response: {response}')
+            return None
+        _, future = self._pending.popitem(last=False)
+        future._resolve(response, error)
+        for other in future.batch or ():
+            if self._pending.pop(other.id, None) is not None:
+                other._resolve(response, error)
+        return future
@@ -0,0 +1,90 @@
+"""
+Platform kinematics on arrays.
+
+The joint targets of attack angles, (L, R) pose pairs and axis homes are
+computed for whole arrays of inputs in one call, so pose lists can be
+solved and checked before anything moves. ScanPlatform and BaseAxis use
+the same functions for single values.
+"""
+import numpy as np
+
+# joint order of the arrays returned here
+AXES = ('z_lin', 'y_lin', 'x_rot', 'y_rot', 'target_tilt')
+# valid attack angles in degrees, see ScanPlatform.move()
+ATTACK_RANGE = (-38, 37)
+
+# platform geometry in mm and radians, from the solidworks assembly
+Z_REFERENCE = 609.73 # z_lin position of the scanner pivot
+SCANNER_ARM = 110 # pivot to projector
+SCANNER_ARM_ANGLE = 0.070628
+SCANNER_Y_OFFSET = 7.75
+Y_LIN_HOME = 355.1
+Z_LIN_HOME = 286.511
+X_ROT_HOME_OFFSET = -0.04345051714379008
+POSE_PAIR_SPACING = 12 # between the L and R positions of a pose pair
+POSE_PAIR_STEP = 10 # mm of working distance per pose step
+
+
+def attack_angle_offsets(attack_angle, work_distance):
+    """
+    z_lin and y_lin moves, relative to their homes, that point the
+    scanner at the target with 'attack_angle' in radians. returns an
+    array of shape (..., 2) with (z_lin, y_lin) per angle.
+    """
+    a = np.asarray(attack_angle, dtype=float)
+    wd = np.asarray(work_distance, dtype=float)
+    z = Z_REFERENCE - (wd * np.cos(a) + SCANNER_ARM * np.cos(a - SCANNER_ARM_ANGLE))
+    # the same for positive and negative angles, level is exactly home
+    y = wd * np.sin(a) + SCANNER_ARM * np.sin(a - SCANNER_ARM_ANGLE) + SCANNER_Y_OFFSET
+    y = np.where(a == 0, 0.0, y)
+    return np.stack(np.broadcast_arrays(z, y), axis=-1)
+
+
+def attack_angle_moves(attack_angle, work_distance, x_rot_home):
+    """
+    joint moves relative to home for attack angles in radians. returns
+    an array of shape (..., 3) with (z_lin, y_lin, x_rot) per angle.
+    """
+    a = np.asarray(attack_angle, dtype=float)
+    zy = attack_angle_offsets(a, work_distance)
+    x = np.broadcast_to(a - np.asarray(x_rot_home, dtype=float), zy.shape[:-1])
+    return np.concatenate([zy, x[..., None]], axis=-1)
+
+
+def angle_distance(L, R, work_distance):
+    """
+    the turntable angle in radians and working distance of (L, R) pose
+    pairs. returns an array of shape (..., 2) with (angle, distance).
+    """
+    L = np.asarray(L, dtype=float)
+    R = np.asarray(R, dtype=float)
+    angle = np.arctan((R - L) / POSE_PAIR_SPACING)
+    distance = work_distance + (L + R) / 2 * POSE_PAIR_STEP
+    return np.stack(np.broadcast_arrays(angle, distance), axis=-1)
+
+
+def pose_pair_moves(L, R, work_distance, y_rot_home):
+    """
+    the moves ScanPlatform.move2pose() makes for (L, R) pose pairs.
+    returns an array of shape (..., 2) with (y_rot, z_lin).
+    """
+    ad = angle_distance(L, R, work_distance)
+    return np.stack([ad[..., 0] - y_rot_home, work_distance - ad[..., 1]], axis=-1)
+
+
+def home_positions(scanner_tilt_deg, target_tilt_deg, work_distance):
+    """
+    home position of every axis for scanner and target tilts in degrees.
+    returns an array of shape (..., len(AXES)).
+    """
+    scanner_tilt = np.radians(np.asarray(scanner_tilt_deg, dtype=float))
+    target_tilt = np.radians(np.asarray(target_tilt_deg, dtype=float))
+    wd = np.asarray(work_distance, dtype=float)
+    homes = {
+        'z_lin': Z_LIN_HOME + wd - wd * np.cos(scanner_tilt),
+        'y_lin': Y_LIN_HOME + wd * np.sin(scanner_tilt),
+        'x_rot': scanner_tilt + X_ROT_HOME_OFFSET,
+        'y_rot': np.zeros_like(scanner_tilt),
+        'target_tilt': target_tilt + scanner_tilt,
+    }
+    return np.stack(np.broadcast_arrays(*(homes[axis] for axis in AXES)), axis=-1)
@@ -71,12 +71,11 @@ class LinearAxis(BaseAxis):
         self._settings = {}
         return None
 
-    # move method specific to linear axes with default units and
-    # check bounds implemented before calling move. note that
-    # the current position of any axis is stored after move.
-    def move(self, position):
+    # resolve a position given relative to home into the absolute target
+    # sent to the device. returns the target, its units and whether the
+    # target passed the bounds check, None with check=False.
+    def _move_target(self, position, check=True):
         units = self.units
-        wait_move = self._wait_move
         position = float(position)
         if position < 0:
             position = self._home - abs(position)
@@ -84,7 +83,15 @@ class LinearAxis(BaseAxis):
             position = self._home + position
         else:
             position = self._home
-        if self._in_bounds(position, units):
+        return position, units, self._in_bounds(position, units) if check else None
+
+    # move method specific to linear axes with default units and
+    # check bounds implemented before calling move. note that
+    # the current position of any axis is stored after move.
+    def move(self, position):
+        wait_move = self._wait_move
+        position, units, in_bounds = self._move_target(position)
+        if in_bounds:
             self.move_absolute(position, units, wait_move)
             pos = self.position
             move = f'{self} moved to {pos}'
@@ -92,5 +99,4 @@ class LinearAxis(BaseAxis):
         else:
             move = f'Failed moving {self} to {position}. Check bounds'
             logger.warning(move)
-        self._log_temp()
         return move
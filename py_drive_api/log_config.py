@@ -0,0 +1,90 @@
+"""
+Logging setup for the package.
+
+Records from every module go to INFO.log, WARNING.log and DEBUG.log in
+the logs directory. The logging calls only put the record on a queue, a
+background thread filters it by each file's level, formats it and writes
+it, so motion and polling loops never wait on the disk.
+"""
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from os.path import join
+from sys import base_prefix
+
+logs_dir = join(base_prefix, 'Lib', 'site-packages', 'py_drive_api')
+LOG_FILES = {
+    'INFO.log': logging.INFO,
+    'WARNING.log': logging.WARNING,
+    'DEBUG.log': logging.DEBUG
+}
+LOG_FORMAT = '%(asctime)s %(module)s \t\t%(message)s'
+DATE_FORMAT = '%y%m%d %H%M%S'
+
+_listener = None
+_queue_handler = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The
+    records never leave the process, so they don't have to be made
+    picklable on the logging thread first.
+    """
+    def prepare(self, record):
+        return record
+
+
+def configure(log_dir=None, level=logging.DEBUG, force=False):
+    """
+    send the package's log records to the log files in 'log_dir' (the
+    logs folder in logs_dir by default) through a background writer.
+    like logging.basicConfig() this does nothing if the root logger
+    already has handlers, unless 'force' is set. calling it again is a
+    no-op. returns the QueueListener.
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    if _listener is not None or (root.handlers and not force):
+        return _listener
+    log_dir = join(logs_dir, 'logs') if log_dir is None else log_dir
+    if not os.path.isdir(log_dir):
+        os.makedirs(log_dir)
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    handlers = []
+    for name, file_level in LOG_FILES.items():
+        handler = logging.FileHandler(join(log_dir, name), mode='a', delay=True)
+        handler.setLevel(max(level, file_level))
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+    records = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(records)
+    queue_handler.setLevel(min(h.level for h in handlers))
+    if force:
+        for h in root.handlers[:]:
+            root.removeHandler(h)
+    root.addHandler(queue_handler)
+    root.setLevel(queue_handler.level)
+    _queue_handler = queue_handler
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+    return _listener
+
+
+def shutdown():
+    """
+    write out the queued records and stop the writer thread.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return None
+    listener, _listener = _listener, None
+    logging.getLogger().removeHandler(_queue_handler)
+    _queue_handler = None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    return None
@@ -0,0 +1,139 @@
+"""
+Custom scan metadata file for the 3D Scan gui.
+
+The gui adds the contents of an xml file to the metadata of each scan once
+its path is set with SetScanReferenceDataPath. MetadataSession keeps that
+file's element tree in memory between scans, patches the values that
+changed and only rewrites the file when its contents differ.
+"""
+import logging
+import os
+from os.path import dirname, exists, isdir
+from xml.etree import ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# units of the axes positions written to the metadata
+UNITS = {
+    'target_tilt': 'rad', 'x_rot': 'rad', 'y_rot': 'rad', 'z_lin': 'mm', 'y_lin': 'mm'
+}
+GUIDE_KEYS = ['rotX', 'rotY', 'rotZ', 'angleTolerance', 'icr']
+
+
+class MetadataSession():
+    """
+    The custom metadata xml file at 'path'.
+
+    UI_Scripting.Scan() updates it before each scan with metadata. While
+    the session is active (see UI_Scripting.startMetadataSession()) the
+    gui keeps its reference data path set to the file, otherwise it is
+    set and cleared around each scan.
+
+    Attributes
+    ----------
+    path : str
+    active : bool
+        the gui reads scan metadata from 'path'.
+    writes : int
+        times the file was rewritten.
+
+    Methods
+    -------
+    update(positions: dict, alignment: dict, entries: list) : bool
+        set the metadata for the next scans. returns True if the file
+        was rewritten.
+    text() : str
+        the xml the file holds.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.active = False
+        self.writes = 0
+        self._root = ET.Element('metatree', name='python')
+        self._root.text = '\n\t'
+        self._keys = None # (guide, entry names) the tree was built for
+        self._values = {} # entry name: metaentry element
+        self._guide = None # alignmentGuide element
+        self._written = None
+        if exists(path):
+            with open(path) as f:
+                self._written = f.read()
+
+    def update(self, positions=None, alignment=None, entries=None):
+        """
+        positions: {axis label: value} in default units, mm for linear
+            and rad for rotary axes.
+        alignment: alignmentGuide parameters, keys 'rotX', 'rotY', 'rotZ',
+            'angleTolerance' and 'icr'.
+        entries: (name, value) tuples for any other metaentries.
+        """
+        guide, values = MetadataSession.__fields(positions, alignment, entries)
+        keys = (tuple(guide) if guide else None, tuple(values))
+        changed = keys != self._keys
+        if changed:
+            self.__build(guide, values)
+            self._keys = keys
+        else:
+            if guide:
+                for k, v in guide.items():
+                    if self._guide.get(k) != v:
+                        self._guide.set(k, v)
+                        changed = True
+            for name, value in values.items():
+                element = self._values[name]
+                if element.get('value') != value:
+                    element.set('value', value)
+                    changed = True
+        if not changed and self._written is not None:
+            return False
+        return self.__write(self.text())
+
+    def text(self):
+        return ET.tostring(self._root).decode()
+
+    # alignment guide and metaentry values as the strings written to the file
+    @staticmethod
+    def __fields(positions, alignment, entries):
+        guide = None
+        if alignment:
+            guide = {str(a): str(alignment[a]) for a in alignment if a in GUIDE_KEYS}
+            if guide:
+                if 'angleTolerance' not in guide: guide['angleTolerance'] = '5'
+                if 'icr' not in guide: guide['icr'] = 'None'
+        values = {}
+        if positions:
+            for p in positions:
+                if p in UNITS:
+                    values[f'{p}-absolute_{UNITS[p]}'] = str(positions[p])
+        if entries:
+            for e in entries:
+                if type(e) is tuple and len(e) == 2:
+                    values[str(e[0])] = str(e[1])
+        return guide, values
+
+    def __build(self, guide, values):
+        for e in list(self._root):
+            self._root.remove(e)
+        self._guide = None
+        self._values = {}
+        if guide:
+            self._guide = ET.SubElement(self._root, 'alignmentGuide', guide)
+        for name, value in values.items():
+            self._values[name] = ET.SubElement(self._root, 'metaentry', {'name': name, 'value': value})
+        for idx, e in enumerate(self._root):
+            e.tail = '\n\t' if idx < len(self._root) - 1 else '\n'
+
+    # replace the file in one step, so the gui never reads half of it
+    def __write(self, text):
+        if text == self._written:
+            return False
+        if not isdir(dirname(self.path)):
+            os.makedirs(dirname(self.path))
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, self.path)
+        self._written = text
+        self.writes += 1
+        logger.debug(f'Wrote scan metadata to {self.path}')
+        return True
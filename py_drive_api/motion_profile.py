@@ -0,0 +1,78 @@
+"""
+Trapezoidal motion profile helpers, for predicting how long a move takes
+from its distance and the speed / acceleration settings of an axis.
+"""
+import math
+
+
+def move_duration(distance, speed, accel, decel=None):
+    """
+    returns the time in seconds for a point to point move of 'distance'
+    that starts and ends at rest. the velocity profile is trapezoidal,
+    limited by 'speed', 'accel' and 'decel', or triangular for short moves
+    that never reach 'speed'. all values must share the same distance unit.
+    """
+    distance = abs(distance)
+    if decel is None: decel = accel
+    if distance == 0:
+        return 0.0
+    if speed <= 0 or accel <= 0 or decel <= 0:
+        return math.inf
+    ramp = speed**2 / (2 * accel) + speed**2 / (2 * decel)
+    if distance >= ramp:
+        return speed / accel + speed / decel + (distance - ramp) / speed
+    peak = math.sqrt(2 * distance * accel * decel / (accel + decel))
+    return peak / accel + peak / decel
+
+
+class TrapezoidalProfile():
+    """
+    A point to point move from 'start' to 'target' beginning at time 't0',
+    following the velocity profile described in move_duration().
+
+    Methods
+    -------
+    position(t) : float
+        where the move is at time t.
+    done(t) : bool
+        True once the move has finished at time t.
+    """
+    def __init__(self, start, target, speed, accel, decel=None, t0=0.0):
+        if decel is None: decel = accel
+        self.start = start
+        self.target = target
+        self.speed = speed
+        self.accel = accel
+        self.decel = decel
+        self.t0 = t0
+        self.direction = 1 if target >= start else -1
+        distance = abs(target - start)
+        self.duration = move_duration(distance, speed, accel, decel)
+        # peak speed and the time spent accelerating / cruising
+        ramp = speed**2 / (2 * accel) + speed**2 / (2 * decel)
+        if distance >= ramp:
+            self.peak = speed
+        else:
+            self.peak = math.sqrt(2 * distance * accel * decel / (accel + decel))
+        self.t_accel = self.peak / accel if distance else 0.0
+        self.t_cruise = self.duration - self.t_accel - (self.peak / decel if distance else 0.0)
+        self.end = t0 + self.duration
+
+    def done(self, t):
+        return t >= self.end
+
+    def position(self, t):
+        t = t - self.t0
+        if t <= 0:
+            return self.start
+        if t >= self.duration:
+            return self.target
+        if t < self.t_accel:
+            travelled = 0.5 * self.accel * t**2
+        elif t < self.t_accel + self.t_cruise:
+            travelled = (0.5 * self.accel * self.t_accel**2 +
+                         self.peak * (t - self.t_accel))
+        else:
+            remaining = self.duration - t
+            travelled = abs(self.target - self.start) - 0.5 * self.decel * remaining**2
+        return self.start + self.direction * travelled
@@ -1,39 +1,13 @@
 import logging
 import math
-import os
-from datetime import datetime as dt
 
-from ...py_drive_api import logs_dir
 from ..oriental_motor.serial_com import SerialCom
 from ..oriental_motor.units import Units
+from ..telemetry import TelemetryRecorder, export_csv, read_recording
 
 if __name__=="__main__":__package__='py_drive_api'
 
 
-direntries = os.listdir(logs_dir)
-log_path = os.path.join(logs_dir, 'logs')
-if 'logs' not in direntries:
-    os.makedirs(log_path)
-Logs = {
-    'INFO.log': logging.INFO,
-    'WARNING.log': logging.WARNING,
-    'DEBUG.log': logging.DEBUG
-}
-levels = [Logs[l] for l in Logs]
-log_files = [os.path.join(log_path, f) for f in Logs]
-h = 0
-handlers = []
-for log_file in log_files:
-    handler = logging.FileHandler(log_file, mode='a')
-    handler.setLevel(levels[h])
-    handlers.append(handler)
-logging.basicConfig(
-    format='%(asctime)s %(module)s \t\t%(message)s',
-    datefmt='%y%m%d %H%M%S',
-    style='%',
-    level=logging.NOTSET,
-    handlers=handlers
-)
 logger = logging.getLogger(__name__)
 # generic axis class used for methods applicable to all devices
 
@@ -62,6 +36,9 @@ class BaseAxis( SerialCom):
         upper and lower limits of this axis to avoid collision
     type : str
         'lin' or 'rot' denoting the axis type
+    recorder : TelemetryRecorder
+        records position, torque, temperatures and voltages while
+        csv_log is on, None otherwise
 
     Methods
     -------
@@ -73,6 +50,8 @@ class BaseAxis( SerialCom):
         to change a specified setting to 'value' on associated device
     clear_warnings()
         returns any warnings that were cleared and logs event
+    export_csv_log(path: str)
+        write the recorded telemetry to a csv file
     """
     class OperationSettings:
         """
@@ -113,7 +92,7 @@ class BaseAxis( SerialCom):
         WD : float, optional
             default is 470. the working distance of the scanner.
         csv_log : boolean
-            defaults to False. Turn on to save a list of temp/position data for each axis. Remember to call export_csv_log() or data is lost!
+            defaults to False. Turn on to record temp/position data for each axis. Remember to call export_csv_log() or data is lost!
         """
         self.serial_com = super(BaseAxis, self).__init__(comport, slave_addr, units, operation_setting, True)
         self._WD = BaseAxis._WD
@@ -124,9 +103,7 @@ class BaseAxis( SerialCom):
         self.label = 'None'
         self._home = BaseAxis._get_home(self.label, scanner_tilt_deg, slave_addr)
         self._settings = {None:None}
-        self._csv_logging = False
-        self.temp_log = {} # for storing time-stamped temperature data
-        self.position_log = {} # for storing time-stamped position data
+        self.recorder = None # time-stamped telemetry while csv_log is on
         if __name__=='__main__':self.__setup_LinearTest()
 
     def __setup_LinearTest(self):
@@ -137,30 +114,72 @@ class BaseAxis( SerialCom):
         self._settings = BaseAxis.OperationSettings.LINEAR
 
     def _clear_logs(self):
-        self._temp_log = {}
-        self.position_log = {}
+        if self.recorder is not None:
+            self.recorder.clear()
         return True
 
     @property
     def csv_log(self):
-        return self._csv_logging
-    
+        return self.recorder is not None
+
+    # turning it on records into memory, use record_telemetry() to
+    # record to a file
     @csv_log.setter
     def csv_log(self, value:bool):
-        self._csv_logging = value
+        if value and self.recorder is None:
+            self.recorder = TelemetryRecorder()
+        elif not value and self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
         return True
 
+    def record_telemetry(self, path=None, **kwargs):
+        """
+        start recording position, torque, temperature and voltage samples
+        into a TelemetryRecorder, appending to 'path' if given. kwargs go
+        to TelemetryRecorder. returns the recorder.
+        """
+        self.csv_log = False
+        self.recorder = TelemetryRecorder(path, clock=self._clock, **kwargs)
+        return self.recorder
+
+    def export_csv_log(self, path):
+        """
+        write the telemetry recorded since csv_log was turned on to a csv
+        file, the whole recording file if there is one.
+        """
+        if self.recorder is None:
+            return None
+        if self.recorder.path is not None:
+            self.recorder.flush()
+            return export_csv(read_recording(self.recorder.path), path)
+        return export_csv(self.recorder.columns(), path)
+
     # Finds the home of an axis
     def home_axis(self):
         try:
             wait_move = self._wait_move
         except AttributeError:
             wait_move = True
+        self._seek_home(wait_move)
+        speed = self._return_home(wait_move)
+        self._finish_home(speed)
+        return True
+
+    # homing phases used by ScanPlatform.home_all() to home axes in parallel.
+    # see the zaber BaseAxis for the same split.
+    def _seek_home(self, wait_move=False):
         super(BaseAxis, self).home(wait_move)
+        return None
+
+    def _return_home(self, wait_move=False):
         self.move_absolute(self._home, self.units, wait_move)
+        return None
+
+    def _finish_home(self, speed=None):
         home_axis = f'{self} was homed.'
         logger.info(home_axis)
-        return True
+        return home_axis
 
     # method to get/set the units for a move position from an external file.
     def _set_units(self, key):
@@ -169,16 +188,16 @@ class BaseAxis( SerialCom):
             if self._type == 'lin':
                 if key == 'mm' and self.units != Units.LENGTH_MILLIMETRES:
                     self.units = Units.LENGTH_MILLIMETRES
-                    logger.debug(f'{self} changed units to mm.')
+                    logger.debug('%s changed units to mm.', self)
                     return True
             if self._type == 'rot':
                 if key == 'deg' and self.units != Units.ANGLE_DEGREES:
                     self.units = Units.ANGLE_DEGREES
-                    logger.debug(f'{self} changed units to deg.')
+                    logger.debug('%s changed units to deg.', self)
                     return True
                 if key == 'rad' and self.units != Units.ANGLE_RADIANS:
                     self.units = Units.ANGLE_RADIANS
-                    logger.debug(f'{self} changed units to rad.')
+                    logger.debug('%s changed units to rad.', self)
                     return True
         if isinstance(key, Units) and self.units != key:
             self.units = key
@@ -191,11 +210,14 @@ class BaseAxis( SerialCom):
         output to avoid collisions. Port will be closed upon detection
         of possible problems.
         """
-        if not self._in_bounds(self.get_position(self.units), self.units):
+        status = self.status_snapshot()
+        if self.recorder is not None:
+            self.recorder.record_status(status)
+        if not self._in_bounds(status.position, self.units):
             raise Exception("Out of bounds motion detected!")
-        if not self.torque_monitor() <= 10:
+        if not status.torque <= 10:
             raise Exception("Excessive torque output detected!")
-        return True
+        return status
 
     # checks to see if desired move value is within limits
     # these values are calculated based on solidworks assm.
@@ -218,7 +240,7 @@ class BaseAxis( SerialCom):
                 if value > -limit and value < limit:
                     return True
                 else:
-                    logger.warning(f'{self} triggered bounds warning!')
+                    logger.warning('%s triggered bounds warning!', self)
                     return False
             else:
                 return True
@@ -230,12 +252,12 @@ class BaseAxis( SerialCom):
                     if BaseAxis._YANG > -limit and BaseAxis._YANG < limit:
                         return True
                     else:
-                        logger.warning(f'{self} triggered bounds warning!')
+                        logger.warning('%s triggered bounds warning!', self)
                         return False
         if value > self._bounds[0] and value < self._bounds[1]: # for no type generic axis class
             return True
         else:
-            logger.warning(f'{self} triggered bounds warning!')
+            logger.warning('%s triggered bounds warning!', self)
             return False
 
     # current setting for axis 'self.' returns True if
@@ -249,7 +271,7 @@ class BaseAxis( SerialCom):
     @wait_move.setter
     def wait_move(self, value: bool):
         self._wait_move = value
-        logger.debug(f'{self} set wait move to {value}')
+        logger.debug('%s set wait move to %s', self, value)
         return None
 
     # check working distance
@@ -286,10 +308,8 @@ class BaseAxis( SerialCom):
             if self.units is Units.ANGLE_RADIANS:
                 pos = self.get_position(10) * 0.017453292519943295
             BaseAxis._TargetTilt = pos
-        message = (f'{self} position query:' + '\n\t\t\t\t' +
-                   f'position: {pos}')
-        logger.debug(message)
-        if self.csv_log: self.position_log[dt.now().strftime('%y-%m-%d_%H:%M:%S')] = pos
+        logger.debug('%s position query:\n\t\t\t\tposition: %s', self, pos)
+        if self.recorder is not None: self.recorder.record(position=pos)
         return pos
 
     # call whenever you want to log current temperature of associated device
@@ -305,18 +325,12 @@ class BaseAxis( SerialCom):
             m += f'Driver: {t}' + '\n\t\t\t\t\t'
         except:
             pass
-        if self.csv_log: self._all_temps[dt.now().strftime('%y-%m-%d_%H:%M:%S')] = temps
+        if self.recorder is not None:
+            self.recorder.record(motor_temperature=temps.get('MotorTempDegC'),
+                                 driver_temperature=temps.get('DriverTempDegC'))
         logger.info(m)
         return temps
 
-    # creates the dict if it doesn't exist already
-    @property
-    def _all_temps(self):
-        try:
-            return self._temp_log
-        except AttributeError:
-            return {}
-
     # return axis label from serial number for identifying
     # all connected devices, regardless of the order
     # in which they're daisy-chained together.
@@ -349,6 +363,10 @@ class BaseAxis( SerialCom):
     def settings(self):
         return self._settings
 
+    # operation settings are held on the pc side, so there is nothing to re-read
+    def refresh_settings(self, names=None):
+        return self._settings
+
     # for changing a device setting during a test.
     def set_setting(self, setting: str, value:int):
         try:
@@ -1,47 +1,100 @@
 """
 This class defines methods from the Orientalmotor Modbus dll Library
 not all methods from this dll are defined here.
+
+The dll backend needs pythonnet and windows. The 'rtu' backend in
+modbus_rtu.py implements the same calls in pure python over pyserial.
 """
 import sys
+import time
+from functools import wraps
 from os.path import join
+from threading import RLock
+from types import SimpleNamespace
 
-import clr
 omr_lib_base = join(sys.base_prefix,'Lib','site-packages','py_drive_api','include')
 libpaths = [omr_lib_base,join(omr_lib_base,'x64')]
-[sys.path.append(path) for path in libpaths]
-clr.AddReference('omrlib')
-clr.AddReference('System')
-from Omrlib import PRODUCT
-from Omrlib.Communication import Modbus
-from Omrlib.Communication.ModbusInfo import (ErrorCode, ExceptionCode,
-                                             FrameInfo, SendReceiveData)
-from Omrlib.Products.AZSeries import AzInternalIO
-from System.IO.Ports import Parity as PARITY
-from System.IO.Ports import StopBits as STOPBITS
 
 if __package__!='py_drive_api.oriental_motor': __package__='py_drive_api.oriental_motor'
+from ..oriental_motor.modbus_rtu import ModbusRTU
+from ..oriental_motor.registers import decode, decode_value
 from ..oriental_motor.units import Units
 
+_omrlib = None
+
+
+# loads pythonnet and the omrlib dll the first time the dll backend is used
+def _load_omrlib():
+    global _omrlib
+    if _omrlib is None:
+        import clr
+        [sys.path.append(path) for path in libpaths]
+        clr.AddReference('omrlib')
+        clr.AddReference('System')
+        from Omrlib import PRODUCT
+        from Omrlib.Communication import Modbus
+        from Omrlib.Communication.ModbusInfo import SendReceiveData
+        from Omrlib.Products.AZSeries import AzInternalIO
+        from System.IO.Ports import Parity as PARITY
+        from System.IO.Ports import StopBits as STOPBITS
+        _omrlib = SimpleNamespace(
+            PRODUCT=PRODUCT, Modbus=Modbus, SendReceiveData=SendReceiveData,
+            AzInternalIO=AzInternalIO, PARITY=PARITY, STOPBITS=STOPBITS)
+    return _omrlib
+
+
+# serializes transactions on a port. the lock is only held for one request
+# and its response, so polling loops let other reads through between polls.
+def _transaction(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return locked
+
 
 class ModbusController():
 
-    def __init__(self, port):
-        try:
-            self.mdbslib = Modbus(PRODUCT.AZ)
-        except:
-            from shutil import copy
-            if self.mdbslib.GetArchitecture()==64:
-                copy(
-                    src=join(libpaths[0], 'mdbslib.dll'),
-                    dst=join(omr_lib_base, 'mdbslib.dll')
-                )
-            else:
-                copy(
-                    src=join(libpaths[0], 'mdbslib.dll'),
-                    dst=join(omr_lib_base, 'mdbslib.dll')
-                )
-            self.mdbslib = Modbus(PRODUCT.AZ)
+    DEFAULT_BACKEND = 'dll' if sys.platform == 'win32' else 'rtu'
+
+    def __init__(self, port, backend=DEFAULT_BACKEND, serial_port=None, clock=time):
+        """
+        port : str
+            the com port of the drivers.
+        backend : str
+            'dll' for the omrlib dll, 'rtu' for the pure python backend.
+        serial_port : serial.Serial, optional
+            an open port for the 'rtu' backend to use, e.g. one end of a
+            virtual serial pair.
+        clock : object with time() and sleep(seconds)
+            the time source for waits on this port. defaults to the time
+            module, simulation passes its virtual clock.
+        """
+        self.backend = backend
+        if backend == 'rtu':
+            self.mdbslib = ModbusRTU(serial_port)
+        elif backend == 'dll':
+            omrlib = _load_omrlib()
+            try:
+                self.mdbslib = omrlib.Modbus(omrlib.PRODUCT.AZ)
+            except:
+                from shutil import copy
+                if self.mdbslib.GetArchitecture()==64:
+                    copy(
+                        src=join(libpaths[0], 'mdbslib.dll'),
+                        dst=join(omr_lib_base, 'mdbslib.dll')
+                    )
+                else:
+                    copy(
+                        src=join(libpaths[0], 'mdbslib.dll'),
+                        dst=join(omr_lib_base, 'mdbslib.dll')
+                    )
+                self.mdbslib = omrlib.Modbus(omrlib.PRODUCT.AZ)
+        else:
+            raise ValueError(f'Unknown modbus backend {backend}')
         self.port = port
+        self.lock = RLock()
+        self.clock = clock
 
     @staticmethod
     def _convert_value(units:Units, value, to_device=True): # bool to device units: True / from device units: False
@@ -53,52 +106,65 @@ class ModbusController():
         else:
             return value / units
 
+    @_transaction
     def AlarmReset(self, slave_addr):
         error_code = self.mdbslib.AlarmReset(slave_addr)
         return error_code
 
+    @_transaction
     def GetAlarm(self, slave_addr):
         error_code, alarm = self.mdbslib.GetAlarm(slave_addr, int())
         if not error_code:
             return alarm
         return alarm
 
+    @_transaction
     def Home(self, slave_addr):
         error_code = self.mdbslib.Home(slave_addr)
         if not error_code:
             return error_code
 
+    @_transaction
     def IsPortOpen(self):
         return self.mdbslib.IsPortOpen()
     
+    @_transaction
     def MoveAbsolute(self, slave_addr, position, velocity, accel, decel=None, units=None):
         if decel is None: decel = accel
         if units is not None: position = ModbusController._convert_value(units, position)
         error_code = self.mdbslib.MoveAbsolute(slave_addr, position, velocity, accel, decel)
         return error_code
 
+    @_transaction
     def MoveRelative(self, slave_addr, position, velocity, accel, decel=None, units=None):
         if decel is None: decel = accel
         if units is not None: position = ModbusController._convert_value(units, position)
         error_code = self.mdbslib.MoveRelative(slave_addr, position, velocity, accel, decel)
         return error_code
 
+    @_transaction
     def MoveVelocity(self, slave_addr, velocity, accel, decel=None):
         if decel is None: decel = accel
         error_code = self.mdbslib.MoveVelocity(slave_addr, velocity, accel, decel)
         return error_code
     
+    @_transaction
     def PortClose(self):
         return self.mdbslib.PortClose()
 
+    @_transaction
     def PortOpen(self):
         port = self.port
         baudrate = 115200
-        parity = PARITY.Even
-        stopbits = STOPBITS.One
+        if self.backend == 'dll':
+            parity = _omrlib.PARITY.Even
+            stopbits = _omrlib.STOPBITS.One
+        else:
+            parity, stopbits = 'E', 1 # pyserial PARITY_EVEN, STOPBITS_ONE
         error_code = self.mdbslib.PortOpen(port, baudrate, parity, stopbits)
         return error_code
     
+    @_transaction
     def ReadActualPosition(self, slave_addr, units):
         error_code, position = self.mdbslib.ReadActualPosition(slave_addr, int())
         if position is not None: 
@@ -108,6 +174,7 @@ class ModbusController():
         else:
             return error_code
     
+    @_transaction
     def ReadCommandPosition(self, slave_addr, units=None):
         error_code, position = self.mdbslib.ReadCommandPosition(slave_addr, int())
         if units is not None: 
@@ -117,13 +184,16 @@ class ModbusController():
         else:
             return error_code
 
+    @_transaction
     def ReadInternalOutputIO(self, slave_addr):
-        error_code, IO_output = self.mdbslib.ReadInternalOutPutIO(slave_addr, AzInternalIO())
+        io = _omrlib.AzInternalIO() if self.backend == 'dll' else None
+        error_code, IO_output = self.mdbslib.ReadInternalOutPutIO(slave_addr, io)
         if error_code:
             return IO_output
         else:
             return error_code
 
+    @_transaction
     def ReadParameter(self, slave_addr, register):
         error_code, param_value = self.mdbslib.ReadParameter(slave_addr, register, int())
         if error_code:
@@ -131,6 +201,7 @@ class ModbusController():
         else:
             return error_code
     
+    @_transaction
     def ReadTargetPosition(self, slave_addr, units=None):
         error_code, position = self.mdbslib.ReadTargetPosition(slave_addr, int())
         if units is not None:
@@ -140,34 +211,70 @@ class ModbusController():
         else:
             return error_code
     
+    @_transaction
     def SendDiagnosis(self, slave_addr, data):
-        error_code, response = self.mdbslib.SendDiagnosis(SendReceiveData(), slave_addr, data)
+        if self.backend == 'dll':
+            error_code, response = self.mdbslib.SendDiagnosis(_omrlib.SendReceiveData(), slave_addr, data)
+        else:
+            error_code, response = self.mdbslib.SendDiagnosis(slave_addr, data)
         if error_code:
             return response
         else:
             return error_code
     
-    def SendReadHolding(self, slave_addr, register_addr, num_registers):
+    # data bytes of a read holding registers response, or the error code
+    def _read_holding_data(self, slave_addr, register_addr, num_registers):
+        if self.backend != 'dll':
+            error_code, data = self.mdbslib.ReadHoldingData(
+                slave_addr, register_addr, num_registers)
+            return data if error_code else error_code
         error_code, response = self.mdbslib.SendReadHolding(
-            SendReceiveData(),
+            _omrlib.SendReceiveData(),
             slave_addr,
             register_addr,
             num_registers
         )
         if error_code:
-            bin_response = ''
-            for idx, i in enumerate(response.Response.Frame()[3:-2]): # only iter through data bytes
-                if i==255:
-                    if idx==0:
-                        bin_response += '-' # preserves signed values
-                    else:
-                        continue
-                else:
-                    bin_response += bin(i)[2:]
-            return int(bin_response, base=2)
+            return bytes(response.Response.Frame()[3:-2]) # only data bytes
+        return error_code
+
+    @_transaction
+    def SendReadHolding(self, slave_addr, register_addr, num_registers):
+        """
+        read a signed 16 bit (one register) or 32 bit (two registers)
+        value. raises ValueError for other sizes, use ReadHoldingArray
+        for longer reads.
+        """
+        if num_registers not in (1, 2):
+            raise ValueError(f'SendReadHolding reads 1 or 2 registers, not {num_registers}. Use ReadHoldingArray.')
+        data = self._read_holding_data(slave_addr, register_addr, num_registers)
+        if isinstance(data, bytes):
+            return decode_value(data)
         else:
-            return error_code
-    
+            return data
+
+    @_transaction
+    def ReadHoldingArray(self, slave_addr, register_addr, num_registers, width=32, signed=True):
+        """
+        read a block of up to 125 holding registers in one transaction and
+        decode it into an array of 16 or 32 bit values. returns the error
+        code if the read fails.
+        """
+        data = self._read_holding_data(slave_addr, register_addr, num_registers)
+        if isinstance(data, bytes):
+            return decode(data, width, signed)
+        else:
+            return data
+
+    @_transaction
+    def ReadHoldingRegisters(self, slave_addr, register_addr, num_registers):
+        """
+        read a block of up to 125 holding registers in one transaction.
+        returns the raw 16 bit register values, or the error code.
+        """
+        return self.ReadHoldingArray(slave_addr, register_addr, num_registers, 16, False)
+
+    @_transaction
     def Stop(self, slave_addr):
         return self.mdbslib.Stop(slave_addr)
     
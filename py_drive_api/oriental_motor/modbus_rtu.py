@@ -0,0 +1,273 @@
+"""
+Pure python Modbus RTU master for the AZ series drivers, used by
+ModbusController as an alternative to the omrlib dll. It talks to the
+drivers over pyserial, so it runs on any platform pyserial supports.
+
+The methods mirror the omrlib Modbus methods that ModbusController calls,
+including their (success, value) return tuples, so the controller can use
+either backend the same way.
+"""
+import struct
+
+from ..oriental_motor.exception_lib import CommunicationError
+from ..oriental_motor.oriental import DriverModbusIO
+from ..oriental_motor.oriental import DriverModbusRegisters as REG
+from ..oriental_motor.registers import decode_value, encode
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(frame):
+    """
+    Modbus CRC16 of 'frame', computed one byte at a time from a
+    precomputed table.
+    """
+    crc = 0xFFFF
+    for byte in frame:
+        crc = (crc >> 8) ^ _CRC_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+class InternalIO():
+    """
+    R-OUT signals of a driver, with the same attribute names as the
+    omrlib AzInternalIO object (READY, HOME_END, MOVE, ...).
+    """
+    SIGNALS = ['M0_R', 'M1_R', 'M2_R', 'START_R', 'HOME_END', 'READY',
+               'INFO', 'ALM_A', 'SYS_BSY', 'AREA0', 'AREA1', 'AREA2',
+               'TIM', 'MOVE', 'IN_POS', 'TLC']
+
+    def __init__(self, status):
+        self.status = status
+        for signal in InternalIO.SIGNALS:
+            setattr(self, signal, bool(status & getattr(DriverModbusIO, signal)))
+
+    def __repr__(self):
+        return f'InternalIO({self.status:#06x})'
+
+
+class ModbusRTU():
+    """
+    Modbus RTU master over a pyserial port.
+
+    Requests are built from cached frame templates, and responses are read
+    through a read-ahead buffer that takes everything the port has waiting
+    in one read.
+
+    Parameters
+    ----------
+    serial_port : serial.Serial, optional
+        an already open serial port, or any object with read(), write(),
+        in_waiting and close(). opened by PortOpen() if not given.
+    timeout : float
+        seconds to wait for a response.
+    """
+    READ_HOLDING = 0x03
+    WRITE_SINGLE = 0x06
+    WRITE_MULTIPLE = 0x10
+    DIAGNOSIS = 0x08
+    RETURN_QUERY_DATA = 0x0000  # diagnosis sub-function, echoes the data
+
+    # direct data operation block, 8 32-bit values from 0x0058
+    DIRECT_DATA = 0x0058
+    TYPE_ABSOLUTE = 1
+    TYPE_INCREMENTAL_FEEDBACK = 3
+    TYPE_CONTINUOUS_SPEED = 16
+    OPERATING_CURRENT = 1000    # 1=0.1 %
+    TRIGGER_ALL = 1             # start once all data is written
+
+    INPUT_COMMAND = 0x007D      # lower word of the driver input command
+    ALARM_RESET = 0x0180        # maintenance command
+
+    def __init__(self, serial_port=None, timeout=0.5):
+        self.serial = serial_port
+        self.timeout = timeout
+        self._rx = bytearray()
+        self._templates = {}
+
+    ############################ FRAMING ############################
+    @staticmethod
+    def _frame(pdu):
+        crc = crc16(pdu)
+        return bytes(pdu) + bytes((crc & 0xFF, crc >> 8))
+
+    # read requests repeat all the time, so their frames are built once
+    def _read_request(self, slave_addr, register_addr, num_registers):
+        key = (slave_addr, register_addr, num_registers)
+        frame = self._templates.get(key)
+        if frame is None:
+            frame = ModbusRTU._frame(struct.pack(
+                '>BBHH', slave_addr, ModbusRTU.READ_HOLDING, register_addr, num_registers))
+            self._templates[key] = frame
+        return frame
+
+    # fill the read-ahead buffer until it holds 'size' bytes, then take them
+    def _receive(self, size):
+        while len(self._rx) < size:
+            chunk = self.serial.read(max(size - len(self._rx), self.serial.in_waiting))
+            if not chunk:
+                raise CommunicationError(f'Modbus response timed out on {self.serial}.')
+            self._rx += chunk
+        data = bytes(self._rx[:size])
+        del self._rx[:size]
+        return data
+
+    # send one request and return the validated response frame
+    def _transaction(self, request, response_size):
+        if not self.IsPortOpen():
+            raise CommunicationError('Modbus port is not open.')
+        self._rx.clear() # one outstanding request, anything left over is stale
+        self.serial.write(request)
+        head = self._receive(3)
+        if head[1] & 0x80:
+            frame = head + self._receive(2)
+        elif head[1] == ModbusRTU.READ_HOLDING:
+            frame = head + self._receive(head[2] + 2)
+        else:
+            frame = head + self._receive(response_size - 3)
+        if crc16(frame[:-2]) != frame[-2] | frame[-1] << 8:
+            raise CommunicationError(f'Modbus response CRC error: {frame.hex()}')
+        if head[0] != request[0]:
+            raise CommunicationError(f'Modbus response from slave {head[0]}, expected {request[0]}.')
+        if head[1] & 0x80:
+            raise CommunicationError(f'Modbus exception code {frame[2]} from slave {head[0]}.')
+        return frame
+
+    def _read(self, slave_addr, register_addr, num_registers):
+        frame = self._transaction(
+            self._read_request(slave_addr, register_addr, num_registers),
+            5 + 2 * num_registers)
+        return frame[3:-2]
+
+    def _write(self, slave_addr, register_addr, data):
+        count = len(data) // 2
+        request = ModbusRTU._frame(struct.pack(
+            '>BBHHB', slave_addr, ModbusRTU.WRITE_MULTIPLE, register_addr, count, len(data)) + data)
+        self._transaction(request, 8)
+        return True
+
+    def _write_single(self, slave_addr, register_addr, value):
+        request = ModbusRTU._frame(struct.pack(
+            '>BBHH', slave_addr, ModbusRTU.WRITE_SINGLE, register_addr, value))
+        self._transaction(request, 8)
+        return True
+
+    # the driver echoes the request, data included
+    def _diagnosis(self, slave_addr, data):
+        request = ModbusRTU._frame(struct.pack(
+            '>BBHH', slave_addr, ModbusRTU.DIAGNOSIS, ModbusRTU.RETURN_QUERY_DATA, data))
+        response = self._transaction(request, 8)
+        if response != request:
+            raise CommunicationError(f'Modbus diagnosis echo mismatch: {response.hex()}')
+        return struct.unpack('>H', response[4:6])[0]
+
+    # set and clear an input command bit, e.g. ZHOME or STOP
+    def _pulse_input(self, slave_addr, bit):
+        self._write_single(slave_addr, ModbusRTU.INPUT_COMMAND, bit)
+        return self._write_single(slave_addr, ModbusRTU.INPUT_COMMAND, 0)
+
+    def _direct_data(self, slave_addr, op_type, position, velocity, accel, decel):
+        data = encode([0, op_type, int(round(position)), int(round(velocity)),
+                       int(accel), int(decel), ModbusRTU.OPERATING_CURRENT,
+                       ModbusRTU.TRIGGER_ALL])
+        return self._write(slave_addr, ModbusRTU.DIRECT_DATA, data)
+
+    # run a request, returning False instead of raising like the dll does
+    @staticmethod
+    def _call(request, *args):
+        try:
+            return True, request(*args)
+        except CommunicationError:
+            return False, None
+
+    ######################## omrlib METHODS ########################
+    def AlarmReset(self, slave_addr):
+        ok, _ = ModbusRTU._call(self._write, slave_addr, ModbusRTU.ALARM_RESET, encode([1]))
+        if ok:
+            ok, _ = ModbusRTU._call(self._write, slave_addr, ModbusRTU.ALARM_RESET, encode([0]))
+        return ok
+
+    def GetAlarm(self, slave_addr, alarm=None):
+        ok, data = ModbusRTU._call(self._read, slave_addr, REG.PRESENT_ALARM, 2)
+        return ok, decode_value(data) if ok else alarm
+
+    def Home(self, slave_addr):
+        return ModbusRTU._call(self._pulse_input, slave_addr, DriverModbusIO.ZHOME)[0]
+
+    def IsPortOpen(self):
+        return self.serial is not None and getattr(self.serial, 'is_open', True)
+
+    def MoveAbsolute(self, slave_addr, position, velocity, accel, decel):
+        return ModbusRTU._call(
+            self._direct_data, slave_addr, ModbusRTU.TYPE_ABSOLUTE,
+            position, velocity, accel, decel)[0]
+
+    def MoveRelative(self, slave_addr, position, velocity, accel, decel):
+        return ModbusRTU._call(
+            self._direct_data, slave_addr, ModbusRTU.TYPE_INCREMENTAL_FEEDBACK,
+            position, velocity, accel, decel)[0]
+
+    # the sign of 'velocity' sets the direction
+    def MoveVelocity(self, slave_addr, velocity, accel, decel):
+        return ModbusRTU._call(
+            self._direct_data, slave_addr, ModbusRTU.TYPE_CONTINUOUS_SPEED,
+            0, velocity, accel, decel)[0]
+
+    def PortClose(self):
+        if self.serial is not None:
+            self.serial.close()
+        return True
+
+    def PortOpen(self, port, baudrate, parity, stopbits):
+        if self.IsPortOpen():
+            return True
+        import serial
+        self.serial = serial.Serial(
+            port, baudrate, bytesize=serial.EIGHTBITS, parity=parity,
+            stopbits=stopbits, timeout=self.timeout)
+        return True
+
+    def ReadActualPosition(self, slave_addr, position=None):
+        ok, data = ModbusRTU._call(self._read, slave_addr, REG.FEEDBACK_POSITION, 2)
+        return ok, decode_value(data) if ok else position
+
+    def ReadCommandPosition(self, slave_addr, position=None):
+        ok, data = ModbusRTU._call(self._read, slave_addr, REG.COMMAND_POSITION, 2)
+        return ok, decode_value(data) if ok else position
+
+    def ReadInternalOutPutIO(self, slave_addr, io=None):
+        ok, data = ModbusRTU._call(self._read, slave_addr, REG.OUTPUT_STATUS, 2)
+        return ok, InternalIO(decode_value(data, False)) if ok else io
+
+    def ReadParameter(self, slave_addr, register, value=None):
+        ok, data = ModbusRTU._call(self._read, slave_addr, register, 2)
+        return ok, decode_value(data) if ok else value
+
+    # the driver has no separate target register, the command position
+    # is where the current operation is heading
+    def ReadTargetPosition(self, slave_addr, position=None):
+        ok, data = ModbusRTU._call(self._read, slave_addr, REG.COMMAND_POSITION, 2)
+        return ok, decode_value(data) if ok else position
+
+    # sends the 16 bit 'data' with the return query data diagnosis and
+    # returns the echoed value
+    def SendDiagnosis(self, slave_addr, data):
+        return ModbusRTU._call(self._diagnosis, slave_addr, data)
+
+    # returns the data bytes of the response
+    def ReadHoldingData(self, slave_addr, register_addr, num_registers):
+        ok, data = ModbusRTU._call(self._read, slave_addr, register_addr, num_registers)
+        return ok, data
+
+    def Stop(self, slave_addr):
+        return ModbusRTU._call(self._pulse_input, slave_addr, DriverModbusIO.STOP)[0]
@@ -86,4 +86,28 @@ class DriverModbusIO:
     TIM_OFF      =   0
     MOVE_OFF     =   0
     IN_POS_OFF   =   0
-    TLC_OFF      =   0
\ No newline at end of file
+    TLC_OFF      =   0
+
+class DriverModbusRegisters:
+    """
+    Holding register addresses of the AZ series monitor commands. 32 bit
+    values take two registers, upper word first.
+    """
+    # Driver output status, R-OUT bits of DriverModbusIO in the lower word
+    OUTPUT_STATUS           =   0x007E
+
+    # Monitor block, read together by SerialCom.status_snapshot()
+    PRESENT_ALARM           =   0x0080
+    COMMAND_POSITION        =   0x00C4
+    FEEDBACK_POSITION       =   0x00CC
+    TORQUE_MONITOR          =   0x00D6      # 1=0.1 %
+    DRIVER_TEMPERATURE      =   0x00F8      # 1=0.1 deg-C
+    MOTOR_TEMPERATURE       =   0x00FA      # 1=0.1 deg-C
+    MONITOR_BLOCK_START     =   COMMAND_POSITION
+    MONITOR_BLOCK_END       =   MOTOR_TEMPERATURE + 2
+
+    # Voltage block
+    INVERTER_VOLTAGE        =   0x0146      # 1=0.1 V
+    SUPPLY_VOLTAGE          =   0x0148      # 1=0.1 V
+    VOLTAGE_BLOCK_START     =   INVERTER_VOLTAGE
+    VOLTAGE_BLOCK_END       =   SUPPLY_VOLTAGE + 2
@@ -0,0 +1,46 @@
+"""
+Decoding of Modbus holding register data. The AZ drivers send register
+data big-endian, with 32 bit values split over two registers, upper
+word first.
+"""
+import struct
+from array import array
+
+# struct / array type codes for each register value width and signedness
+_TYPE_CODES = {
+    (16, True): 'h',
+    (16, False): 'H',
+    (32, True): 'i',
+    (32, False): 'I',
+}
+
+
+def decode(data, width=32, signed=True):
+    """
+    decode the data bytes of a read holding registers response into
+    an array of 16 or 32 bit integers. trailing bytes that don't fill
+    a whole value are ignored.
+    """
+    code = _TYPE_CODES[(width, signed)]
+    size = width // 8
+    count = len(data) // size
+    return array(code, struct.unpack(f'>{count}{code}', bytes(data[:count * size])))
+
+
+def decode_value(data, signed=True):
+    """
+    decode the data bytes of one 16 bit (one register) or 32 bit
+    (two register) value. raises ValueError for other sizes, decode()
+    those instead.
+    """
+    if len(data) not in (2, 4):
+        raise ValueError(f'{len(data)} data bytes are not one value. Values are 2 or 4 bytes (1 or 2 registers).')
+    return decode(data, 8 * len(data), signed)[0]
+
+
+def encode(values, width=32, signed=True):
+    """
+    encode integers into big-endian register data bytes.
+    """
+    code = _TYPE_CODES[(width, signed)]
+    return struct.pack(f'>{len(values)}{code}', *values)
@@ -37,22 +37,37 @@ class RotaryAxis(BaseAxis):
         self._home = BaseAxis._get_home(self.label, scanner_tilt_deg, target_tilt)
         self._bounds = (-2*math.pi, 2*math.pi)
         self._settings = operation_setting
-        self._csv_logging = False
 
     def home_axis(self):
         self.move(self._home)
-        logger.info(f'{self} is at home')
+        logger.info('%s is at home', self)
         return True
 
+    # the tilt axis has no sensor homing, it only returns to self._home
+    def _seek_home(self, wait_move=False):
+        return None
+
+    def _finish_home(self, speed=None):
+        home_axis = f'{self} is at home'
+        logger.info(home_axis)
+        return home_axis
+
+    # the tilt axis is commanded in absolute positions, so the target is
+    # the position itself. returns the target, its units and whether the
+    # position passed the bounds check, None with check=False.
+    def _move_target(self, position: float, check=True):
+        units = self.units
+        return position, units, self._in_bounds(position, units) if check else None
+
     # move method specific to rotational axes. position is checked
     # to ensure within bounds prior to calling move.
     def move(self, position: float):
         """
         Moves rotary axis to 'position' in current units setting.
         """
-        units = self.units
         wait_move = self._wait_move
-        if self._in_bounds(position, units):
+        position, units, in_bounds = self._move_target(position)
+        if in_bounds:
             super(RotaryAxis, self).move_absolute(position, units, wait_move) # flip sign of position to ensure that rotation is CCW for positive!
             if self.label == 'target_tilt':
                 BaseAxis._TargetTilt = self.position
@@ -63,7 +78,6 @@ class RotaryAxis(BaseAxis):
         else:
             move = f'Failed moving {self} to {position} due to possible collision'
             logger.warning(move)
-        self._log_temp()
         return move
 
     # method for moving in degrees instead of default radians. this is
@@ -83,5 +97,4 @@ class RotaryAxis(BaseAxis):
         else:
             move_degrees = f'Failed moving {self} to {position}.'
             logger.warning(move_degrees)
-        self._log_temp()
         return move_degrees
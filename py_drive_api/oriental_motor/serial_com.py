@@ -9,12 +9,26 @@ TX Waiting: 3ms --- 30                      *** modbus 30
 Silent Int: varies/auto --- 0               *** modbus 0
 """
 import sys
-from time import sleep, time
+from array import array
+from collections import namedtuple
 
-from serial.tools.list_ports_windows import comports
+from serial.tools.list_ports import comports
 from .modbus_controller import ModbusController
+from ..jsonrpc import print_line
+from ..motion_profile import move_duration
+from ..oriental_motor.exception_lib import MotionException
+from ..oriental_motor.oriental import DriverModbusIO as IO
+from ..oriental_motor.oriental import DriverModbusRegisters as REG
 from ..oriental_motor.units import Units
 
+# state of an axis from SerialCom.status_snapshot(). positions are in the
+# axis units, torque in percent, temperatures in deg-C and voltages in volts.
+AxisStatus = namedtuple('AxisStatus', [
+    'time', 'position', 'command_position', 'ready', 'home_end', 'moving',
+    'alarm', 'torque', 'driver_temperature', 'motor_temperature',
+    'inverter_voltage', 'supply_voltage'])
+
+
 
 class SerialCom():
     """
@@ -74,12 +88,24 @@ class SerialCom():
         param   wait
         return error_code
 
+    status_snapshot()   :
+        return  AxisStatus with position, IO flags, torque,
+                temperatures and voltages
+    
     stop()              :
         return error_code
 
     wait_until_idle()   :
-        return error_code
+        param   timeout
+        return  True once READY, raises MotionException on
+                timeout, alarm or stall
     """
+    POLL_MIN = 0.005        # seconds between the first idle polls
+    POLL_MAX = 0.25         # seconds, longest backoff between idle polls
+    STALL_TIMEOUT = 2.0     # seconds without position change past the predicted end
+    TIMEOUT_MARGIN = 10.0   # seconds added to the predicted duration for the default timeout
+    DEFAULT_TIMEOUT = 120.0 # seconds, when the move duration can't be predicted
+
     # attach this object to dagobah axis class for handling serial requests to - from 
     # computer / devices 
     def __init__(self, controller:ModbusController, 
@@ -93,6 +119,13 @@ class SerialCom():
         self.address = slave_addr
         self.units = units
         self.op_settings = operation_settings
+        self._target = None         # last commanded absolute position, native units
+        self._move_end = None       # predicted time the last commanded move finishes
+
+    # time source for waits, the time module unless the port is simulated
+    @property
+    def _clock(self):
+        return self.com_device.clock
 
     def close_port(self):
         """
@@ -128,24 +161,23 @@ class SerialCom():
         """
         position = self.com_device.ReadActualPosition(self.address, units)
         if position is None:
-            print(f'No position returned. Port Open: {self.com_device.IsPortOpen()}')
+            print_line(f'No position returned. Port Open: {self.com_device.IsPortOpen()}')
         position = ModbusController._convert_value(units, position, False)
         return position
 
     # serial home command ABZO sensor home position detect
     # return to home operation
-    def home(self, wait_move=True):
+    def home(self, wait_move=True, timeout=None):
         """
         send device to 'home' position through serial move. 
         waits for operation to finish if wait_move = True (default)
         """
         self.com_device.Home(self.address)
-        if wait_move: 
-            end_move = self.com_device.ReadInternalOutputIO(
-                self.address).HOME_END
-            while not end_move:
-                end_move = self.com_device.ReadInternalOutputIO(
-                    self.address).HOME_END
+        self._target = None
+        self._move_end = None
+        if wait_move:
+            if timeout is None: timeout = SerialCom.DEFAULT_TIMEOUT
+            self.__poll(lambda io: io.HOME_END, self._clock.time() + timeout)
         return True
 
     def inverter_voltage(self):
@@ -163,7 +195,7 @@ class SerialCom():
         reads position, and determines if axis is moving based on deviation.
         """
         p1 = self.get_position(self.units)
-        sleep(0.001)
+        self._clock.sleep(0.001)
         if self.get_position(self.units)==p1:
             return False
         else:
@@ -212,6 +244,7 @@ class SerialCom():
         if wait is None: wait = self._wait_move
         if units is not Units.NATIVE_UNITS:
             pos = ModbusController._convert_value(units, pos)
+        start = self.__last_target()
         self.com_device.MoveAbsolute(
             slave_addr=self.address,
             position=pos,
@@ -219,6 +252,11 @@ class SerialCom():
             accel=self.op_settings['accel'],
             decel=self.op_settings['decel']
         )
+        if start is None:
+            self._move_end = None
+        else:
+            self.__predict_end(pos - start)
+        self._target = pos
         if wait:
             self.wait_until_idle()
         return True
@@ -233,6 +271,7 @@ class SerialCom():
         if wait is None: wait = self._wait_move
         if units is not Units.NATIVE_UNITS:
             pos = ModbusController._convert_value(units, pos)
+        start = self.__last_target()
         self.com_device.MoveRelative(
             self.address,
             pos,
@@ -240,10 +279,47 @@ class SerialCom():
             self.op_settings['accel'],
             self.op_settings['decel']
         )
+        self.__predict_end(pos)
+        if start is not None: self._target = start + pos
         if wait:
             self.wait_until_idle()
         return True
 
+    def status_snapshot(self):
+        """
+        read position, READY / HOME_END / MOVE / alarm flags, torque,
+        temperatures and voltages of the axis. the values come from three
+        block reads (output status, monitor block and voltage block)
+        instead of one transaction each, and are returned as an AxisStatus.
+        """
+        read = self.com_device.ReadHoldingArray
+        with self.com_device.lock: # one consistent snapshot
+            out = read(self.address, REG.OUTPUT_STATUS, 2)
+            mon = read(self.address, REG.MONITOR_BLOCK_START,
+                REG.MONITOR_BLOCK_END - REG.MONITOR_BLOCK_START)
+            volt = read(self.address, REG.VOLTAGE_BLOCK_START,
+                REG.VOLTAGE_BLOCK_END - REG.VOLTAGE_BLOCK_START)
+        if not all(isinstance(r, array) for r in (out, mon, volt)):
+            raise MotionException(f'Axis {self.address} status read failed.')
+        r_out = out[0]
+        monitor = lambda register: mon[(register - REG.MONITOR_BLOCK_START) // 2]
+        voltage = lambda register: volt[(register - REG.VOLTAGE_BLOCK_START) // 2]
+        return AxisStatus(
+            time=self._clock.time(),
+            position=ModbusController._convert_value(
+                self.units, monitor(REG.FEEDBACK_POSITION), False),
+            command_position=ModbusController._convert_value(
+                self.units, monitor(REG.COMMAND_POSITION), False),
+            ready=bool(r_out & IO.READY),
+            home_end=bool(r_out & IO.HOME_END),
+            moving=bool(r_out & IO.MOVE),
+            alarm=bool(r_out & IO.ALM_A),
+            torque=monitor(REG.TORQUE_MONITOR) / 10,
+            driver_temperature=monitor(REG.DRIVER_TEMPERATURE) / 10,
+            motor_temperature=monitor(REG.MOTOR_TEMPERATURE) / 10,
+            inverter_voltage=voltage(REG.INVERTER_VOLTAGE) / 10,
+            supply_voltage=voltage(REG.SUPPLY_VOLTAGE) / 10)
+
     def stop(self):
         """
         immediately stop device.
@@ -272,16 +348,75 @@ class SerialCom():
             num_registers=2
         ) / 10 # shown as percentage value
 
+    # the last commanded position, or where the motor is if nothing was
+    # commanded since connecting or homing, in native units. None if the
+    # position can't be read.
+    def __last_target(self):
+        if self._target is None:
+            self._target = self.com_device.ReadActualPosition(self.address, Units.NATIVE_UNITS)
+        return self._target
+
+    # predicted end of a move of 'distance' native units started now.
+    # speed is in Hz and accel/decel in 1=0.001 kHz/s, i.e. steps/s^2.
+    def __predict_end(self, distance):
+        duration = move_duration(
+            distance,
+            self.op_settings['speed'],
+            self.op_settings['accel'],
+            self.op_settings['decel'])
+        self._move_end = self._clock.time() + duration
+        return self._move_end
+
+    # poll the internal output IO until 'done(io)' is true. the poll interval
+    # backs off from POLL_MIN to POLL_MAX, and the port is free while sleeping.
+    def __poll(self, done, deadline, stall_check_after=None):
+        interval = SerialCom.POLL_MIN
+        last_position = None
+        last_change = self._clock.time()
+        while True:
+            io = self.com_device.ReadInternalOutputIO(self.address)
+            valid = hasattr(io, 'READY') # error code instead of IO on a failed read
+            if valid and done(io):
+                return True
+            now = self._clock.time()
+            if valid and io.ALM_A:
+                raise MotionException(f'Axis {self.address} alarm while moving: {self.com_device.GetAlarm(self.address)}')
+            if now > deadline:
+                raise MotionException(f'Axis {self.address} timed out waiting for motion to finish.')
+            if stall_check_after is not None and now > stall_check_after:
+                position = self.com_device.ReadActualPosition(self.address, Units.NATIVE_UNITS)
+                if position != last_position:
+                    last_position = position
+                    last_change = now
+                elif now - last_change > SerialCom.STALL_TIMEOUT:
+                    raise MotionException(f'Axis {self.address} stalled at {position} before reaching its target.')
+            self._clock.sleep(min(interval, max(deadline - now, 0)))
+            interval = min(interval * 2, SerialCom.POLL_MAX)
+
     def wait_until_idle(self, timeout=None):
         """
-        poll device until it has READY output.
+        wait until the device shows its READY output.
+        the wait sleeps until shortly before the predicted end of the last
+        commanded move, then polls with a growing interval.
         Params:
-        timeout given in seconds. If none is specified, then infinite.
-        """
-        start = time()
-        while not self.com_device.ReadInternalOutputIO(self.address).READY:
-            if timeout is not None:
-                if time()-start>timeout: break
+        timeout given in seconds. If none is specified, then the predicted
+        move duration plus TIMEOUT_MARGIN, or DEFAULT_TIMEOUT if the move
+        duration is unknown.
+        raises MotionException on timeout, alarm or a stalled axis.
+        """
+        start = self._clock.time()
+        move_end = self._move_end
+        if timeout is None:
+            if move_end is None:
+                timeout = SerialCom.DEFAULT_TIMEOUT
+            else:
+                timeout = max(move_end - start, 0) + SerialCom.TIMEOUT_MARGIN
+        deadline = start + timeout
+        if move_end is not None and move_end - SerialCom.POLL_MAX > start:
+            self._clock.sleep(min(move_end - SerialCom.POLL_MAX, deadline) - start)
+        stall_check_after = None if move_end is None else move_end + SerialCom.POLL_MAX
+        self.__poll(lambda io: io.READY, deadline, stall_check_after)
+        self._move_end = None
         return True
 
 if __name__=='__main__':
@@ -0,0 +1,172 @@
+"""
+Overlaps platform motion with the gui requests that don't need the rig
+to be still.
+
+Captures (addCalibrationView, Scan) must wait until the platform has
+stopped. Calibration compute, view export, project saves and clearing
+views only keep the gui busy, and the next moves can run while they do.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .ui_scripting import UI_Scripting
+
+logger = logging.getLogger(__name__)
+
+
+class Pipeline():
+    """
+    Schedules gui requests around the motion of a ScanPlatform.
+
+    Background requests run in submission order on a single worker thread
+    and return concurrent.futures.Future objects. Captures run on the
+    calling thread, once every background request has finished and the
+    platform is idle. Moves are not deferred at all.
+
+    Use it as a context manager so that background work is finished when
+    the block exits.
+
+    Parameters
+    ----------
+    platform : ScanPlatform
+    ui : UI_Scripting
+    clock : module or SimulationClock, optional
+        time source, the platform's clock by default. with a
+        SimulationClock, background requests run on their own virtual
+        timeline so overlap shows in virtual time.
+
+    Attributes
+    ----------
+    background_time : float
+        seconds of gui work that ran in the background.
+    blocked_time : float
+        seconds captures had to wait for background work to finish. the
+        difference to background_time is the idle time saved.
+
+    Methods
+    -------
+    move(axes_positions: dict, **kwargs)
+        ScanPlatform.move(), right away.
+    capture_view(name: str, target_type: str) : bool
+        addCalibrationView() once background work is done and idle.
+    scan(**kwargs) : bool
+        UI_Scripting.Scan() once background work is done and idle.
+    calibrate(path) / export_calibration_views(path) / save_project(path) /
+    clear_views() : Future
+        the UI_Scripting requests, in the background.
+    background(request, *args, **kwargs) : Future
+        any other callable that doesn't need the rig to be still.
+    barrier() : list
+        wait for all background work and return its results.
+    """
+    def __init__(self, platform, ui=UI_Scripting, clock=None):
+        self.platform = platform
+        self.ui = ui
+        if clock is None:
+            clock = getattr(platform, 'clock', time)
+        self.clock = clock
+        self.background_time = 0.0
+        self.blocked_time = 0.0
+        self._executor = ThreadPoolExecutor(1, 'Pipeline')
+        self._pending = []
+        self._worker_time = clock.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+        return False
+
+    ########################## BACKGROUND ##########################
+    def background(self, request, *args, **kwargs):
+        """
+        run 'request' on the worker thread after any earlier background
+        work. returns its Future.
+        """
+        future = self._executor.submit(
+            self.__run, request, args, kwargs, self.clock.time())
+        self._pending.append((getattr(request, '__name__', str(request)), future))
+        return future
+
+    def calibrate(self, zipFilePath='', auto_clear_views=True):
+        return self.background(self.ui.calibrate, zipFilePath, auto_clear_views)
+
+    def export_calibration_views(self, zip_path):
+        return self.background(self.ui.exportCalibrationViews, zip_path)
+
+    def save_project(self, filepath=None):
+        return self.background(self.ui.saveProject, filepath)
+
+    def clear_views(self):
+        return self.background(self.ui.clearViews)
+
+    # background requests start once they are submitted and the previous
+    # one has finished
+    def __run(self, request, args, kwargs, submitted):
+        timeline = getattr(self.clock, 'timeline', None)
+        if timeline is None:
+            return self.__timed(request, args, kwargs)
+        with timeline(max(submitted, self._worker_time)):
+            return self.__timed(request, args, kwargs)
+
+    def __timed(self, request, args, kwargs):
+        start = self.clock.time()
+        try:
+            return request(*args, **kwargs)
+        finally:
+            self._worker_time = self.clock.time()
+            self.background_time += self._worker_time - start
+
+    def barrier(self):
+        """
+        wait for all background work. returns the results in submission
+        order. a request that raised is logged and its exception returned
+        in place of a result.
+        """
+        start = self.clock.time()
+        results = []
+        for name, future in self._pending:
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f'Background request {name} failed: {e}')
+                result = e
+            else:
+                if result is False:
+                    logger.warning(f'Background request {name} failed.')
+            results.append(result)
+        self._pending = []
+        if hasattr(self.clock, 'advance_to'):
+            self.clock.advance_to(self._worker_time)
+        self.blocked_time += self.clock.time() - start
+        return results
+
+    ########################### FOREGROUND ###########################
+    def move(self, axes_positions, **kwargs):
+        return self.platform.move(axes_positions, **kwargs)
+
+    # captures need the gui free and the rig still
+    def _ready_to_capture(self):
+        self.barrier()
+        self.platform.wait_idle()
+        return True
+
+    def capture_view(self, name=None, target_type='FlatPlate'):
+        self._ready_to_capture()
+        return self.ui.addCalibrationView(name, target_type)
+
+    def scan(self, *args, **kwargs):
+        self._ready_to_capture()
+        return self.ui.Scan(*args, **kwargs)
+
+    def close(self):
+        """
+        finish background work and stop the worker thread.
+        """
+        results = self.barrier()
+        self._executor.shutdown()
+        logger.info(f'Pipeline ran {self.background_time:.1f}s of gui work in the background, '
+                    f'captures waited {self.blocked_time:.1f}s for it.')
+        return results
@@ -0,0 +1,143 @@
+"""
+Travel time optimal ordering of pose lists.
+
+Calibration views don't depend on the order they are captured in, but
+pose files run in file order, with long z_lin / y_lin travels and full
+turntable turns between neighbouring poses. The travel time between
+every pair of poses is estimated from the trapezoidal motion profile of
+each axis. The poses are then ordered by nearest neighbour and improved
+by 2-opt, like an open travelling salesman path from where the axes are
+now. A reordering is only kept if it doesn't make more moves fail the
+collision checks than the given order does.
+"""
+import numpy as np
+
+
+def move_durations(distance, speed, accel):
+    """
+    motion_profile.move_duration() for arrays of distances, with decel
+    equal to accel.
+    """
+    distance = np.abs(np.asarray(distance, dtype=float))
+    ramp = speed**2 / accel
+    cruise = 2 * speed / accel + (distance - ramp) / speed
+    triangle = 2 * np.sqrt(distance / accel)
+    return np.where(distance >= ramp, cruise, triangle)
+
+
+def travel_times(positions, speeds, accels, start=None, coordinated=False):
+    """
+    estimated seconds between every pair of poses. 'positions' has a row
+    per pose and a column per axis, NaN where a pose doesn't move an
+    axis, which then costs nothing. 'speeds' and 'accels' are per axis.
+    axes move one after another like ScanPlatform.move(), or all at once
+    with 'coordinated'. with a 'start' position the first row and column
+    are the times from there, and the poses follow.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if start is not None:
+        positions = np.vstack([np.asarray(start, dtype=float), positions])
+    times = np.zeros((len(positions), len(positions)))
+    for axis in range(positions.shape[1]):
+        column = positions[:, axis]
+        t = move_durations(column[:, None] - column[None, :], speeds[axis], accels[axis])
+        t = np.nan_to_num(t, nan=0.0)
+        times = np.maximum(times, t) if coordinated else times + t
+    return times
+
+
+def path_time(times, path):
+    """
+    seconds to visit 'path', a sequence of row indices of 'times'.
+    """
+    path = np.asarray(path)
+    return float(times[path[:-1], path[1:]].sum()) if len(path) > 1 else 0.0
+
+
+class PoseOrder():
+    """
+    A reordering of a pose list.
+
+    Attributes
+    ----------
+    order : list
+        indices of the poses in the given list, in the new order.
+    given : float
+        estimated seconds of travel in the given order.
+    optimized : float
+        estimated seconds of travel in the new order.
+    saved : float
+        given - optimized.
+
+    Methods
+    -------
+    apply(poses: list) : list
+        the poses in the new order.
+    """
+    def __init__(self, order, given, optimized):
+        self.order = order
+        self.given = given
+        self.optimized = optimized
+
+    @property
+    def saved(self):
+        return self.given - self.optimized
+
+    def apply(self, poses):
+        return [poses[i] for i in self.order]
+
+    def format(self):
+        percent = 100 * self.saved / self.given if self.given else 0.0
+        return (f'{len(self.order)} poses: {self.given:.1f}s of travel in the given order, '
+                f'{self.optimized:.1f}s reordered, {self.saved:.1f}s ({percent:.0f}%) saved')
+
+    def __str__(self):
+        return self.format()
+
+
+def optimize(times, feasible=None, max_passes=100):
+    """
+    order poses to minimize the travel time. 'times' is travel_times()
+    with a start position, so row 0 is the start and row i + 1 pose i.
+    'feasible' is called with a candidate order of the pose indices and
+    returns False to reject it. returns a PoseOrder.
+    """
+    feasible = feasible or (lambda order: True)
+    n = len(times) - 1
+    given = list(range(n))
+    given_time = path_time(times, [0] + [i + 1 for i in given])
+    # nearest neighbour from the start, as a path of rows of 'times'
+    path = [0]
+    left = set(range(1, n + 1))
+    while left:
+        row = times[path[-1]]
+        path.append(min(left, key=lambda j: (row[j], j)))
+        left.remove(path[-1])
+    if not feasible([i - 1 for i in path[1:]]):
+        path = [0] + [i + 1 for i in given]
+    # 2-opt on the open path: reverse path[i:j + 1] when it is faster
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n):
+            a, b = path[i - 1], path[i]
+            c = np.array(path[i + 1:])
+            d = np.array(path[i + 2:] + [-1])
+            # gain of reversing path[i:j + 1] for every j > i at once
+            before = times[a, b] + np.where(d >= 0, times[c, d], 0.0)
+            after = times[a, c] + np.where(d >= 0, times[b, d], 0.0)
+            gain = before - after
+            for j in np.argsort(-gain):
+                if gain[j] <= 1e-9:
+                    break
+                candidate = path[:i] + path[i:i + j + 2][::-1] + path[i + j + 2:]
+                if feasible([k - 1 for k in candidate[1:]]):
+                    path = candidate
+                    improved = True
+                    break
+        if not improved:
+            break
+    order = [i - 1 for i in path[1:]]
+    optimized = path_time(times, path)
+    if optimized >= given_time: # never worse than the given order
+        order, optimized = given, given_time
+    return PoseOrder(order, given_time, optimized)
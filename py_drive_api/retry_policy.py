@@ -0,0 +1,242 @@
+"""
+Retrying gui requests that fail.
+
+A capture or scan that fails once usually works on the next attempt, a
+gui that has stopped answering does not come back by itself. RetryPolicy
+retries the first kind quickly, with exponential backoff and jitter, and
+gives up on the second kind fast: each method has a failure budget, and
+a circuit breaker that rejects calls for a while after several of them
+failed in a row.
+"""
+import logging
+import random
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class RetryError(RuntimeError):
+    """
+    a request still failed after retrying.
+    """
+    pass
+
+
+class CircuitOpenError(RetryError):
+    """
+    a request was not sent because its method failed too often recently.
+    """
+    pass
+
+
+class MethodStats():
+    """
+    Failure statistics of one method.
+
+    Attributes
+    ----------
+    calls : int
+        calls made through the policy.
+    attempts : int
+        requests sent, including retries.
+    failures : int
+        attempts that failed.
+    recovered : int
+        calls that succeeded after at least one retry.
+    exhausted : int
+        calls that failed on every attempt they were allowed.
+    rejected : int
+        calls refused while the circuit was open.
+    retry_time : float
+        seconds spent waiting between attempts.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+        self.recovered = 0
+        self.exhausted = 0
+        self.rejected = 0
+        self.retry_time = 0.0
+        self.consecutive = 0 # failed calls in a row
+        self.opened = None # time the circuit opened
+        self.recent = deque() # times of recent failed attempts
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'recovered': self.recovered,
+            'exhausted': self.exhausted,
+            'rejected': self.rejected,
+            'retry_time': self.retry_time,
+            'circuit_open': self.opened is not None,
+        }
+
+
+class RetryPolicy():
+    """
+    Retries a request while it returns False (or raises one of
+    'retry_on'), waiting base_delay * multiplier ** n between attempts,
+    at most max_delay, shortened by up to 'jitter' of itself at random.
+
+    Parameters
+    ----------
+    attempts : int
+        attempts per call, including the first one.
+    base_delay, max_delay : float
+        seconds to wait before the first retry, and at most.
+    multiplier : float
+        growth of the wait with each retry.
+    jitter : float
+        fraction of each wait that is randomised, 0 for fixed waits.
+    failure_budget : int, optional
+        failed attempts allowed per method within 'budget_window'. once
+        spent, calls of that method get a single attempt.
+    budget_window : float
+        seconds the failure budget looks back.
+    breaker_threshold : int, optional
+        failed calls in a row that open the circuit of a method. while
+        open, calls of that method raise CircuitOpenError.
+    breaker_cooldown : float
+        seconds the circuit stays open. the next call after that gets a
+        single attempt, which closes the circuit if it succeeds.
+    retry_on : tuple
+        exception types that count as a failed attempt. other exceptions
+        propagate right away.
+    clock : module or SimulationClock
+        time source and sleep for the waits.
+    seed : int, optional
+        seed for the jitter.
+    observer : callable, optional
+        called as observer(method) before each retry, e.g.
+        RpcStats.retried.
+
+    Attributes
+    ----------
+    stats : {method: MethodStats}
+    """
+    def __init__(self, attempts=6, base_delay=0.5, max_delay=8.0, multiplier=2.0, jitter=0.5,
+                 failure_budget=None, budget_window=600.0, breaker_threshold=3, breaker_cooldown=300.0,
+                 retry_on=(), clock=time, seed=None, observer=None):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.failure_budget = failure_budget
+        self.budget_window = budget_window
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.retry_on = tuple(retry_on)
+        self.clock = clock
+        self.stats = defaultdict(MethodStats)
+        self.observer = observer
+        self._random = random.Random(seed)
+
+    def delay(self, retry):
+        """
+        seconds to wait before retry number 'retry' (0 for the first).
+        """
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** retry)
+        if self.jitter:
+            delay *= 1 - self.jitter * self._random.random()
+        return delay
+
+    def call(self, method, request, *args, attempts=None, on_retry=None, after_failure=False, **kwargs):
+        """
+        call request(*args, **kwargs) until it doesn't return False, at
+        most 'attempts' times (the policy's by default). 'method' names
+        the request in the statistics. on_retry(attempt) is called
+        before each retry, e.g. to reset the gui, and may return new
+        args for the request. with after_failure=True the caller already
+        made the first attempt and it failed, so the policy starts with
+        the first retry. returns the last result, False if every
+        attempt failed. raises CircuitOpenError if the method's circuit
+        is open.
+        """
+        stats = self.stats[method]
+        attempts = self._allowed_attempts(method, stats, attempts or self.attempts)
+        stats.calls += 1
+        if after_failure:
+            stats.attempts += 1
+            self._failed(stats)
+        result = False
+        for attempt in range(1 if after_failure else 0, attempts):
+            if attempt:
+                wait = self.delay(attempt - 1)
+                logger.warning(f'{method} failed, retry {attempt}/{attempts - 1} in {wait:.2f}s...')
+                self.clock.sleep(wait)
+                stats.retry_time += wait
+                if self.observer is not None:
+                    self.observer(method)
+                if on_retry is not None:
+                    args = on_retry(attempt) or args
+            stats.attempts += 1
+            try:
+                result = request(*args, **kwargs)
+            except self.retry_on as e:
+                logger.warning(f'{method} raised {e!r}')
+                result = False
+            if result is not False:
+                if attempt:
+                    stats.recovered += 1
+                    logger.info(f'{method} recovered after {attempt} retries.')
+                stats.consecutive = 0
+                stats.opened = None
+                return result
+            self._failed(stats)
+        stats.exhausted += 1
+        stats.consecutive += 1
+        if self.breaker_threshold is not None and stats.consecutive >= self.breaker_threshold:
+            stats.opened = self.clock.time()
+            logger.error(f'{method} failed {stats.consecutive} calls in a row, '
+                         f'rejecting it for {self.breaker_cooldown}s.')
+        logger.warning(f'{method} failed after {attempts} attempt(s).')
+        return result
+
+    def _failed(self, stats):
+        stats.failures += 1
+        if self.failure_budget is not None:
+            stats.recent.append(self.clock.time())
+
+    def require(self, method, request, *args, **kwargs):
+        """
+        call() that raises RetryError instead of returning False.
+        """
+        result = self.call(method, request, *args, **kwargs)
+        if result is False:
+            raise RetryError(f'{method} failed after retrying.')
+        return result
+
+    # attempts for the next call, after checking the circuit and budget
+    def _allowed_attempts(self, method, stats, attempts):
+        now = self.clock.time()
+        if stats.opened is not None:
+            if now - stats.opened < self.breaker_cooldown:
+                stats.rejected += 1
+                raise CircuitOpenError(
+                    f'{method} failed {stats.consecutive} calls in a row, not retrying '
+                    f'for another {self.breaker_cooldown - (now - stats.opened):.0f}s.')
+            return 1 # half open, one trial attempt
+        if self.failure_budget is not None:
+            while stats.recent and now - stats.recent[0] > self.budget_window:
+                stats.recent.popleft()
+            if len(stats.recent) >= self.failure_budget:
+                logger.warning(f'{method} failure budget spent, not retrying.')
+                return 1
+        return attempts
+
+    def summary(self):
+        """
+        {method: statistics} of every method called through the policy.
+        """
+        return {method: stats.as_dict() for method, stats in self.stats.items()}
+
+    def reset(self):
+        """
+        forget all statistics and close all circuits.
+        """
+        self.stats.clear()
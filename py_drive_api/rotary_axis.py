@@ -31,18 +31,25 @@ class RotaryAxis(BaseAxis):
             self._direction = -1
         return None
 
+    # resolve a position given relative to home into the absolute target
+    # sent to the device. returns the target, its units and whether the
+    # position passed the bounds check, None with check=False.
+    def _move_target(self, position: float, check=True):
+        units = self.units
+        in_bounds = self._in_bounds(position, units) if check else None
+        if units == Units.ANGLE_DEGREES:
+            position = math.radians(position)
+        position += self._home
+        position *= self._direction
+        return position, Units.ANGLE_RADIANS, in_bounds
+
     # move method specific to rotational axes. position is checked
     # to ensure within bounds prior to calling move.
     def move(self, position: float):
-        units = self.units
         wait_move = self._wait_move
-        if self._in_bounds(position, units):
-            if units == Units.ANGLE_DEGREES:
-                position = math.radians(position)
-            units = Units.ANGLE_RADIANS
-            position += self._home
-            position *= self._direction
-            super(RotaryAxis, self).move_absolute(position, units, wait_move)
+        target, units, in_bounds = self._move_target(position)
+        if in_bounds:
+            super(RotaryAxis, self).move_absolute(target, units, wait_move)
             if self.label == 'y_rot':
                 BaseAxis._YANG = self.position
             if self.label == 'x_rot':
@@ -52,7 +59,6 @@ class RotaryAxis(BaseAxis):
         else:
             move = f'Failed moving {self} to {position} due to possible collision'
             logger.warning(move)
-        self._log_temp()
         return move
 
     # method for moving in degrees instead of default radians. this is
@@ -68,5 +74,4 @@ class RotaryAxis(BaseAxis):
         else:
             move_degrees = f'Failed moving {self} to {position}. Check bounds'
             logger.warning(move_degrees)
-        self._log_temp()
         return move_degrees
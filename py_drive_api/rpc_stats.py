@@ -0,0 +1,160 @@
+"""
+Latency statistics of the json rpc requests sent to the 3D Scan gui.
+
+UI_Scripting records the time to the response, the outcome and the
+retries of every request by method name in UI_Scripting.STATS. Latencies
+go into fixed log spaced histograms, so recording is a bisect and a few
+additions regardless of how long a campaign runs. A json rpc batch is
+one round trip for all of its requests, so batches are recorded as a
+whole under BATCH instead of under each method.
+"""
+import csv
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+# histogram bucket upper bounds in seconds, 1 ms to about 17 minutes,
+# four buckets per doubling
+BOUNDS = [1e-3 * 2 ** (i / 4) for i in range(81)]
+FIELDS = ['method', 'count', 'failures', 'retries', 'total', 'mean', 'min', 'p50', 'p90', 'p99', 'max']
+
+
+class LatencyHistogram():
+    """
+    Counts of latencies per bucket of BOUNDS, plus the exact count, sum,
+    min and max. Percentiles are the upper bound of the bucket they fall
+    in, at most the max.
+    """
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1) # the last one is overflow
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return math.nan
+        rank = math.ceil(self.count * q / 100)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= max(rank, 1):
+                return min(BOUNDS[i], self.max) if i < len(BOUNDS) else self.max
+        return self.max
+
+    def buckets(self):
+        """
+        {upper bound: count} of the non-empty buckets, 'inf' for overflow.
+        """
+        return {(BOUNDS[i] if i < len(BOUNDS) else 'inf'): n for i, n in enumerate(self.counts) if n}
+
+
+class RpcStats():
+    """
+    Per method latency histograms, failure and retry counts.
+
+    Parameters
+    ----------
+    clock : module or SimulationClock
+        time source for the latencies.
+
+    Methods
+    -------
+    record(method: str, seconds: float, ok: bool)
+        one request and its outcome.
+    retried(method: str)
+        count one retry of 'method'.
+    summary() : dict
+        {method: count, failures, retries, total, mean, min, percentiles
+        and max}, slowest total first.
+    to_csv(path) / to_json(path)
+        write the summary, the json with the histogram buckets.
+    """
+    BATCH = 'batch' # the key of json rpc batches
+
+    def __init__(self, clock=time):
+        self.clock = clock
+        self.histograms = defaultdict(LatencyHistogram)
+        self.failures = defaultdict(int)
+        self.retries = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, method, seconds, ok=True):
+        with self._lock:
+            self.histograms[method].add(seconds)
+            if not ok:
+                self.failures[method] += 1
+
+    def retried(self, method):
+        with self._lock:
+            self.retries[method] += 1
+
+    def summary(self):
+        with self._lock:
+            methods = sorted(set(self.histograms) | set(self.retries),
+                             key=lambda m: -self.histograms[m].total if m in self.histograms else 0)
+            return {m: RpcStats.__summarize(self.histograms.get(m, LatencyHistogram()),
+                                            self.failures[m], self.retries[m])
+                    for m in methods}
+
+    @staticmethod
+    def __summarize(h, failures, retries):
+        return {
+            'count': h.count,
+            'failures': failures,
+            'retries': retries,
+            'total': h.total,
+            'mean': h.total / h.count if h.count else math.nan,
+            'min': h.min if h.count else math.nan,
+            'p50': h.percentile(50),
+            'p90': h.percentile(90),
+            'p99': h.percentile(99),
+            'max': h.max,
+        }
+
+    def to_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writeheader()
+            for method, s in self.summary().items():
+                writer.writerow({'method': method, **s})
+        return path
+
+    def to_json(self, path):
+        summary = self.summary()
+        with self._lock:
+            for method, s in summary.items():
+                if method in self.histograms:
+                    s['buckets'] = {str(k): n for k, n in self.histograms[method].buckets().items()}
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return path
+
+    def format(self):
+        """
+        the summary as a table, for logs and reports.
+        """
+        lines = [f'{"method":<32}{"n":>6}{"fail":>6}{"retry":>6}{"total":>10}{"mean":>9}{"p50":>9}{"p99":>9}']
+        for method, s in self.summary().items():
+            lines.append(f'{method:<32}{s["count"]:>6}{s["failures"]:>6}{s["retries"]:>6}{s["total"]:>10.2f}'
+                         f'{s["mean"]:>9.3f}{s["p50"]:>9.3f}{s["p99"]:>9.3f}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.failures.clear()
+            self.retries.clear()
@@ -1,18 +1,29 @@
+import itertools
 import json
 import logging
 import math
 import sys
 import os
+import time
 from xml.etree.ElementTree import ElementTree as ET
 
+import numpy as np
 from zaber_motion import MotionLibException, Units
 if __name__=='__main__':__package__='py_drive_api'
 from .ui_scripting import UI_Scripting as ui
 
+from . import kinematics
 from .base_axis import BaseAxis
+from .collision import AxisLimits, Collision, CollisionChecker
+from .jsonrpc import print_line
 from .linear_axis import LinearAxis
+from .log_config import configure as configure_logging
+from . import pose_order
+from .pipeline import Pipeline
 from .poses import Poses
+from .retry_policy import RetryError
 from .rotary_axis import RotaryAxis
+from .telemetry import TelemetryRecorder, TelemetrySampler
 
 logger = logging.getLogger(__name__)
 
@@ -49,14 +60,30 @@ class ScanPlatform(LinearAxis, RotaryAxis):
         the current position of all connected devices
     warnings : list
         tuples of any active warnings or flags on connected devices
+    telemetry : TelemetrySampler
+        background temperature sampler for all connected axes
+    clock : module
+        time source of the connection. the time module, or the virtual
+        clock of a simulated rig.
 
     Methods
     -------
-    home_all()
-        for homing all connected axes to their self.home location
+    home_all(parallel: bool)
+        for homing all connected axes to their self.home location.
+        collision-safe groups of axes home at the same time.
     move(axes_positions: dict)
         for moving all axes with one command. dict keys must match
         self.axes.keys() for move to occur.
+    move_coordinated(axes_positions: dict)
+        like move(), but validates the whole pose first and moves
+        all axes at the same time with one joint wait.
+    joint_targets(poses: list) : numpy.ndarray
+        the axis positions of every pose of a pose list, solved at once.
+    validate_poses(poses: list) : CollisionReport
+        every move of a pose list that the bounds checks would skip,
+        found before anything moves.
+    optimize_pose_order(poses: list) : PoseOrder
+        the order of a pose list with the least travel time.
     turn_around() : None
         preferred method to rotate for scanning ballplate / target.
         for collision avoidance and extreme precaution!
@@ -68,12 +95,21 @@ class ScanPlatform(LinearAxis, RotaryAxis):
         returns any faults that were cleared.
     set_setting(setting: str, value: float) :
         for changing the settings on connected devices all at once.
+    start_telemetry(interval: float) / stop_telemetry() :
+        background sampling of temperatures into self.telemetry.
+    record_telemetry(directory: str) / stop_recording() :
+        record every position and temperature sample of each axis to
+        a file per axis.
 
     """
     ######################### CLASS MANAGED VARIABLES #########################
     DEFAULT_WORK_DISTANCE = 470 # millimeters
     DEFAULT_TARGET_TILT = -15 # degrees about WX
     DEFAULT_SCANNER_TILT = 0 # degrees about WX
+    COLLISION_PAIRS = (('z_lin', 'y_rot'), ('y_lin', 'x_rot')) # see BaseAxis._in_bounds
+    # the BaseAxis state _in_bounds reads for each axis of COLLISION_PAIRS
+    _STATES = {'z_lin': '_ZPOS', 'y_lin': '_YPOS', 'x_rot': '_XANG', 'y_rot': '_YANG'}
+    ATTACK_KEYS = ('attack', 'attack_angle', 'angle', 'anglerad', 'attackdeg', 'rad', 'deg')
 
     ################## SPECIAL AND PRIVATE NAMESPACE METHODS ##################
     # method for fine adjustments to position devices in their intended locations.
@@ -82,7 +118,7 @@ class ScanPlatform(LinearAxis, RotaryAxis):
     def __alignScanner(self, attack_angle):
         WD = self.WD
         tilt = self._target_tilt
-        print(f'Tilt {math.degrees(tilt)}', f'attack: {math.degrees(attack_angle)}')
+        print_line(f'Tilt {math.degrees(tilt)}', f'attack: {math.degrees(attack_angle)}')
         proj_pose = BaseAxis.__readSetup()
         proj_target = {# Based on hardware setup <n o a p> vectors
             'nx':1,  'ny':0,                       'nz':0,
@@ -92,12 +128,12 @@ class ScanPlatform(LinearAxis, RotaryAxis):
         }
         proj_pose['ry'] = math.radians(proj_pose['ry'])
         proj_pose['rx'] = math.radians(proj_pose['rx'])
-        print("Projector Pose----")
+        print_line("Projector Pose----")
         for p in proj_pose:
-            print(f'{p}:  {proj_pose[p]}')
-        print("Target Pose-----")
+            print_line(f'{p}:  {proj_pose[p]}')
+        print_line("Target Pose-----")
         for p in proj_target:
-            print(f'{p}:  {proj_target[p]}')
+            print_line(f'{p}:  {proj_target[p]}')
         for o in self._objects:
             if o.label == 'z_lin':
                 adjust = proj_pose['pz'] - proj_target['pz']
@@ -136,6 +172,7 @@ class ScanPlatform(LinearAxis, RotaryAxis):
         WD : float, optional
             defaults to 470, sets the current working distance.
         """
+        configure_logging()
         target_tilt = math.radians(target_tilt_deg)
         self._target_tilt = target_tilt
         BaseAxis._TARGET_TILT = target_tilt
@@ -143,10 +180,11 @@ class ScanPlatform(LinearAxis, RotaryAxis):
         BaseAxis._XANG = math.radians(scanner_tilt_deg)
         self._WD = BaseAxis._WD
         m = 'Looking for devices...'
-        print(m)
+        print_line(m)
         logger.debug(m)
         self.device_list = connection.detect_devices()
         self._interface_id = connection.interface_id
+        self.clock = getattr(connection, 'clock', time) # simulated connections keep virtual time
         m = f'Found {len(self.device_list)} devices:\n'
         _axis_list = []
         label_list = []
@@ -158,7 +196,7 @@ class ScanPlatform(LinearAxis, RotaryAxis):
             _axis_list.append(self.tilt_axis)
             self._objects.append(self.tilt_axis)
             m += f'Found Oriental Motor Tilt Axis!\n\n'
-        print(m)
+        print_line(m)
         logger.debug(m)
         for device in self.device_list:
             name = device.name
@@ -196,11 +234,12 @@ class ScanPlatform(LinearAxis, RotaryAxis):
                 self._objects.append(self.yrot)
                 self.yrot.set_setting('accel',80)
         self.axes = dict(zip(label_list, _axis_list))
+        self.telemetry = TelemetrySampler(self._objects)
         try:
             pass
             # self.home_all()
         except MotionLibException as error:
-            print(error)
+            print_line(error)
         self._settings = {}
 
     #  method for obtaining the position of the linear actuators, to satisfy
@@ -212,18 +251,78 @@ class ScanPlatform(LinearAxis, RotaryAxis):
             attack_angle = math.radians(attack_angle)
         elif angle_units == 'deg':
             attack_angle = math.radians(attack_angle)
-        work_distance = self.WD
-        X = self.zaxis._home + (609.73 - (work_distance * math.cos(attack_angle) +
-                                          110 * math.cos(attack_angle - 0.070628)))
-        if attack_angle > 0:
-            Y = self.yaxis._home + (work_distance * math.sin(attack_angle) +
-                                    110 * math.sin(attack_angle - 0.070628) + 7.75)
-        elif attack_angle < 0:
-            Y = self.yaxis._home - (work_distance * math.sin(abs(attack_angle)) +
-                                    110 * math.sin(abs(attack_angle) + 0.070628) - 7.75)
-        else:
-            Y = self.yaxis._home
-        return (X, Y)
+        dz, dy = kinematics.attack_angle_offsets(attack_angle, self.WD).tolist()
+        return (self.zaxis._home + dz, self.yaxis._home + dy)
+
+    # split a pose key into the axis label or move type it names, and the
+    # units label found in it, if any.
+    @staticmethod
+    def __parse_move_key(key):
+        for unit in ['deg', 'rad', 'mm']:
+            if key.lower().find(unit) >= 0:
+                return key.lower().replace(unit, ''), unit
+        return key.lower(), None
+
+    # axis moves, relative to home, that satisfy an attack angle. returns the
+    # moves along with the (X, Y) kinematics solution.
+    def __attack_angle_moves(self, attack_angle, units):
+        X, Y = self.__kinematics(attack_angle, units)
+        logger.debug('(X,Y) = %s', (X, Y))
+        xhome = self.__attack_x_home(units)
+        moves = {
+            'z_lin': X - self.zaxis._home,
+            'x_rot': attack_angle - xhome,
+            'y_lin': Y - self.yaxis._home
+            }
+        if units == 'deg': moves['x_rot'] = math.radians(moves['x_rot'])
+        return moves, (X, Y)
+
+    # x_rot home in the attack angle 'units', as the attack angle moves use it
+    def __attack_x_home(self, units):
+        if units == 'deg':
+            if self.xrot.units == Units.ANGLE_DEGREES:
+                return self.xrot._home
+            return math.degrees(self.xrot._home)
+        elif units == 'rad':
+            if self.xrot.units == Units.ANGLE_RADIANS:
+                return math.radians(self.xrot._home)
+            return self.xrot._home
+
+    # resolve a pose dict, as given to move(), into the position each axis
+    # move() call would receive. attack angle keys expand to their axis moves.
+    def __resolve_moves(self, axes_positions: dict, relative_positions=False):
+        moves = {}
+        units = None
+        for key in axes_positions:
+            if len(key) == 0:
+                continue
+            move_key, unit = self.__parse_move_key(key)
+            if unit is not None:
+                units = unit
+            if move_key in self.axes:
+                self.axes[move_key]._set_units(key)
+                position = float(axes_positions[key])
+                if relative_positions:
+                    if move_key == 'z_lin':
+                        if position == BaseAxis._WD:
+                            position = 0
+                        else:
+                            position = BaseAxis._WD - position
+                    else:
+                        position = self.axes[move_key]._home - position
+                moves[move_key] = position
+            elif move_key in ScanPlatform.ATTACK_KEYS:
+                attack_angle = float(axes_positions[key])
+                if not kinematics.ATTACK_RANGE[0] <= attack_angle <= kinematics.ATTACK_RANGE[1]:
+                    logger.warning(
+                        f'attack angle {attack_angle} is out of bounds for this method. Valid angles from {kinematics.ATTACK_RANGE[0]} --> {kinematics.ATTACK_RANGE[1]} deg.')
+                    continue
+                if units is None:
+                    units = self.axes['x_rot'].units
+                moves.update(self.__attack_angle_moves(attack_angle, units)[0])
+            else:
+                logger.warning('The "move key" %s is not valid.', key)
+        return moves
 
     @staticmethod
     def __readSetup():
@@ -247,22 +346,15 @@ class ScanPlatform(LinearAxis, RotaryAxis):
     ###################### CLASS STATIC METHODS ######################
     @staticmethod
     def pose2AD(L, R):
-        D = 12
-        WD = float(BaseAxis._WD)
-        angle = math.atan((R - L) / D)
-        if L == R:
-            distance = WD + R * 10
-        else:
-            mid = (L + R) / 2
-            distance = WD + mid * 10
-        print(f'angle: {angle}, distance: {distance}')
+        angle, distance = kinematics.angle_distance(L, R, float(BaseAxis._WD)).tolist()
+        print_line(f'angle: {angle}, distance: {distance}')
         return (angle, distance)
 
     ####################### CLASS BOUND METHODS #######################
     def move2pose(self, LR):
         (angle, distance) = self.pose2AD(LR[0], LR[1])
         WD = self.zaxis.WD
-        print(f'Distance: {distance}')
+        print_line(f'Distance: {distance}')
         if distance == WD:
             distance = 0
         else:
@@ -274,12 +366,52 @@ class ScanPlatform(LinearAxis, RotaryAxis):
                 o.wait_until_idle()
         return f'Moved to pose {LR}'
 
-    # preferred method for homing all axes connected to scanplatform object
-    def home_all(self):
-        for a in self.axes:
-            print(f'homing axis {a}.')
-            self.axes[a].home_axis()
-        home_all = 'All axes homed.'
+    # groups of axes that can home at the same time. axes sharing a collision
+    # envelope in BaseAxis._in_bounds go to different groups, linear axes
+    # first since their home sensors retract them out of the envelopes.
+    def _homing_groups(self):
+        groups = []
+        labels = sorted(self.axes, key=lambda a: self.axes[a]._type != 'lin')
+        for label in labels:
+            partners = {p for pair in ScanPlatform.COLLISION_PAIRS
+                        if label in pair for p in pair if p != label}
+            for group in groups:
+                if not partners.intersection(group):
+                    group.append(label)
+                    break
+            else:
+                groups.append([label])
+        return groups
+
+    # start a homing phase on every axis of a group and wait on them together
+    def __home_phase(self, group, phase):
+        results = {a: phase(self.axes[a]) for a in group}
+        for a in group:
+            self.axes[a].wait_until_idle()
+        return results
+
+    # preferred method for homing all axes connected to scanplatform object.
+    # axes home in parallel groups from _homing_groups(). every group seeks its
+    # home sensors in order, then the groups return to their home positions in
+    # reverse order, so an axis only sweeps while its collision partners are
+    # parked at their sensors.
+    def home_all(self, parallel=True):
+        if not parallel:
+            for a in self.axes:
+                print_line(f'homing axis {a}.')
+                self.axes[a].home_axis()
+            home_all = 'All axes homed.'
+            logger.info('\t\t\t' + home_all)
+            return home_all
+        groups = self._homing_groups()
+        for group in groups:
+            print_line(f'homing axes {group}.')
+            self.__home_phase(group, lambda axis: axis._seek_home())
+        for group in reversed(groups):
+            speeds = self.__home_phase(group, lambda axis: axis._return_home())
+            for a in group:
+                self.axes[a]._finish_home(speeds[a])
+        home_all = f'All axes homed in groups {groups}.'
         logger.info('\t\t\t' + home_all)
         return home_all
 
@@ -294,26 +426,7 @@ class ScanPlatform(LinearAxis, RotaryAxis):
             self.target_tilt = tilt
         else:
             tilt = BaseAxis._TARGET_TILT
-        X, Y = self.__kinematics(attack_angle, units)
-        logger.debug(f'(X,Y) = { (X, Y)}')
-        if units == 'deg':
-            if self.xrot.units == Units.ANGLE_DEGREES:
-                xhome = self.xrot._home
-            else:
-                xhome = math.degrees(self.xrot._home)
-            tilt = math.degrees(tilt)
-        elif units == 'rad':
-            if self.xrot.units == Units.ANGLE_RADIANS:
-                xhome = math.radians(self.xrot._home)
-            else:
-                xhome = self.xrot._home
-            tilt = math.radians(tilt)
-        moves = {
-            'z_lin': X - self.zaxis._home,
-            'x_rot': attack_angle - xhome,
-            'y_lin': Y - self.yaxis._home
-            }
-        if units == 'deg': moves['x_rot'] = math.radians(moves['x_rot'])
+        moves, (X, Y) = self.__attack_angle_moves(attack_angle, units)
         for axis_key in moves:
             logger.debug('attempting move')
             position = moves[axis_key]
@@ -333,15 +446,16 @@ class ScanPlatform(LinearAxis, RotaryAxis):
     # imported from external files. axes positions are given in a dictinary
     # containing the 'key' specifying the type of move or axis to be moved,
     # and the value the axis is to be moved to. this method will call the move()
-    # method for the individual axes that must be moved.
-    def move(self, axes_positions: dict, relative_positions=False):
+    # method for the individual axes that must be moved. pass coordinated=True
+    # to start all axes together, see move_coordinated().
+    def move(self, axes_positions: dict, relative_positions=False, coordinated=False):
+        if coordinated:
+            return self.move_coordinated(axes_positions, relative_positions)
         axes = self.axes.keys()
-        kin_move = ['attack', 'attack_angle', 'angle', 'anglerad',
-                    'attackdeg', 'rad', 'deg']
         unit_labels = ['deg', 'rad', 'mm']
         for key in axes_positions:
             if len(key) > 0:
-                logger.debug(f'Key: {key},  axes_pos: {axes_positions}')
+                logger.debug('Key: %s,  axes_pos: %s', key, axes_positions)
                 for unit in unit_labels:
                     if key.lower().find(unit) >= 0:
                         move_key = key.lower().replace(unit, '')
@@ -349,8 +463,8 @@ class ScanPlatform(LinearAxis, RotaryAxis):
                         break
                     else:
                         move_key = key.lower()
-                logger.debug(f'Move Key: {move_key}')
-                logger.debug(f'Key: {key}')
+                logger.debug('Move Key: %s', move_key)
+                logger.debug('Key: %s', key)
                 if move_key in axes:
                     try:
                         units = self.axes[move_key]._set_units(key)
@@ -364,21 +478,21 @@ class ScanPlatform(LinearAxis, RotaryAxis):
                             else:
                                 position = self.axes[move_key]._home - position
                             logger.debug(
-                                f'from scanplatform move>>> {key}: {axes_positions[key]}')
+                                'from scanplatform move>>> %s: %s', key, axes_positions[key])
                             self.axes[move_key].move(position)
                         else:
                             self.axes[move_key].move(position)
                     except KeyError:
                         logger.exception(
                             f'Key Error! Check that {move_key} is connected.')
-                elif move_key in kin_move:
+                elif move_key in ScanPlatform.ATTACK_KEYS:
                     try:
                         attack_angle = float(axes_positions[key])
-                        if attack_angle < -38 or attack_angle > 37:
+                        if not kinematics.ATTACK_RANGE[0] <= attack_angle <= kinematics.ATTACK_RANGE[1]:
                             logger.warning(
-                                f'attack angle {attack_angle} is out of bounds for this method. Valid angles from -38 --> 37 deg.')
+                                f'attack angle {attack_angle} is out of bounds for this method. Valid angles from {kinematics.ATTACK_RANGE[0]} --> {kinematics.ATTACK_RANGE[1]} deg.')
                             continue
-                        logger.debug(f'Attack angle: {attack_angle}')
+                        logger.debug('Attack angle: %s', attack_angle)
                         self.move_attack_angle(attack_angle, units)
                     except UnboundLocalError:
                         try:
@@ -396,12 +510,209 @@ class ScanPlatform(LinearAxis, RotaryAxis):
                         logger.error(message)
                 else:
                     logger.debug('Invalid key. Check "move" argument.')
-                    logger.warning('The "move key" {key} is not valid.')
+                    logger.warning('The "move key" %s is not valid.', key)
         if self.wait_move:
             for o in self._objects:
                 o.wait_until_idle()
         return None
 
+    # moves every axis of a pose at the same time. the whole target pose is
+    # resolved and bounds checked before any axis is commanded, so a pose
+    # that fails is not partially executed.
+    def move_coordinated(self, axes_positions: dict, relative_positions=False):
+        """
+        Move all axes named in 'axes_positions' together. Keys and values
+        are the same as for move(). Every axis is commanded without waiting,
+        and then all axes are waited on once, so a pose change takes as long
+        as the slowest axis instead of the sum of all of them. nothing
+        moves if any state the axes can pass through on the way fails the
+        bounds checks.
+        """
+        moves = self.__resolve_moves(axes_positions, relative_positions)
+        targets = {}
+        for label in moves:
+            target, units, _ = self.axes[label]._move_target(moves[label], check=False)
+            targets[label] = (target, units)
+        failed = self.__coordinated_failures(moves, targets)
+        if failed:
+            move = f'Failed coordinated move to {axes_positions}. Check bounds of {failed}'
+            logger.warning(move)
+            return move
+        for label in targets:
+            target, units = targets[label]
+            self.axes[label].move_absolute(target, units, False)
+        for label in targets:
+            self.axes[label].wait_until_idle()
+        positions = {label: self.axes[label].position for label in targets}
+        move = f'Coordinated move to {positions}'
+        logger.info(move)
+        return move
+
+    # the axes no longer arrive one after another, so on the way to their
+    # 'targets' each axis of a collision pair can be anywhere between its
+    # start and its target while its partner is anywhere between its own.
+    # the envelopes only get tighter towards either end, so every
+    # start/target combination of the pair axes is checked. other axes
+    # are checked at their target. returns the labels that fail.
+    def __coordinated_failures(self, moves, targets):
+        pairs = [pair for pair in ScanPlatform.COLLISION_PAIRS
+                 if all(label in self.axes for label in pair)
+                 and any(label in targets for label in pair)]
+        checked = [label for pair in pairs for label in pair]
+        failed = [label for label in targets if label not in checked
+                  and not self.axes[label]._move_target(moves[label])[2]]
+        start = {label: getattr(BaseAxis, attr) for label, attr in ScanPlatform._STATES.items()}
+        ends = [(start[label], targets[label][0]) if label in targets else (start[label],)
+                for label in ScanPlatform._STATES]
+        try:
+            for state in itertools.product(*ends):
+                for label, value in zip(ScanPlatform._STATES, state):
+                    setattr(BaseAxis, ScanPlatform._STATES[label], value)
+                failed += [label for label in checked if label not in failed
+                           and not self.__in_bounds_at(label, getattr(BaseAxis, ScanPlatform._STATES[label]))]
+        finally:
+            for label, attr in ScanPlatform._STATES.items():
+                setattr(BaseAxis, attr, start[label])
+        return failed
+
+    # _in_bounds of an axis at the absolute position 'target', which it
+    # checks relative to home for rotary axes, like _move_target().
+    def __in_bounds_at(self, label, target):
+        axis = self.axes[label]
+        if axis._type == 'rot':
+            return axis._in_bounds(target * axis._direction - axis._home, Units.ANGLE_RADIANS)
+        return axis._in_bounds(target, axis.units)
+
+    def joint_targets(self, poses, relative_positions=False):
+        """
+        solve every pose of a pose list at once. 'poses' are pose dicts as
+        given to move(), or the rows of Poses.from_file() that end in one.
+        returns an array with a row per pose and a column per
+        kinematics.AXES entry, holding the position each axis move() would
+        get. NaN where a pose doesn't move an axis, and for attack angles
+        out of range. nothing is moved and no axis settings change.
+        """
+        moves, _ = self.__pose_moves(poses, relative_positions)
+        columns = {axis: i for i, axis in enumerate(kinematics.AXES)}
+        targets = np.full((len(poses), len(columns)), np.nan)
+        for pose, label, position, _ in moves: # later moves of an axis win, like in move()
+            targets[pose, columns[label]] = position
+        return targets
+
+    def validate_poses(self, poses, relative_positions=False, coordinated=False):
+        """
+        check a whole pose list for moves that move() would skip because
+        they fail the collision and bounds checks, without moving
+        anything. the axis moves are replayed in the order move() makes
+        them, from where the axes are now. use coordinated=True for
+        move_coordinated(). returns a collision.CollisionReport, attack
+        angles out of range are reported too.
+        """
+        moves, rejected = self.__pose_moves(poses, relative_positions)
+        checker, start = self.__collision_checker()
+        report = checker.check(moves, start, coordinated)
+        report.collisions = sorted(report.collisions + rejected, key=lambda c: c.pose)
+        report.poses = len(poses)
+        if not report.ok:
+            logger.warning('%s', report.format())
+        return report
+
+    def optimize_pose_order(self, poses, relative_positions=False, coordinated=False):
+        """
+        find the order of a pose list with the least travel time, from
+        where the axes are now. travel times come from the trapezoidal
+        motion profiles with the speed and acceleration settings of each
+        axis, summed over the axes as move() moves them one at a time, or
+        the slowest axis with coordinated=True. orders that make more
+        moves fail the collision checks than the given order are not
+        used. returns a pose_order.PoseOrder, order.apply(poses) gives
+        the reordered list.
+        """
+        moves, _ = self.__pose_moves(poses, relative_positions)
+        checker, start = self.__collision_checker()
+        labels = list(checker.limits)
+        limits = [checker.limits[label] for label in labels]
+        # every axis position relative to home, in mm or radians
+        positions = np.full((len(poses), len(labels)), np.nan)
+        for pose, label, position, degrees in moves:
+            if label in checker.limits:
+                positions[pose, labels.index(label)] = math.radians(position) if degrees else position
+        here = [start[label] * l.direction - l.home if l.rotary else start[label] - l.home
+                for label, l in zip(labels, limits)]
+        speeds, accels = zip(*(self.axes[label].motion_limits() for label in labels))
+        times = pose_order.travel_times(positions, speeds, accels, here, coordinated)
+        by_pose = [[] for _ in poses]
+        for move in moves:
+            by_pose[move[0]].append(move)
+        allowed = len(checker.check(moves, start, coordinated).collisions)
+        def feasible(order):
+            reordered = [(n,) + move[1:] for n, i in enumerate(order) for move in by_pose[i]]
+            return len(checker.check(reordered, start, coordinated).collisions) <= allowed
+        order = pose_order.optimize(times, feasible)
+        logger.info('%s', order.format())
+        return order
+
+    # a CollisionChecker for the zaber axes, and where they are now
+    def __collision_checker(self):
+        limits = {label: AxisLimits(axis._home, axis._bounds, axis._type == 'rot',
+                                    getattr(axis, '_direction', 1))
+                  for label, axis in self.axes.items() if isinstance(axis, BaseAxis)}
+        start = {'z_lin': BaseAxis._ZPOS, 'y_lin': BaseAxis._YPOS,
+                 'x_rot': BaseAxis._XANG, 'y_rot': BaseAxis._YANG}
+        return CollisionChecker(limits), start
+
+    # the axis moves move() makes for a pose list, in order, as (pose,
+    # label, position, degrees) with the position each axis move() gets
+    # and whether the axis takes it in degrees then. attack angles out of
+    # range are returned as Collisions. axis units are restored after.
+    def __pose_moves(self, poses, relative_positions=False):
+        poses = [p[-1] if isinstance(p, (list, tuple)) else p for p in poses]
+        units = {label: axis.units for label, axis in self.axes.items()}
+        moves = []
+        rejected = []
+        attacks = [] # (index in moves, angle in radians, x_rot home in radians)
+        try:
+            for row, pose in enumerate(poses):
+                angle_units = None
+                for key, value in pose.items():
+                    if len(key) == 0:
+                        continue
+                    move_key, unit = self.__parse_move_key(key)
+                    if unit is not None:
+                        angle_units = unit
+                    if move_key in self.axes:
+                        axis = self.axes[move_key]
+                        position = float(value)
+                        if relative_positions:
+                            position = (BaseAxis._WD if move_key == 'z_lin' else axis._home) - position
+                        degrees = axis._set_units(key) == Units.ANGLE_DEGREES
+                        moves.append((row, move_key, position, degrees))
+                    elif move_key in ScanPlatform.ATTACK_KEYS:
+                        angle = float(value)
+                        if not kinematics.ATTACK_RANGE[0] <= angle <= kinematics.ATTACK_RANGE[1]:
+                            rejected.append(Collision(row, 'attack angle', angle, math.nan, 'out of range'))
+                            continue
+                        if angle_units is None:
+                            angle_units = 'deg' if self.axes['x_rot'].units == Units.ANGLE_DEGREES else 'rad'
+                        if angle_units == 'deg':
+                            attacks.append((len(moves), math.radians(angle),
+                                            math.radians(self.__attack_x_home('deg'))))
+                        else:
+                            attacks.append((len(moves), angle, self.__attack_x_home('rad')))
+                        # in the order of __attack_angle_moves()
+                        for label in ('z_lin', 'x_rot', 'y_lin'):
+                            moves.append((row, label, math.nan, self.axes[label].units == Units.ANGLE_DEGREES))
+        finally:
+            for label, axis in self.axes.items():
+                axis.units = units[label]
+        if attacks:
+            index, angle, x_home = (np.array(column) for column in zip(*attacks))
+            solved = kinematics.attack_angle_moves(angle, self.WD, x_home)
+            for i, (z, y, x) in zip(index.tolist(), solved.tolist()):
+                for offset, position in enumerate((z, x, y)):
+                    moves[i + offset] = moves[i + offset][:2] + (position,) + moves[i + offset][3:]
+        return moves, rejected
+
     def new_home(self):
         """
         sets current position to home for all axes
@@ -548,28 +859,32 @@ class ScanPlatform(LinearAxis, RotaryAxis):
             [calib_paths]
         self.xrot.move_degrees(x_rot)
         self.calibrate_position(target)
-        for path in calib_paths:
-            for p in Poses.GOLDEN:
-                self.move2pose(p)
-                logger.info(f"this is pose {p}, capturing views.")
-                ret = ui.addCalibrationView()
-                logger.debug(f'addCalibrationView>>>  {ret}')
-                while ret is False:
-                    ret = ui.addCalibrationView()
-                    m = (
-                        'Failed to add calibration view!' +
-                        f'Pose: {p}'
-                        f'Path: {path}'
-                    )
-                    logger.warning(m)
-            ui.calibrate(path)
-            logger.info('Calibration all done.')
-            ret = ui.clearViews()
-            while ret is False:
-                ret = ui.clearViews()
-            logger.debug(f'clearViews>>>  {ret}')
+        # each calibration computes in the background while the platform
+        # moves to the first pose of the next one
+        with Pipeline(self) as pipeline:
+            for path in calib_paths:
+                for p in Poses.GOLDEN:
+                    self.move2pose(p)
+                    logger.info(f"this is pose {p}, capturing views.")
+                    ret = pipeline.capture_view()
+                    logger.debug(f'addCalibrationView>>>  {ret}')
+                    if ret is False: # addCalibrationView has already retried
+                        raise RetryError(
+                            'Failed to add calibration view! ' +
+                            f'Pose: {p} '
+                            f'Path: {path}'
+                        )
+                pipeline.background(ScanPlatform.__calibrate_and_clear, path)
         return None
 
+    @staticmethod
+    def __calibrate_and_clear(path):
+        ui.calibrate(path)
+        logger.info('Calibration all done.')
+        ret = ui.RETRY.call('DeleteCalibrationViews', ui.clearViews)
+        logger.debug(f'clearViews>>>  {ret}')
+        return ret
+
     # a 'shutdown' process complete method to be called on the ScanPlatform object
     # at the end of any script, to return all axes to positions ready to be homed
     # the next time this device is used. mainly to prevent
@@ -634,6 +949,44 @@ class ScanPlatform(LinearAxis, RotaryAxis):
         except:
             return False
 
+    def start_telemetry(self, interval=TelemetrySampler.DEFAULT_INTERVAL):
+        """
+        start sampling driver and motor temperatures of all connected axes
+        every 'interval' seconds on a background thread. readings are kept
+        in self.telemetry.samples.
+        """
+        return self.telemetry.start(interval)
+
+    def stop_telemetry(self):
+        """
+        stop the background temperature sampling.
+        """
+        return self.telemetry.stop()
+
+    def record_telemetry(self, directory, **kwargs):
+        """
+        record every position read and temperature sample of each axis,
+        with monotonic ns timestamps, to '<label>.telemetry' files in
+        'directory'. kwargs go to TelemetryRecorder. read the files with
+        telemetry.read_recording(). returns {label: TelemetryRecorder}.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.stop_recording()
+        for o in self._objects:
+            o.recorder = TelemetryRecorder(
+                os.path.join(directory, f'{o.label}.telemetry'), clock=self.clock, **kwargs)
+        return {o.label: o.recorder for o in self._objects}
+
+    def stop_recording(self):
+        """
+        write out and close the telemetry recordings of all axes.
+        """
+        for o in self._objects:
+            if getattr(o, 'recorder', None) is not None:
+                o.recorder.close()
+                o.recorder = None
+        return True
+
     def temperatures(self):
         """
         returns a list of tuples with all available temperature 
@@ -687,6 +1040,7 @@ class ScanPlatform(LinearAxis, RotaryAxis):
     #       self.settings['y_lin']['device']['system.temperature']
     # or for access directly from an attribute since their _settings are updated
     #       self.yaxis.settings['device']['system.temperature']
+    # values are cached after the first read, see refresh_settings().
     @property
     def settings(self):
         devices = []
@@ -698,6 +1052,15 @@ class ScanPlatform(LinearAxis, RotaryAxis):
         self._settings = {devices[i]: settings_dicts[i]
                           for i in range(len(devices))}
         return self._settings
+
+    def refresh_settings(self):
+        """
+        re-read the non-persistent settings of all connected devices and
+        return the updated settings of every device.
+        """
+        for o in self._objects:
+            o.refresh_settings()
+        return self.settings
     @property
     def target_tilt(self):
         return BaseAxis._TARGET_TILT
@@ -754,7 +1117,7 @@ if __name__=='__main__':
                     if ready:
                         controller.tilt_axis = OMRotaryAxis(port, controller.WD, controller.scanner_tilt, controller.target_tilt)
                         logger.info(f'Oriental motor tilt axis found on port {dev.device}!')
-                    else: print(f'alarms: {port.GetAlarm(3)}',f'reset: {port.AlarmReset(3)}')
+                    else: print_line(f'alarms: {port.GetAlarm(3)}',f'reset: {port.AlarmReset(3)}')
                     if not ready: port.PortClose()
     connection = DevConnection()
     start(connection)
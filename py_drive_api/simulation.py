@@ -0,0 +1,614 @@
+"""
+Simulated scan platform hardware, for running scripts and throughput
+benchmarks without the rig.
+
+The zaber devices are simulated at the level of the zaber_motion Connection,
+Device and Axis objects that ScanPlatform uses. The oriental motor tilt axis
+is simulated at the register level behind a serial-like port, so the whole
+ModbusController / ModbusRTU / SerialCom stack runs against it.
+
+Every axis follows trapezoidal motion profiles (see motion_profile.py), and
+models homing, settings and driver / motor temperatures. Axis data sheet
+values are approximations, good enough for timing and scheduling studies.
+
+Use DevConnection(simulate=True) to get a ScanPlatform on a simulated rig.
+"""
+import math
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from time import monotonic, sleep
+
+from zaber_motion import Units
+
+from .motion_profile import TrapezoidalProfile
+from .oriental_motor.modbus_controller import ModbusController
+from .oriental_motor.modbus_rtu import ModbusRTU, crc16
+from .oriental_motor.oriental import DriverModbusIO as IO
+from .oriental_motor.oriental import DriverModbusRegisters as REG
+from .ref_variables import RefVariables
+
+
+class SimulationClock():
+    """
+    Time source of a simulated rig, with the time() and sleep() methods of
+    the time module.
+
+    In virtual mode (default) time only advances when something sleeps,
+    waits on a move or talks to a device. Runs are then deterministic and
+    take no longer than the host needs to execute them. With realtime=True
+    the clock follows the wall clock instead.
+
+    Work that runs concurrently on another thread can be given its own
+    virtual timeline with timeline(), so that it overlaps with the main
+    one instead of adding to it.
+    """
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self._now = 0.0
+        self._origin = monotonic()
+        self._local = threading.local()
+
+    def time(self):
+        if self.realtime:
+            return monotonic() - self._origin
+        return getattr(self._local, 'now', self._now)
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return None
+        if self.realtime:
+            sleep(seconds)
+        elif hasattr(self._local, 'now'):
+            self._local.now += seconds
+        else:
+            self._now += seconds
+        return None
+
+    def advance_to(self, t):
+        return self.sleep(t - self.time())
+
+    @contextmanager
+    def timeline(self, start):
+        """
+        run the calling thread on its own virtual time from 'start' until
+        the block exits. a no-op in realtime mode.
+        """
+        if self.realtime:
+            yield
+            return
+        self._local.now = start
+        try:
+            yield
+        finally:
+            del self._local.now
+
+
+class SimulatedMotor():
+    """
+    Position, motion and temperatures of one simulated axis. Positions are
+    in the base unit of the caller (mm, rad or driver steps).
+    """
+    AMBIENT = 23.0          # deg-C
+    THERMAL_TAU = 900.0     # seconds, first order time constant
+    DRIVER_RISE = (8.0, 22.0)  # deg-C above ambient when idle / moving all the time
+    MOTOR_RISE = (5.0, 30.0)
+
+    def __init__(self, clock, position=0.0, limits=(-math.inf, math.inf)):
+        self.clock = clock
+        self.limits = limits
+        self._position = position
+        self.profile = None
+        self.driver_temperature = SimulatedMotor.AMBIENT
+        self.motor_temperature = SimulatedMotor.AMBIENT
+        self._thermal_time = clock.time()
+        self.moves = 0
+
+    def position(self):
+        if self.profile is None:
+            return self._position
+        return self.profile.position(self.clock.time())
+
+    def target(self):
+        if self.profile is None:
+            return self._position
+        return self.profile.target
+
+    def busy(self):
+        return self.profile is not None and not self.profile.done(self.clock.time())
+
+    def move_to(self, target, speed, accel, decel=None):
+        if not self.limits[0] <= target <= self.limits[1]:
+            raise ValueError(f'Target {target} is outside of travel {self.limits}.')
+        self.__update_temperatures()
+        start = self.position()
+        self._position = start
+        self.profile = TrapezoidalProfile(
+            start, target, speed, accel, decel, self.clock.time())
+        self.moves += 1
+        return self.profile.duration
+
+    # stops where the axis is. deceleration is not modelled.
+    def stop(self):
+        self.__update_temperatures()
+        self._position = self.position()
+        self.profile = None
+        return self._position
+
+    def wait(self):
+        if self.profile is not None:
+            self.clock.advance_to(self.profile.end)
+        return True
+
+    def temperatures(self):
+        self.__update_temperatures()
+        return self.driver_temperature, self.motor_temperature
+
+    # first order response towards a steady state set by how much of the
+    # time since the last update the axis spent moving
+    def __update_temperatures(self):
+        now = self.clock.time()
+        dt = now - self._thermal_time
+        if dt <= 0:
+            return None
+        moving = 0.0
+        if self.profile is not None:
+            moving = max(0.0, min(now, self.profile.end) - max(self._thermal_time, self.profile.t0))
+        duty = moving / dt
+        response = 1 - math.exp(-dt / SimulatedMotor.THERMAL_TAU)
+        for name, rise in (('driver_temperature', SimulatedMotor.DRIVER_RISE),
+                           ('motor_temperature', SimulatedMotor.MOTOR_RISE)):
+            steady = SimulatedMotor.AMBIENT + rise[0] + (rise[1] - rise[0]) * duty
+            current = getattr(self, name)
+            setattr(self, name, current + (steady - current) * response)
+        self._thermal_time = now
+        return None
+
+
+############################### ZABER ###############################
+# kind, travel limits in mm or rad, and microstep size in mm or rad
+ZaberModel = namedtuple('ZaberModel', ['kind', 'limits', 'microstep'])
+
+ZABER_MODELS = {
+    'X-LRT0500AL-E08C': ZaberModel('lin', (0.0, 500.0), 0.1984375e-3),
+    'X-LRT0750AL-E08C': ZaberModel('lin', (0.0, 750.0), 0.1984375e-3),
+    'X-RST120AK-E03': ZaberModel('rot', (-2 * math.pi, 2 * math.pi), math.radians(0.000234375)),
+    'X-RSW60A-E03': ZaberModel('rot', (-math.pi, math.pi), math.radians(0.000234375)),
+}
+
+# zaber ascii native speed and acceleration data scaling
+SPEED_DATA_FACTOR = 1.6384              # data = microsteps/s * 1.6384
+ACCEL_DATA_FACTOR = 1.6384 / 10000      # data = microsteps/s^2 * 1.6384 / 10000
+
+POSITION_SETTINGS = {'pos', 'encoder.pos', 'limit.max', 'limit.min', 'limit.home.pos'}
+VELOCITY_SETTINGS = {'maxspeed', 'limit.approach.maxspeed', 'limit.detect.maxspeed', 'knob.maxspeed'}
+ACCEL_SETTINGS = {'accel'}
+
+# one result of SimulatedZaberSettings.get_many(), like GetSettingResult
+SettingResult = namedtuple('SettingResult', ['setting', 'values', 'unit'])
+
+
+# value in mm or rad to 'unit'. degree units are the only ones scaled.
+def _from_base(value, unit):
+    if 'DEGREES' in getattr(unit, 'name', str(unit)):
+        return math.degrees(value)
+    return value
+
+
+def _to_base(value, unit):
+    if 'DEGREES' in getattr(unit, 'name', str(unit)):
+        return math.radians(value)
+    return value
+
+
+class SimulatedZaberSettings():
+    """
+    Device settings with the get / set / get_many calls of
+    zaber_motion.ascii.DeviceSettings. 'pos' and the temperatures are
+    live values of the simulated motor.
+    """
+    DEFAULTS = {
+        'maxspeed': 153600,
+        'accel': 205,
+        'driver.current.run': 50,
+        'driver.current.hold': 25,
+        'resolution': 64,
+        'system.voltage': 48.0,
+        'system.axiscount': 1,
+        'comm.rs232.baud': 115200,
+        'comm.protocol': 2,
+        'version': 7.1,
+    }
+
+    def __init__(self, device):
+        self._device = device
+        model = device.model
+        self._values = {a: 0 for a in RefVariables.DEV_ARGS}
+        self._values.update(SimulatedZaberSettings.DEFAULTS)
+        self._values['limit.min'] = model.limits[0] / model.microstep
+        self._values['limit.max'] = model.limits[1] / model.microstep
+        self._values['system.serial'] = device.serial_number
+        self._values['deviceid'] = device.device_id
+
+    def _native(self, setting):
+        motor = self._device.motor
+        if setting in ('pos', 'encoder.pos'):
+            return motor.position() / self._device.model.microstep
+        if setting == 'driver.temperature':
+            return round(motor.temperatures()[0], 1)
+        if setting == 'system.temperature':
+            return round(motor.temperatures()[1], 1)
+        if setting not in self._values:
+            raise ValueError(f'Setting {setting} is not supported by {self._device.name}.')
+        return self._values[setting]
+
+    # native value of a setting to 'unit'
+    def _convert(self, setting, value, unit):
+        if unit == Units.NATIVE:
+            return value
+        step = self._device.model.microstep
+        if setting in POSITION_SETTINGS:
+            return _from_base(value * step, unit)
+        if setting in VELOCITY_SETTINGS:
+            return _from_base(value / SPEED_DATA_FACTOR * step, unit)
+        if setting in ACCEL_SETTINGS:
+            return _from_base(value / ACCEL_DATA_FACTOR * step, unit)
+        return value
+
+    def get(self, setting, unit=Units.NATIVE):
+        self._device.connection._command()
+        return self._convert(setting, self._native(setting), unit)
+
+    def set(self, setting, value, unit=Units.NATIVE):
+        self._device.connection._command()
+        if setting not in self._values:
+            raise ValueError(f'Setting {setting} is not supported by {self._device.name}.')
+        if unit != Units.NATIVE:
+            value = value / self._convert(setting, 1, unit)
+        self._values[setting] = value
+        return None
+
+    def get_many(self, *settings):
+        self._device.connection._command()
+        return [SettingResult(
+                    s.setting,
+                    [self._convert(s.setting, self._native(s.setting), getattr(s, 'unit', Units.NATIVE))],
+                    getattr(s, 'unit', Units.NATIVE))
+                for s in settings]
+
+
+class SimulatedWarnings():
+    """
+    Warning flags of a simulated device.
+    """
+    def __init__(self, device):
+        self._device = device
+        self.flags = set()
+
+    def get_flags(self):
+        self._device.connection._command()
+        return set(self.flags)
+
+    def clear_flags(self):
+        self._device.connection._command()
+        flags = set(self.flags)
+        self.flags = set()
+        return flags
+
+
+class SimulatedZaberAxis():
+    """
+    Axis 1 of a simulated device, with the motion calls of
+    zaber_motion.ascii.Axis that BaseAxis forwards to it.
+    """
+    def __init__(self, device):
+        self.device = device
+        self.axis_number = 1
+
+    # speed and acceleration from the device settings, in mm or rad
+    def _limits(self):
+        values = self.device.settings._values
+        step = self.device.model.microstep
+        return (values['maxspeed'] / SPEED_DATA_FACTOR * step,
+                values['accel'] / ACCEL_DATA_FACTOR * step)
+
+    def _move(self, target, wait_until_idle):
+        self.device.connection._command()
+        speed, accel = self._limits()
+        self.device.motor.move_to(target, speed, accel)
+        if wait_until_idle:
+            self.wait_until_idle()
+        return None
+
+    def home(self, wait_until_idle=True):
+        return self._move(max(self.device.model.limits[0], 0.0), wait_until_idle)
+
+    def move_absolute(self, position, unit=Units.NATIVE, wait_until_idle=True):
+        return self._move(self._base(position, unit), wait_until_idle)
+
+    def move_relative(self, position, unit=Units.NATIVE, wait_until_idle=True):
+        return self._move(self.device.motor.target() + self._base(position, unit), wait_until_idle)
+
+    def get_position(self, unit=Units.NATIVE):
+        self.device.connection._command()
+        position = self.device.motor.position()
+        if unit == Units.NATIVE:
+            return position / self.device.model.microstep
+        return _from_base(position, unit)
+
+    def is_busy(self):
+        self.device.connection._command()
+        return self.device.motor.busy()
+
+    def wait_until_idle(self, throw_error_on_fault=True):
+        self.device.connection._command()
+        return self.device.motor.wait()
+
+    def stop(self, wait_until_idle=True):
+        self.device.connection._command()
+        self.device.motor.stop()
+        return None
+
+    def _base(self, value, unit):
+        if unit == Units.NATIVE:
+            return value * self.device.model.microstep
+        return _to_base(value, unit)
+
+
+class SimulatedZaberDevice():
+    """
+    A simulated zaber device, named after one of ZABER_MODELS.
+    """
+    def __init__(self, connection, name, device_address):
+        self.connection = connection
+        self.name = name
+        self.model = ZABER_MODELS[name]
+        self.device_address = device_address
+        self.device_id = 50000 + device_address
+        self.serial_number = 100000 + device_address
+        self.motor = SimulatedMotor(connection.clock, 0.0, self.model.limits)
+        self.settings = SimulatedZaberSettings(self)
+        self.warnings = SimulatedWarnings(self)
+        self._axis = SimulatedZaberAxis(self)
+
+    def get_axis(self, axis_number):
+        return self._axis
+
+    def __repr__(self):
+        return f'SimulatedZaberDevice({self.device_address}, {self.name})'
+
+
+class SimulatedZaberConnection():
+    """
+    Stands in for a zaber_motion.ascii.Connection with daisy-chained
+    devices.
+
+    Attributes
+    ----------
+    transactions : int
+        number of commands the devices have answered.
+    """
+    COMMAND_TIME = 0.0015 # seconds per command and reply at 115200 baud
+
+    def __init__(self, clock, device_names):
+        self.clock = clock
+        self.interface_id = 0
+        self.transactions = 0
+        self.devices = [SimulatedZaberDevice(self, name, i + 1)
+                        for i, name in enumerate(device_names)]
+
+    def _command(self):
+        self.transactions += 1
+        self.clock.sleep(SimulatedZaberConnection.COMMAND_TIME)
+
+    def detect_devices(self, identify_devices=True):
+        self._command()
+        return list(self.devices)
+
+    def close(self):
+        return None
+
+
+########################### ORIENTAL MOTOR ###########################
+class SimulatedAZDriver():
+    """
+    Register level model of an AZ series driver running direct data
+    operation. Positions are in driver steps, speeds in Hz and rates in
+    Hz/s, as on the real driver.
+    """
+    HOME_SPEED = 5000       # Hz, ZHOME operating speed
+    HOME_ACCEL = 30000      # Hz/s
+    TORQUE = (20, 80)       # 1=0.1 %, idle / moving
+    VOLTAGE = 240           # 1=0.1 V
+
+    def __init__(self, clock, address, limits=(-36000, 36000)):
+        self.address = address
+        self.motor = SimulatedMotor(clock, 0.0, limits)
+        self.registers = {}
+        self.home_position = 0
+        self.homed = False
+
+    def _register32(self, register):
+        value = self.registers.get(register, 0) << 16 | self.registers.get(register + 1, 0)
+        return value - (1 << 32) if value & 0x80000000 else value
+
+    # 32 bit value of a monitor register pair
+    def _value(self, register):
+        motor = self.motor
+        busy = motor.busy()
+        if register == REG.OUTPUT_STATUS:
+            status = 0
+            if busy:
+                status |= IO.MOVE
+            else:
+                status |= IO.READY | IO.IN_POS
+                if self.homed and round(motor.position()) == self.home_position:
+                    status |= IO.HOME_END
+            return status
+        if register == REG.COMMAND_POSITION:
+            return int(round(motor.target()))
+        if register == REG.FEEDBACK_POSITION:
+            return int(round(motor.position()))
+        if register == REG.TORQUE_MONITOR:
+            return SimulatedAZDriver.TORQUE[busy]
+        if register == REG.DRIVER_TEMPERATURE:
+            return int(round(10 * motor.temperatures()[0]))
+        if register == REG.MOTOR_TEMPERATURE:
+            return int(round(10 * motor.temperatures()[1]))
+        if register in (REG.INVERTER_VOLTAGE, REG.SUPPLY_VOLTAGE):
+            return SimulatedAZDriver.VOLTAGE
+        return self._register32(register)
+
+    def read(self, register, count):
+        """
+        returns 'count' 16 bit register values from 'register'.
+        """
+        words = []
+        for r in range(register, register + count):
+            value = self._value(r & ~1) & 0xFFFFFFFF
+            words.append(value >> 16 if r % 2 == 0 else value & 0xFFFF)
+        return words
+
+    def write(self, register, words):
+        """
+        store 16 bit register values from 'register' and run any
+        operation they trigger.
+        """
+        for i, word in enumerate(words):
+            self.registers[register + i] = word
+        written = range(register, register + len(words))
+        if ModbusRTU.DIRECT_DATA + 0xF in written and self._register32(ModbusRTU.DIRECT_DATA + 0xE):
+            self.__direct_data()
+        if ModbusRTU.INPUT_COMMAND in written:
+            command = self.registers[ModbusRTU.INPUT_COMMAND]
+            if command & IO.ZHOME:
+                self.motor.move_to(self.home_position, SimulatedAZDriver.HOME_SPEED, SimulatedAZDriver.HOME_ACCEL)
+                self.homed = True
+            if command & IO.STOP:
+                self.motor.stop()
+        return True
+
+    def __direct_data(self):
+        base = ModbusRTU.DIRECT_DATA
+        op_type, position, speed, accel, decel = [
+            self._register32(base + 2 * i) for i in range(1, 6)]
+        if op_type == ModbusRTU.TYPE_ABSOLUTE:
+            target = position
+        elif op_type == ModbusRTU.TYPE_INCREMENTAL_FEEDBACK:
+            target = self.motor.position() + position
+        elif op_type == ModbusRTU.TYPE_CONTINUOUS_SPEED:
+            target = self.motor.limits[speed > 0]
+        else:
+            return False
+        self.motor.move_to(target, abs(speed), accel, decel)
+        self.registers[base + 0xE] = self.registers[base + 0xF] = 0 # trigger cleared
+        return True
+
+
+class SimulatedModbusPort():
+    """
+    A serial-like port with simulated AZ drivers on the bus. It answers
+    Modbus RTU frames written to it, for use as the serial port of the
+    ModbusRTU backend.
+
+    Attributes
+    ----------
+    drivers : dict
+        {slave address: SimulatedAZDriver}
+    transactions : int
+        number of request / response frames exchanged.
+    """
+    BAUD = 115200
+    TX_WAIT = 0.003 # seconds, driver transmission waiting time
+
+    def __init__(self, clock, addresses=(3,)):
+        self.clock = clock
+        self.drivers = {a: SimulatedAZDriver(clock, a) for a in addresses}
+        self.transactions = 0
+        self.is_open = True
+        self._out = b''
+
+    @property
+    def in_waiting(self):
+        return len(self._out)
+
+    def read(self, size=1):
+        data, self._out = self._out[:size], self._out[size:]
+        return data
+
+    def write(self, frame):
+        frame = bytes(frame)
+        response = self.__respond(frame)
+        self.transactions += 1
+        # 11 bits per byte with start, parity and stop bits
+        self.clock.sleep((len(frame) + len(response)) * 11 / SimulatedModbusPort.BAUD
+                         + SimulatedModbusPort.TX_WAIT)
+        self._out += response
+        return len(frame)
+
+    def close(self):
+        self.is_open = False
+        return None
+
+    def __respond(self, frame):
+        if len(frame) < 4 or crc16(frame[:-2]) != frame[-2] | frame[-1] << 8:
+            return b''
+        slave, function = frame[0], frame[1]
+        driver = self.drivers.get(slave)
+        if driver is None:
+            return b''
+        register = frame[2] << 8 | frame[3]
+        if function == ModbusRTU.READ_HOLDING:
+            count = frame[4] << 8 | frame[5]
+            data = b''.join(w.to_bytes(2, 'big') for w in driver.read(register, count))
+            return ModbusRTU._frame(bytes((slave, function, len(data))) + data)
+        if function == ModbusRTU.WRITE_SINGLE:
+            driver.write(register, [frame[4] << 8 | frame[5]])
+            return frame
+        if function == ModbusRTU.WRITE_MULTIPLE:
+            count = frame[4] << 8 | frame[5]
+            words = [frame[7 + 2 * i] << 8 | frame[8 + 2 * i] for i in range(count)]
+            driver.write(register, words)
+            return ModbusRTU._frame(frame[:6])
+        if function == ModbusRTU.DIAGNOSIS and register == ModbusRTU.RETURN_QUERY_DATA:
+            return frame
+        return ModbusRTU._frame(bytes((slave, function | 0x80, 1))) # illegal function
+
+
+################################ RIG ################################
+class SimulatedRig():
+    """
+    The complete simulated platform: the zaber axes daisy-chained on one
+    connection, and the AZ tilt axis on a modbus port.
+
+    Parameters
+    ----------
+    realtime : bool
+        follow the wall clock instead of virtual time.
+    zaber_devices : list
+        device names from ZABER_MODELS, in daisy-chain order.
+    tilt_axis : bool
+        whether the oriental motor tilt axis is connected.
+
+    Methods
+    -------
+    modbus_controller() : ModbusController
+        a controller on the simulated modbus port.
+    transactions : dict
+        commands answered so far by the zaber and modbus devices.
+    """
+    ZABER_DEVICES = ['X-LRT0500AL-E08C', 'X-RST120AK-E03', 'X-LRT0750AL-E08C', 'X-RSW60A-E03']
+    TILT_ADDRESS = 3
+
+    def __init__(self, realtime=False, zaber_devices=ZABER_DEVICES, tilt_axis=True):
+        self.clock = SimulationClock(realtime)
+        self.zaber = SimulatedZaberConnection(self.clock, zaber_devices)
+        addresses = (SimulatedRig.TILT_ADDRESS,) if tilt_axis else ()
+        self.modbus_port = SimulatedModbusPort(self.clock, addresses)
+
+    def modbus_controller(self):
+        return ModbusController('SIM', 'rtu', self.modbus_port, self.clock)
+
+    @property
+    def transactions(self):
+        return {'zaber': self.zaber.transactions, 'modbus': self.modbus_port.transactions}
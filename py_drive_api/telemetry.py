@@ -0,0 +1,394 @@
+import csv
+import json
+import logging
+import math
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# one reading of an axis. temperatures are None when the device
+# doesn't report them.
+TemperatureSample = namedtuple(
+    'TemperatureSample', ['time', 'label', 'driver', 'motor'])
+
+
+class TelemetrySampler():
+    """
+    Polls the driver and motor temperature of every axis on a background
+    thread at a fixed rate, so that moves never wait on temperature reads.
+
+    Attributes
+    ----------
+    axes : list
+        the axis objects to sample. anything with driver_temperature()
+        and motor_temperature() methods, zaber or oriental motor.
+    interval : float
+        seconds between sampling rounds.
+    samples : collections.deque
+        ring buffer of TemperatureSample records, oldest first. holds
+        at most 'maxlen' samples.
+
+    Methods
+    -------
+    start(interval: float)
+        start sampling on a background thread.
+    stop()
+        stop sampling and wait for the thread to finish.
+    sample() : list
+        read every axis once on the calling thread.
+    latest() : dict
+        {axis.label: TemperatureSample} with the newest reading per axis.
+    """
+
+    DEFAULT_INTERVAL = 60 # seconds
+    DEFAULT_MAXLEN = 4096 # samples
+
+    def __init__(self, axes, interval=DEFAULT_INTERVAL, maxlen=DEFAULT_MAXLEN):
+        self.axes = list(axes)
+        self.interval = interval
+        self.samples = deque(maxlen=maxlen)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._failing = set() # labels of the axes whose last sample failed
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def sample(self):
+        """
+        read temperatures from every axis once and store them.
+        """
+        readings = []
+        for axis in self.axes:
+            try:
+                driver = axis.driver_temperature()
+                motor = axis.motor_temperature()
+                if getattr(axis, 'recorder', None) is not None:
+                    axis.recorder.record(driver_temperature=driver, motor_temperature=motor)
+            except Exception:
+                # the first failure of an axis is a warning with the
+                # traceback, repeats until it recovers only go to debug
+                if axis.label in self._failing:
+                    logger.debug('%s temperature sample failed again.', axis)
+                else:
+                    self._failing.add(axis.label)
+                    logger.warning('%s temperature sample failed.', axis, exc_info=True)
+                continue
+            if axis.label in self._failing:
+                self._failing.discard(axis.label)
+                logger.info('%s temperature sampling recovered.', axis)
+            reading = TemperatureSample(time.time(), axis.label, driver, motor)
+            self.samples.append(reading)
+            readings.append(reading)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('temperatures: %s', ', '.join(
+                f'{r.label} driver {r.driver} motor {r.motor}' for r in readings))
+        return readings
+
+    def latest(self):
+        """
+        returns the newest sample of each axis.
+        """
+        latest = {}
+        for reading in self.samples:
+            latest[reading.label] = reading
+        return latest
+
+    def start(self, interval=None):
+        """
+        start sampling every 'interval' seconds. the first round is
+        taken immediately.
+        """
+        if interval is not None:
+            self.interval = interval
+        if self.running:
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self.__run, name='TelemetrySampler', daemon=True)
+        self._thread.start()
+        logger.info(f'Telemetry sampling started every {self.interval}s.')
+        return True
+
+    def stop(self):
+        """
+        stop sampling. readings already taken are kept.
+        """
+        if not self.running:
+            return False
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        logger.info('Telemetry sampling stopped.')
+        return True
+
+    def __run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+
+# channels of an axis recording, the numeric fields of an AxisStatus
+CHANNELS = ('position', 'torque', 'driver_temperature', 'motor_temperature',
+            'inverter_voltage', 'supply_voltage')
+# start of every chunk in a recording file, followed by the header length
+# as a little endian uint32, the json header and the columns
+CHUNK_MAGIC = b'PDTC'
+
+
+class TelemetryRecorder():
+    """
+    Records every sample of an axis into preallocated columns, one typed
+    array per channel plus monotonic nanosecond timestamps. Full chunks
+    are appended to 'path' by a background writer, so a recording of any
+    length costs at most 'max_bytes' of memory.
+
+    Parameters
+    ----------
+    path : str, optional
+        append only recording file. without it the newest chunks are
+        kept in memory and the oldest are dropped past 'max_bytes'.
+    channels : tuple
+        names of the float columns, CHANNELS by default.
+    chunk_size : int
+        rows per chunk, and per write.
+    max_bytes : int
+        memory for the chunks not written yet, at least two chunks.
+    clock : module or SimulationClock
+        time source of the timestamps.
+
+    Attributes
+    ----------
+    rows : int
+        samples recorded.
+    dropped : int
+        samples lost because the memory cap was reached.
+
+    Methods
+    -------
+    record(**values)
+        one sample, channels not given are NaN.
+    record_status(status: AxisStatus)
+        a sample of every channel from SerialCom.status_snapshot().
+    columns() : dict
+        {'time_ns': array, channel: array, 'epoch_ns': int} of the
+        samples in memory.
+    flush() / close()
+        write the samples in memory, close() also stops the writer.
+    """
+
+    DEFAULT_CHUNK_SIZE = 4096 # rows
+    DEFAULT_MAX_BYTES = 8 * 2 ** 20
+
+    def __init__(self, path=None, channels=CHANNELS, chunk_size=DEFAULT_CHUNK_SIZE,
+                 max_bytes=DEFAULT_MAX_BYTES, clock=time):
+        self.path = path
+        self.channels = tuple(channels)
+        self.chunk_size = chunk_size
+        chunk_bytes = chunk_size * 8 * (len(self.channels) + 1)
+        self.max_chunks = max(2, max_bytes // chunk_bytes)
+        self.clock = clock
+        if hasattr(clock, 'monotonic_ns'):
+            self._now = clock.monotonic_ns
+            self.epoch_ns = clock.time_ns() - clock.monotonic_ns()
+        else: # virtual clocks only have time()
+            self._now = lambda: int(clock.time() * 1e9)
+            self.epoch_ns = 0
+        self.rows = 0
+        self.dropped = 0
+        self._chunk = self.__new_chunk()
+        self._n = 0
+        self._full = deque() # chunks not written yet, oldest first
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._writing = 0 # rows being written outside the lock
+        self._closed = False
+        self._writer = None
+        if path is not None:
+            self._writer = threading.Thread(
+                target=self.__write_chunks, name='TelemetryRecorder', daemon=True)
+            self._writer.start()
+
+    def __new_chunk(self):
+        chunk = {'time_ns': array('q', bytes(8 * self.chunk_size))}
+        for name in self.channels:
+            chunk[name] = array('d', [math.nan]) * self.chunk_size
+        return chunk
+
+    def record(self, t=None, **values):
+        """
+        record one sample at monotonic time 't' in ns, now by default.
+        values of channels this recorder doesn't have are left out.
+        """
+        t = self._now() if t is None else t
+        with self._lock:
+            chunk, n = self._chunk, self._n
+            chunk['time_ns'][n] = t
+            for name, value in values.items():
+                if value is not None and name in self.channels:
+                    chunk[name][n] = value
+            self._n = n + 1
+            self.rows += 1
+            if self._n == self.chunk_size:
+                self.__rotate()
+        return None
+
+    def record_status(self, status):
+        """
+        record an AxisStatus, timestamped now.
+        """
+        return self.record(**{name: getattr(status, name) for name in self.channels})
+
+    # move the current chunk to the full ones, called with the lock held
+    def __rotate(self):
+        if len(self._full) == self.max_chunks:
+            if not self.dropped:
+                logger.warning('Telemetry memory cap reached, dropping the oldest samples.')
+            self.dropped += self._full.popleft()[1]
+        self._full.append((self._chunk, self._n))
+        self._chunk = self.__new_chunk()
+        self._n = 0
+        self._ready.notify()
+
+    def columns(self):
+        """
+        the samples in memory, oldest first, as {'time_ns': array,
+        channel: array, 'epoch_ns': int} like read_recording().
+        """
+        with self._lock:
+            chunks = list(self._full) + [(self._chunk, self._n)]
+            columns = {name: array(column.typecode) for name, column in self._chunk.items()}
+            for chunk, n in chunks:
+                for name, column in columns.items():
+                    column.extend(chunk[name][:n])
+        columns['epoch_ns'] = self.epoch_ns
+        return columns
+
+    def clear(self):
+        """
+        forget the samples in memory that weren't written.
+        """
+        with self._lock:
+            self._full.clear()
+            self._chunk = self.__new_chunk()
+            self._n = 0
+        return True
+
+    def flush(self):
+        """
+        write the samples in memory to 'path' and wait for the writer.
+        """
+        if self.path is None or self._closed:
+            return False
+        with self._lock:
+            if self._n:
+                self.__rotate()
+            while self._full or self._writing:
+                self._ready.wait()
+        return True
+
+    def close(self):
+        """
+        write what is left and stop the writer thread.
+        """
+        if self._closed:
+            return False
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._ready.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        return True
+
+    def __write_chunks(self):
+        while True:
+            with self._lock:
+                while not self._full and not self._closed:
+                    self._ready.wait()
+                if not self._full:
+                    return
+                chunk, n = self._full.popleft()
+                self._writing = n
+            try:
+                with open(self.path, 'ab') as f:
+                    f.write(self.__encode(chunk, n))
+            except OSError:
+                logger.exception('Writing telemetry to %s failed.', self.path)
+                with self._lock:
+                    self.dropped += n
+            with self._lock:
+                self._writing = 0
+                self._ready.notify_all()
+
+    def __encode(self, chunk, n):
+        header = json.dumps({
+            'rows': n,
+            'columns': [[name, column.typecode] for name, column in chunk.items()],
+            'byteorder': sys.byteorder,
+            'epoch_ns': self.epoch_ns,
+        }).encode()
+        blocks = [CHUNK_MAGIC, struct.pack('<I', len(header)), header]
+        blocks += [column[:n].tobytes() for column in chunk.values()]
+        return b''.join(blocks)
+
+
+def read_recording(path):
+    """
+    read a TelemetryRecorder file back as {'time_ns': array, channel:
+    array, 'epoch_ns': int}. add epoch_ns to time_ns for unix time in ns.
+    columns missing from some chunks are NaN there.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    columns = {}
+    rows = 0
+    epoch_ns = 0
+    offset = 0
+    while offset < len(data):
+        if data[offset:offset + 4] != CHUNK_MAGIC:
+            raise ValueError(f'{path} is not a telemetry recording, or it is corrupt at byte {offset}.')
+        size, = struct.unpack_from('<I', data, offset + 4)
+        offset += 8
+        header = json.loads(data[offset:offset + size])
+        offset += size
+        n = header['rows']
+        epoch_ns = header['epoch_ns']
+        for name, typecode in header['columns']:
+            column = array(typecode)
+            end = offset + n * column.itemsize
+            column.frombytes(data[offset:end])
+            if header['byteorder'] != sys.byteorder:
+                column.byteswap()
+            offset = end
+            if name not in columns: # new channel, NaN for the rows before
+                columns[name] = array(typecode, [math.nan if typecode == 'd' else 0]) * rows
+            columns[name].extend(column)
+        rows += n
+        for column in columns.values(): # channels this chunk didn't have
+            if len(column) < rows:
+                column.extend([math.nan] * (rows - len(column)))
+    columns['epoch_ns'] = epoch_ns
+    return columns
+
+
+def export_csv(columns, path):
+    """
+    write {'time_ns': array, channel: array} columns, e.g. from
+    TelemetryRecorder.columns() or read_recording(), to a csv file with
+    the time in seconds.
+    """
+    names = [name for name in columns if name not in ('time_ns', 'epoch_ns')]
+    epoch_ns = columns.get('epoch_ns', 0)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['time'] + names)
+        for i, t in enumerate(columns['time_ns']):
+            writer.writerow([(t + epoch_ns) / 1e9] + [columns[name][i] for name in names])
+    return path
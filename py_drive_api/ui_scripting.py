@@ -1,13 +1,18 @@
-import json
+import atexit
 import logging
 import sys
-import pyautogui as pg
+import threading
 from time import sleep
 from os import listdir, getenv, makedirs
 from os.path import getmtime, join, isdir, dirname
-from xml.etree import ElementTree as ET
 
-from ..py_drive_api import logs_dir
+from .autosave import AutosavePolicy
+from .jsonrpc import JsonRpcClient, JsonRpcError, print_line
+from .log_config import configure as configure_logging, logs_dir
+from .metadata import MetadataSession
+from .retry_policy import RetryPolicy
+from .rpc_stats import RpcStats
+from .ui_state import UIState
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +30,18 @@ class UI_Scripting:
     sequence = 1
     CUSTOM_METADATA = False
     _template = join(logs_dir,'custom-scan-metadata.xml')
+    _metadata = None # MetadataSession of _template, created on first use
+    reader = None # file-like transport for responses, None for sys.stdin
+    writer = None # file-like transport for requests, None for sys.stdout
+    MAX_IN_FLIGHT = 1 # the gui answers one request at a time
+    BATCH_REQUESTS = False # send setup sequences as json rpc batch requests
+    _rpc_client = None
+    _id_lock = threading.Lock()
+    AUTOSAVE = AutosavePolicy() # save after every scan, see setAutosave()
+    _exit_flush_registered = False
+    STATE = UIState() # mirror of the gui settings, skips requests that change nothing
+    STATS = RpcStats() # latency, failures and retries of every request by method
+    RETRY = RetryPolicy(observer=STATS.retried) # backoff, failure budget and circuit breaker for captures and scans
 
 
     #################################################
@@ -33,42 +50,151 @@ class UI_Scripting:
     @staticmethod
     def log(message):
         logger.debug(message)
-        print(message, flush=True)
+        print_line(message)
 
     @staticmethod
-    def jsonrpcCall(method, params=None):
-        UI_Scripting.id = UI_Scripting.id + 1
-        logger.info(
-            f"{UI_Scripting.id} --> Requesting: {method}, params: {params}")
+    def connect(reader=None, writer=None, max_in_flight=None):
+        """
+        send json rpc requests to 'writer' and read the responses
+        from 'reader' instead of stdout / stdin, e.g. to run against
+        a simulated or recorded gui. call without arguments to
+        go back to stdout / stdin. 'max_in_flight' sets how many
+        requests may wait for a response at once.
+        """
+        UI_Scripting.reader = reader
+        UI_Scripting.writer = writer
+        if max_in_flight is not None:
+            UI_Scripting.MAX_IN_FLIGHT = max_in_flight
+        UI_Scripting._rpc_client = None
+        UI_Scripting.STATE.invalidate()
+        return None
+
+    # json rpc client on the current transport, created on first use
+    @staticmethod
+    def _client():
+        if UI_Scripting._rpc_client is None:
+            configure_logging()
+            UI_Scripting._rpc_client = JsonRpcClient(
+                UI_Scripting.reader if UI_Scripting.reader is not None else sys.stdin,
+                UI_Scripting.writer if UI_Scripting.writer is not None else sys.stdout,
+                UI_Scripting.MAX_IN_FLIGHT)
+        return UI_Scripting._rpc_client
+
+    @staticmethod
+    def jsonrpcCallAsync(method, params=None):
+        """
+        send a request without waiting for the response. returns a
+        jsonrpc.RpcFuture, pass it to jsonrpcResult() for the outcome.
+        requests that would not change the gui state (see UIState)
+        are not sent, their future is already done.
+        """
         if(params is not None):
             params = params.replace('\\','/')
-            print('{"jsonrpc":"2.0", "method":"' +
-                  method +
-                  '", "id":' +
-                  str(UI_Scripting.id) +
-                  ', "params":["' +
-                  str(params) +
-                  '"]' +
-                  '}', flush=True)
-        else:
-            print('{"jsonrpc":"2.0", "method":"' + method +
-                  '", "id":' + str(UI_Scripting.id) + '}', flush=True)
-        try:
-            j = json.loads(sys.stdin.readline())
-        except:
-            print('Invalid input. Expected json formatted response with "result" field!')
+        if UI_Scripting.STATE.redundant(method, params):
+            return UI_Scripting._client().resolved(method, params)
+        with UI_Scripting._id_lock:
+            UI_Scripting.id = UI_Scripting.id + 1
+            request_id = UI_Scripting.id
+        logger.info(
+            f"{request_id} --> Requesting: {method}, params: {params}")
+        sent = UI_Scripting.STATS.clock.time()
+        future = UI_Scripting._client().call_async(method, params, request_id)
+        future.sent = sent
+        return future
+
+    @staticmethod
+    def jsonrpcResult(future, timeout=None):
+        """
+        wait for the response to a jsonrpcCallAsync() request. returns
+        True if the gui answered with a result.
+        """
+        if future.id is None: # skipped, nothing to change
+            return True
+        j = UI_Scripting._response(future, timeout)
+        if j is None:
             return False
         if "result" in j:
-            m = '<-- ' + str(UI_Scripting.id) + ' succeeded'
+            m = '<-- ' + str(future.id) + ' succeeded'
             UI_Scripting.log(m)
             logger.info(m)
             return True
         else:
-            m = '<-- ' + str(UI_Scripting.id) + ' ***FAILED***'
+            m = '<-- ' + str(future.id) + ' ***FAILED***'
             UI_Scripting.log(m)
             logger.warning(f'Failure: {j}' + m)
             return False
 
+    # response object of a request, None if there was no valid response.
+    # records the time from sending the request to having its response.
+    @staticmethod
+    def _response(future, timeout=None):
+        try:
+            j = future.result(timeout)
+        except JsonRpcError:
+            print_line('Invalid input. Expected json formatted response with "result" field!')
+            j = None
+        j = j if isinstance(j, dict) else None
+        if j is not None and "result" in j:
+            UI_Scripting.STATE.succeeded(future.method, future.params)
+        else:
+            UI_Scripting.STATE.failed(future.method, future.params)
+        sent = future.sent
+        if sent is not None:
+            future.sent = None # recorded once
+            UI_Scripting.STATS.record(future.method, UI_Scripting.STATS.clock.time() - sent,
+                                      j is not None and "result" in j)
+        return j
+
+    @staticmethod
+    def jsonrpcBatch(calls):
+        """
+        send several requests, given as (method, params) tuples, as one
+        json rpc batch and wait for all of the responses. returns True or
+        False for each request, like jsonrpcCall(). with BATCH_REQUESTS
+        off the requests are sent one at a time instead.
+        """
+        if not UI_Scripting.BATCH_REQUESTS:
+            futures = [UI_Scripting.jsonrpcCallAsync(m, p) for m, p in calls]
+            return [UI_Scripting.jsonrpcResult(f) for f in futures]
+        calls = [(m, p.replace('\\','/') if p is not None else p) for m, p in calls]
+        send = [i for i, (m, p) in enumerate(calls) if not UI_Scripting.STATE.redundant(m, p)]
+        results = [True] * len(calls)
+        if not send:
+            return results
+        sent_results = UI_Scripting.__sendBatch([calls[i] for i in send])
+        for i, ok in zip(send, sent_results):
+            results[i] = ok
+        return results
+
+    @staticmethod
+    def __sendBatch(calls):
+        with UI_Scripting._id_lock:
+            ids = list(range(UI_Scripting.id + 1, UI_Scripting.id + 1 + len(calls)))
+            UI_Scripting.id += len(calls)
+        logger.info(f"{ids[0]}-{ids[-1]} --> Requesting batch: {calls}")
+        sent = UI_Scripting.STATS.clock.time()
+        futures = UI_Scripting._client().batch_async(calls, ids)
+        responses = [UI_Scripting._response(f) for f in futures]
+        results = [r is not None and "result" in r for r in responses]
+        # the requests of a batch share one round trip, which can't be
+        # split between their methods, so it is recorded once
+        UI_Scripting.STATS.record(RpcStats.BATCH, UI_Scripting.STATS.clock.time() - sent, all(results))
+        failed = [f.id for f, ok in zip(futures, results) if not ok]
+        if failed:
+            m = f'<-- {ids[0]}-{ids[-1]} ***FAILED*** {failed}'
+            UI_Scripting.log(m)
+            logger.warning(f'Failure: {[r for r, ok in zip(responses, results) if not ok]}' + m)
+        else:
+            m = f'<-- {ids[0]}-{ids[-1]} succeeded'
+            UI_Scripting.log(m)
+            logger.info(m)
+        return results
+
+    @staticmethod
+    def jsonrpcCall(method, params=None):
+        return UI_Scripting.jsonrpcResult(
+            UI_Scripting.jsonrpcCallAsync(method, params))
+
     @staticmethod
     def __addScanToFusion():
         if UI_Scripting.jsonrpcCall("ScanAddToFusion"):
@@ -102,6 +228,8 @@ class UI_Scripting:
         """
         if UI_Scripting.jsonrpcCall("SetScanReferenceDataPath", path):
             logger.info(f'Successfully set metadata Reference Data Path: {path}\n')
+            if UI_Scripting._metadata is not None:
+                UI_Scripting._metadata.active = path == UI_Scripting._metadata.path
             if path is "":
                 UI_Scripting.CUSTOM_METADATA = False
             else:
@@ -132,6 +260,20 @@ class UI_Scripting:
             logger.warning("Failed starting scan. Switched to scanning tab to retry!")
             return UI_Scripting.jsonrpcCall("ScanStart")
 
+    # sends 'setup' requests, the switch to the scanning tab if needed and the
+    # scan start as one batch. returns the start result and the setup results.
+    @staticmethod
+    def __startScanBatch(setup):
+        calls = list(setup)
+        UI_Scripting.cUITab = "Scanning"
+        calls.append(("ChangeNavigationTab", "Scanning")) # skipped if already there
+        calls.append(("ScanStart", None))
+        results = UI_Scripting.jsonrpcBatch(calls)
+        if not results[-2]:
+            UI_Scripting.log("Error switching to scan tab")
+            logger.warning("Failed switching to scan tab. . .")
+        return results[-1], results[:len(setup)]
+
     @staticmethod
     def __stepCalibrationForward():
         return UI_Scripting.jsonrpcCall("FlatPlateCalibrationStepForwards")
@@ -167,42 +309,34 @@ class UI_Scripting:
               be tuples of length 2. The first element is assigned to name, and the other element is 
               the value field.
         """
-        units = {
-            'target_tilt':'rad','x_rot':'rad','y_rot':'rad','z_lin':'mm','y_lin':'mm'
-        }
-        metatree = ET.Element('metatree',name='python')
-        metatree.text = '\n\t'
-        if alignment:
-            guide = {str(a):str(alignment[a]) for a in alignment if a in ['rotX','rotY','rotZ','angleTolerance','icr']}
-            if guide: 
-                if 'angleTolerance' not in guide: guide['angleTolerance'] = '5'
-                if 'icr' not in guide: guide['icr'] = 'None'
-                metatree.append(ET.Element('alignmentGuide',guide))
-        if positions:
-            for p in positions:
-                if p in units:
-                    metatree.append(ET.Element('metaentry',{
-                        'name':f'{p}-absolute_{units[p]}',
-                        'value':str(positions[p])
-                    }))
-        if metaentry_tuple_list:
-            for l in metaentry_tuple_list:
-                if type(l) is tuple and len(l)==2:
-                    metatree.append(
-                        ET.Element(
-                            'metaentry',
-                            {
-                                'name':str(l[0]),
-                                'value':str(l[1])
-                            })
-                    )
-        for idx, e in enumerate(metatree):
-            if idx<len(metatree)-1:
-                e.tail = '\n\t'
-            else: 
-                e.tail = '\n'
-        with open(UI_Scripting._template,'w') as template:
-            template.write(ET.tostring(metatree).decode())
+        return UI_Scripting._metadataFile().update(positions, alignment, metaentry_tuple_list)
+
+    @staticmethod
+    def _metadataFile():
+        if UI_Scripting._metadata is None:
+            UI_Scripting._metadata = MetadataSession(UI_Scripting._template)
+        return UI_Scripting._metadata
+
+    @staticmethod
+    def startMetadataSession():
+        """
+        keep the custom metadata file as the scan reference data
+        path until endMetadataSession(). Scan() then only rewrites
+        the file when the metadata changed, and sends no requests
+        for it.
+        """
+        session = UI_Scripting._metadataFile()
+        if not session.active:
+            UI_Scripting._scanReferenceDataPath(session.path)
+        return session
+
+    @staticmethod
+    def endMetadataSession():
+        """
+        stop adding the custom metadata file to scans.
+        """
+        if UI_Scripting._metadata is not None and UI_Scripting._metadata.active:
+            return UI_Scripting._scanReferenceDataPath('')
         return True
 
     #################################################
@@ -214,39 +348,45 @@ class UI_Scripting:
         """
         adds the current view with the filename "name" if 
         it is specified. If capture fails, this will retry up
-        to ten times, before logging a failed capture.
-        """
-        if UI_Scripting.__setTargetType(target_type):
-            ret = UI_Scripting.jsonrpcCall("AddCalibrationView", name)
+        to ten times under the RETRY policy, before logging a
+        failed capture. raises retry_policy.CircuitOpenError if
+        captures failed too often recently and the
+        AddCalibrationView circuit is open.
+        """
+        # never batched with the capture, a view must not be added unless
+        # the target type is set. the type change isn't sent at all when
+        # STATE shows the gui already has it.
+        typed = UI_Scripting.__setTargetType(target_type)
+        ret = UI_Scripting.jsonrpcCall("AddCalibrationView", name) if typed else False
+        if typed:
             if ret:
                 return True
-            else:
-                i = 0
-                while not ret and i < 10:
-                    UI_Scripting.log("add view failed...Reattempting")
-                    logger.warning(f'Failed to add calibration view. re-attempt {i+1}...')
-                    if name is not None:
-                        ret = UI_Scripting.jsonrpcCall("AddCalibrationView", name+f'-attempt{i+2}')
-                    else:
-                        ret = UI_Scripting.jsonrpcCall("AddCalibrationView", name)
-                    i+=1
-                    sleep(5)
-                logger.warning('View capture failed!')
-                return False
+            # each retry gets its own view name
+            def rename(attempt):
+                UI_Scripting.log("add view failed...Reattempting")
+                return ("AddCalibrationView", name if name is None else name+f'-attempt{attempt+1}')
+            if UI_Scripting.RETRY.call("AddCalibrationView", UI_Scripting.jsonrpcCall,
+                                       "AddCalibrationView", name, attempts=11,
+                                       on_retry=rename, after_failure=True):
+                return True
+            logger.warning('View capture failed!')
+            return False
         else:
-            logger.warning(f'Failed to set target type to {target_type}')
+            logger.warning(f'Failed to set target type to {target_type}. No view was added.')
             return False
 
     # change the path for saving ExportBasePathEvaluationResult, or
     # use an empty string for no export.
     @staticmethod
-    def basePath(path):
+    def basePath(path, wait=True):
         """
         change path for BasePathEvaluationResult to be stored.
-        paths must be absolute paths.
+        paths must be absolute paths. with wait=False the request
+        future is returned right away, see jsonrpcCallAsync().
         """
-        return UI_Scripting.jsonrpcCall(
+        future = UI_Scripting.jsonrpcCallAsync(
             "SetExportBasePathEvaluationResult", path)
+        return UI_Scripting.jsonrpcResult(future) if wait else future
 
     # makes a calibration file using the currently added views
     @staticmethod
@@ -268,8 +408,12 @@ class UI_Scripting:
     @staticmethod
     def clearProject():
         """
-        start a new project file.
+        start a new project file. scans not autosaved yet are
+        saved first, see setAutosave().
         """
+        if UI_Scripting.AUTOSAVE.on_boundaries:
+            UI_Scripting.flushAutosave()
+        UI_Scripting.AUTOSAVE.discarded()
         UI_Scripting.file_saved = False
         UI_Scripting.sequence = 1
         UI_Scripting.cFpath = ''
@@ -314,8 +458,10 @@ class UI_Scripting:
         switches gui back to calibration tab and leaves you ready to 
         capture views.
         """
+        import pyautogui as pg # loads gui backends, only needed here
         window = pg.getWindowsWithTitle(' 3D Scan 6.0.0.')[0]
         window.activate()
+        UI_Scripting.STATE.invalidate() # the clicks change the gui behind our back
         [pg.click(p[0],p[1],duration=1) for p in 
             [(46,86),(210,210),(219,643),(210,210),(215,551),(215,368),(215,708)]
         ]
@@ -338,9 +484,10 @@ class UI_Scripting:
             for hw in hw_setup_files:
                 if getmtime(hw) > getmtime(most_recent):
                     most_recent = hw
+        UI_Scripting.STATE.invalidate()
         if not UI_Scripting.loadSetupFile(most_recent):
             logger.warning('Failed to load most recent setup file. Reconnect scanner failed!')
-            print('Reconnect failed!')
+            print_line('Reconnect failed!')
             return False
         else:
             logger.debug('Scanner reconnected successfully!')
@@ -366,7 +513,44 @@ class UI_Scripting:
         elif not UI_Scripting.cFpath == filepath:
             UI_Scripting.clearProject()
             UI_Scripting.__saveProjectAs(filepath)
-        return UI_Scripting.jsonrpcCall("SaveProject")
+        if UI_Scripting.jsonrpcCall("SaveProject"):
+            UI_Scripting.AUTOSAVE.saved()
+            return True
+        return False
+
+    @staticmethod
+    def setAutosave(every_scans=1, every_seconds=None, on_boundaries=True, on_exit=True, clock=None):
+        """
+        set when Scan() saves the project, once a path is set with
+        saveProject(). by default after every scan. e.g.
+        every_scans=10, every_seconds=300 saves after 10 scans or
+        5 minutes, whichever comes first. unsaved scans are also
+        saved before clearProject() (on_boundaries), when the script
+        exits (on_exit) and on flushAutosave().
+        returns the AutosavePolicy.
+        """
+        UI_Scripting.flushAutosave()
+        policy = AutosavePolicy(every_scans, every_seconds, on_boundaries, on_exit,
+                                UI_Scripting.AUTOSAVE.clock if clock is None else clock)
+        UI_Scripting.AUTOSAVE = policy
+        logger.info(f'Autosave: {policy}')
+        return policy
+
+    @staticmethod
+    def flushAutosave():
+        """
+        save the project now if it has scans that were not
+        autosaved yet. returns False if that save failed.
+        """
+        if not UI_Scripting.AUTOSAVE.pending or not UI_Scripting.file_saved:
+            return True
+        logger.info(f'Saving {UI_Scripting.AUTOSAVE.pending} unsaved scan(s).')
+        return UI_Scripting.saveProject(filepath=UI_Scripting.cFpath)
+
+    @staticmethod
+    def _flushAutosaveAtExit():
+        if UI_Scripting.AUTOSAVE.on_exit and not UI_Scripting.flushAutosave():
+            logger.error(f'Could not save the last scans to {UI_Scripting.cFpath}!')
 
     # Scans and adds the scan to the list
     @staticmethod
@@ -389,50 +573,80 @@ class UI_Scripting:
                     give a dict with keys 'rotX','rotY','rotZ','icr','angleTolerance'
                     to specify an alignment guide in scan metadata that will be used 
                     when aligning .artifact in David6
+        raises retry_policy.CircuitOpenError if scans failed too often
+        recently and the ScanStart circuit is open.
         """
-        if axes_position_metadata or alignment_guide_metadata or metaentry_tuple_list:
+        # outside a metadata session the reference path is only set for this call
+        metadata = axes_position_metadata or alignment_guide_metadata or metaentry_tuple_list
+        one_off = metadata and not UI_Scripting._metadataFile().active
+        if metadata:
                 logger.info('Writing Custom Metadata...')
                 UI_Scripting.__updateMetadataFile(axes_position_metadata, alignment_guide_metadata, metaentry_tuple_list)
-                UI_Scripting._scanReferenceDataPath(UI_Scripting._template)
+                if one_off:
+                    UI_Scripting._scanReferenceDataPath(UI_Scripting._template)
                 logger.debug('Done writing!!')
-        for r in range(round(repeats)):
-            if name is not None:
-                UI_Scripting.scanNames(f"{name}_R{r}_S{UI_Scripting.sequence}")
-            if basepath is not None:
-                if not UI_Scripting.basePath(basepath):
-                    logger.warning(f"Error setting basePathEval for scan: {name}")
-            scanned = False
-            failed = 0
-            while failed<6 and not scanned:
-                if UI_Scripting.cUITab != "Scanning":
-                    if not UI_Scripting.__switchToTab("Scanning"):
-                        UI_Scripting.log("Error switching to scan tab")
-                        logger.warning(f"{name}: Failed switching to scan tab. . .")
-                if UI_Scripting.__startScan():
-                    if UI_Scripting.__addScanToFusion():
-                        scanned = True
+        try:
+            for r in range(round(repeats)):
+                # setup requests go out together and only have to be answered
+                # before the capture starts. with BATCH_REQUESTS they go in one
+                # batch with the tab switch and the scan start.
+                setup = []
+                if name is not None:
+                    setup.append(("SetBaseScanName", f"{name}_R{r}_S{UI_Scripting.sequence}"))
+                if basepath is not None:
+                    setup.append(("SetExportBasePathEvaluationResult", basepath))
+                if not UI_Scripting.BATCH_REQUESTS:
+                    naming = basepath_set = None
+                    if name is not None:
+                        naming = UI_Scripting.scanNames(setup[0][1], False)
+                    if basepath is not None:
+                        basepath_set = UI_Scripting.basePath(basepath, False)
+                    if naming is not None:
+                        UI_Scripting.jsonrpcResult(naming)
+                    if basepath_set is not None:
+                        if not UI_Scripting.jsonrpcResult(basepath_set):
+                            logger.warning(f"Error setting basePathEval for scan: {name}")
+                def attempt_scan():
+                    nonlocal setup
+                    if UI_Scripting.BATCH_REQUESTS:
+                        started, setup_results = UI_Scripting.__startScanBatch(setup)
+                        if basepath is not None and setup and not setup_results[-1]:
+                            logger.warning(f"Error setting basePathEval for scan: {name}")
+                        setup = [] # only sent with the first attempt
                     else:
+                        if not UI_Scripting.__switchToTab("Scanning"): # skipped if already there
+                            UI_Scripting.log("Error switching to scan tab")
+                            logger.warning(f"{name}: Failed switching to scan tab. . .")
+                        started = UI_Scripting.__startScan()
+                    # fusion only after the capture is known to have started
+                    if started:
+                        if UI_Scripting.__addScanToFusion():
+                            return True
                         UI_Scripting.log("Error adding scan to fusion list")
                         logger.warning(f"{name} add to fusion failed!")
-                else:    
-                    UI_Scripting.log("Error starting scan")
-                    logger.warning(f"{name} scan failed to start capture!")
-                if not scanned:
-                    timeout=5
+                    else:    
+                        UI_Scripting.log("Error starting scan")
+                        logger.warning(f"{name} scan failed to start capture!")
                     if UI_Scripting.__switchToTab("Calibration"):
-                        logger.warning(f"Scan {name} failed! Switched to calibration tab to reset projector. waiting {timeout}s...")
+                        logger.warning(f"Scan {name} failed! Switched to calibration tab to reset projector.")
                     else:
-                        logger.warning(f"Scan {name} failed! Attempted switch to calibration tab and failed! waiting {timeout}s...")
-                    failed += 1
-                    print(f'Scan failed {failed} times...retrying scan!')
-                    sleep(timeout)
-                    UI_Scripting.__switchToTab("Scanning")
-            if UI_Scripting.file_saved:  # Autosave additional scans
-                if not UI_Scripting.saveProject(filepath=UI_Scripting.cFpath):
-                    logger.warning(f"Error autosaving scan {name}!")
+                        logger.warning(f"Scan {name} failed! Attempted switch to calibration tab and failed!")
                     return False
-        if axes_position_metadata or alignment_guide_metadata or metaentry_tuple_list:
-            UI_Scripting._scanReferenceDataPath('')
+                def retry_scan(attempt):
+                    print_line(f'Scan failed {attempt} times...retrying scan!')
+                    UI_Scripting.__switchToTab("Scanning")
+                if not UI_Scripting.RETRY.call("ScanStart", attempt_scan, on_retry=retry_scan):
+                    logger.error(f"Scan {name} failed!")
+                if UI_Scripting.file_saved:  # Autosave additional scans
+                    if not UI_Scripting._exit_flush_registered:
+                        atexit.register(UI_Scripting._flushAutosaveAtExit)
+                        UI_Scripting._exit_flush_registered = True
+                    if UI_Scripting.AUTOSAVE.scan_added() and not UI_Scripting.saveProject(filepath=UI_Scripting.cFpath):
+                        logger.warning(f"Error autosaving scan {name}!")
+                        return False
+        finally: # the one-off reference path must not leak into later scans
+            if one_off:
+                UI_Scripting._scanReferenceDataPath('')
         return True
 
     # requres the system to be on the calibration tab and to have calibration already done
@@ -454,12 +668,14 @@ class UI_Scripting:
 
     # change the base scan name to "base_name"
     @staticmethod
-    def scanNames(base_name):
+    def scanNames(base_name, wait=True):
         """
-        changes default base scan name to "base_name"
+        changes default base scan name to "base_name". with wait=False
+        the request future is returned right away, see jsonrpcCallAsync().
         """
         logger.debug(f'New Scan Name: {base_name}')
-        return UI_Scripting.jsonrpcCall("SetBaseScanName", base_name)
+        future = UI_Scripting.jsonrpcCallAsync("SetBaseScanName", base_name)
+        return UI_Scripting.jsonrpcResult(future) if wait else future
 
 
 # tested py auto gui function added here
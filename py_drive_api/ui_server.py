@@ -0,0 +1,448 @@
+"""
+Stand-in for the 3D Scan gui's JSON-RPC interface, for running and
+benchmarking UI_Scripting code without the gui, e.g. on Linux CI.
+
+ScanSoftwareServer speaks the method set UI_Scripting uses, keeps the gui
+state the methods depend on (navigation tab, calibration views, pending
+scans, project path) and writes real artifact files: calibration zips
+with a calibration.log that Poses.from_file() can read, exported view
+zips and project files. Latency and failure rates are configurable per
+method.
+
+It can be used in process, as the transport of UI_Scripting.connect(),
+or like the gui itself, launching a script with its stdin / stdout
+connected to the server:
+
+    python -m py_drive_api.ui_server --failure-rate 0.05 Scripts/30poseSetup.py
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import zipfile
+from collections import Counter, deque
+from os.path import dirname, isdir, isfile
+from xml.etree import ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# json rpc 2.0 error codes
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class LineTransport():
+    """
+    Base of the gui stand-ins: a file-like object that UI_Scripting writes
+    json rpc requests to, one per line, and reads the responses back from,
+    see UI_Scripting.connect(). subclasses implement _respond().
+    """
+    def __init__(self, clock=time):
+        self.clock = clock
+        self.calls = Counter()
+        self.messages = 0
+        self._buffer = ''
+        self._responses = deque()
+
+    # print() writes the newline separately, so requests are split on it
+    def write(self, text):
+        self._buffer += text
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            response = self.handle_line(line)
+            if response is not None:
+                self._responses.append(response)
+        return len(text)
+
+    def flush(self):
+        return None
+
+    def readline(self):
+        return self._responses.popleft() if self._responses else ''
+
+    def handle_line(self, line):
+        """
+        returns the response line to a request line, or None if the line
+        is not a request (scripts print their log messages to the gui too).
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(request, (dict, list)):
+            return None
+        self.messages += 1
+        self._round_trip()
+        if isinstance(request, list): # batch
+            self.calls.update(r.get('method') for r in request if isinstance(r, dict))
+            response = [self._respond(r) for r in request]
+        else:
+            self.calls[request.get('method')] += 1
+            response = self._respond(request)
+        return json.dumps(response) + '\n'
+
+    def _round_trip(self):
+        return None
+
+    def _respond(self, request):
+        raise NotImplementedError
+
+
+class LatencyModel():
+    """
+    Time the gui takes to answer each method: the mean from 'latency'
+    (seconds per method name) scaled by 'scale', with gaussian jitter of
+    relative size 'jitter'. saves take longer with every scan in the
+    project ('per_scan').
+    """
+    LATENCY = {
+        'AddCalibrationView': 2.2,
+        'CalibrateUsingFlatPlateTarget': 45.0,
+        'ExportCalibrationViews': 6.0,
+        'ScanStart': 3.5,
+        'ScanAddToFusion': 0.4,
+        'SaveProject': 1.2,
+        'SaveProjectAs': 1.5,
+        'ClearProject': 0.5,
+        'ChangeNavigationTab': 0.3,
+        'SwitchTab': 0.3,
+        'DeleteCalibrationViews': 0.2,
+        'ImportHardwareSetup': 3.0,
+    }
+    PER_SCAN = {
+        'SaveProject': 0.25,
+        'SaveProjectAs': 0.25,
+    }
+    DEFAULT = 0.02 # seconds, for the methods not listed
+    ROUND_TRIP = 0.03 # seconds, per message (a single request or a batch)
+
+    def __init__(self, latency=None, scale=1.0, jitter=0.0, seed=None, per_scan=None):
+        self.latency = dict(LatencyModel.LATENCY)
+        self.latency.update(latency or {})
+        self.per_scan = dict(LatencyModel.PER_SCAN)
+        self.per_scan.update(per_scan or {})
+        self.scale = scale
+        self.jitter = jitter
+        self.round_trip = LatencyModel.ROUND_TRIP * scale
+        self._random = random.Random(seed)
+
+    def sample(self, method, scans=0):
+        mean = (self.latency.get(method, LatencyModel.DEFAULT)
+                + self.per_scan.get(method, 0.0) * scans) * self.scale
+        if self.jitter:
+            return max(0.0, mean * (1 + self.jitter * self._random.gauss(0, 1)))
+        return mean
+
+
+class FailureModel():
+    """
+    Probability of each method failing with a json rpc error. 'rates' is
+    one probability for every method, or {method: probability} with an
+    optional '*' entry for the rest.
+    """
+    def __init__(self, rates=0.0, seed=None):
+        self.rates = rates if isinstance(rates, dict) else {'*': rates}
+        self._random = random.Random(seed)
+
+    def fails(self, method):
+        rate = self.rates.get(method, self.rates.get('*', 0.0))
+        return rate > 0 and self._random.random() < rate
+
+
+class ScanSoftwareServer(LineTransport):
+    """
+    Stand-in for the 3D Scan gui json rpc server.
+
+    Parameters
+    ----------
+    clock : module or SimulationClock
+        time source that latencies are slept on.
+    latency : LatencyModel
+    failures : FailureModel
+    artifacts : bool
+        write calibration zips, exported views and projects to the paths
+        the requests give. off, the files are only recorded in 'files'.
+    pose_source : callable, optional
+        returns the current platform pose as {'x_lin', 'y_lin', 'z_lin',
+        'x_rot', 'y_rot', 'z_rot'}, stored with each calibration view.
+
+    Attributes
+    ----------
+    calls, failures : collections.Counter
+        requests and injected failures per method.
+    files : list
+        artifact paths written, in order.
+    """
+    TABS = ('Calibration', 'Scanning', 'Alignment', 'Fusion', 'Measurement')
+
+    def __init__(self, clock=time, latency=None, failures=None, artifacts=True, pose_source=None):
+        super(ScanSoftwareServer, self).__init__(clock)
+        self.latency = latency if latency is not None else LatencyModel()
+        self.failure_model = failures if failures is not None else FailureModel()
+        self.artifacts = artifacts
+        self.pose_source = pose_source
+        self.failures = Counter()
+        self.files = []
+        self.methods = {
+            'AddCalibrationView': self.add_calibration_view,
+            'CalibrateUsingFlatPlateTarget': self.calibrate,
+            'ChangeNavigationTab': self.switch_tab,
+            'ClearProject': self.clear_project,
+            'DeleteCalibrationViews': self.delete_calibration_views,
+            'ExportCalibrationViews': self.export_calibration_views,
+            'FlatPlateCalibrationStepForwards': self.step_forwards,
+            'ImportHardwareSetup': self.import_hardware_setup,
+            'SaveProject': self.save_project,
+            'SaveProjectAs': self.save_project_as,
+            'ScanAddToFusion': self.add_scan_to_fusion,
+            'ScanStart': self.start_scan,
+            'SetBaseScanName': self.set_base_scan_name,
+            'SetCalibrationTargetType': self.set_target_type,
+            'SetExportBasePathEvaluationResult': self.set_base_path,
+            'SetScanReferenceDataPath': self.set_reference_data_path,
+            'StartCalibration': self.start_calibration,
+            'SwitchTab': self.switch_tab,
+        }
+        self.reset()
+
+    def reset(self):
+        """
+        back to the state of a freshly started gui.
+        """
+        self.tab = 'Calibration'
+        self.target_type = 'FlatPlate'
+        self.views = []
+        self.base_scan_name = 'Scan'
+        self.base_path = ''
+        self.reference_data_path = ''
+        self.hardware_setup = None
+        self.calibration_step = 1
+        self.scan_count = 0
+        self.pending_scan = None
+        self.fusion = []
+        self.project_path = None
+        return None
+
+    ############################ DISPATCH ############################
+    def _round_trip(self):
+        self.clock.sleep(self.latency.round_trip)
+
+    def _respond(self, request):
+        request_id = request.get('id') if isinstance(request, dict) else None
+        method = request.get('method') if isinstance(request, dict) else None
+        handler = self.methods.get(method)
+        if handler is None:
+            return ScanSoftwareServer._error(request_id, METHOD_NOT_FOUND, f'Method not found: {method}')
+        self.clock.sleep(self.latency.sample(method, len(self.fusion)))
+        if self.failure_model.fails(method):
+            self.failures[method] += 1
+            logger.debug(f'Injected failure of {method}.')
+            return ScanSoftwareServer._error(request_id, SERVER_ERROR, f'{method} failed (simulated)')
+        params = request.get('params') or []
+        try:
+            result = handler(*params)
+        except TypeError:
+            return ScanSoftwareServer._error(request_id, INVALID_PARAMS, f'Invalid params for {method}: {params}')
+        except RuntimeError as e:
+            return ScanSoftwareServer._error(request_id, SERVER_ERROR, str(e))
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    @staticmethod
+    def _error(request_id, code, message):
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+    ########################### ARTIFACTS ###########################
+    def _write_zip(self, path, members):
+        self.files.append(path)
+        if not self.artifacts:
+            return path
+        if dirname(path) and not isdir(dirname(path)):
+            os.makedirs(dirname(path))
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+            for name, data in members.items():
+                z.writestr(name, data)
+        return path
+
+    # calibration.log in the layout Poses.from_file() reads poses back from
+    def _calibration_log(self):
+        root = ET.Element('calibration', target=self.target_type)
+        multiview = ET.SubElement(root, 'multiView')
+        for view in self.views:
+            pose = view['pose']
+            plate = ET.SubElement(multiview, 'world_T_plate', name=str(view['name']))
+            ET.SubElement(plate, 'rotation', {a: str(pose.get(a, 0.0)) for a in ('rx', 'ry', 'rz')})
+            ET.SubElement(plate, 'translation', {a: str(pose.get(a, 0.0)) for a in ('x', 'y', 'z')})
+        return ET.tostring(root)
+
+    def _views_json(self):
+        return json.dumps(self.views, indent=2)
+
+    def _project_json(self):
+        return json.dumps({
+            'scans': self.fusion,
+            'reference_data_path': self.reference_data_path,
+            'hardware_setup': self.hardware_setup,
+        }, indent=2)
+
+    ############################ METHODS ############################
+    def add_calibration_view(self, name=None):
+        pose = self.pose_source() if self.pose_source is not None else {}
+        pose = {'rx': pose.get('x_rot', 0.0), 'ry': pose.get('y_rot', 0.0), 'rz': pose.get('z_rot', 0.0),
+                'x': pose.get('x_lin', 0.0), 'y': pose.get('y_lin', 0.0), 'z': pose.get('z_lin', 0.0)}
+        name = name if name is not None else f'view{len(self.views) + 1}'
+        self.views.append({'name': name, 'target_type': self.target_type, 'pose': pose})
+        return True
+
+    def calibrate(self, zip_path):
+        if not self.views:
+            raise RuntimeError('No calibration views to calibrate with.')
+        self._write_zip(zip_path, {
+            'calibration.log': self._calibration_log(),
+            'views.json': self._views_json(),
+        })
+        return True
+
+    def clear_project(self):
+        self.fusion = []
+        self.pending_scan = None
+        self.project_path = None
+        return True
+
+    def delete_calibration_views(self):
+        self.views = []
+        return True
+
+    def export_calibration_views(self, zip_path):
+        self._write_zip(zip_path, {'views.json': self._views_json()})
+        return True
+
+    def import_hardware_setup(self, path):
+        if not path:
+            raise RuntimeError('No hardware setup file given.')
+        self.hardware_setup = path
+        return True
+
+    def save_project(self):
+        if self.project_path is None:
+            raise RuntimeError('Project has no path, use SaveProjectAs first.')
+        self._write_zip(self.project_path, {'project.json': self._project_json()})
+        return True
+
+    def save_project_as(self, path):
+        self.project_path = path
+        return self.save_project()
+
+    def add_scan_to_fusion(self):
+        if self.pending_scan is None:
+            raise RuntimeError('No captured scan to add to fusion.')
+        self.fusion.append(self.pending_scan)
+        self.pending_scan = None
+        self.tab = 'Alignment'
+        return True
+
+    def start_scan(self):
+        if self.tab != 'Scanning':
+            raise RuntimeError(f'Cannot start a scan on the {self.tab} tab.')
+        self.scan_count += 1
+        self.pending_scan = {
+            'name': f'{self.base_scan_name}{self.scan_count}',
+            'base_path': self.base_path,
+            'reference_data_path': self.reference_data_path,
+        }
+        return True
+
+    def set_base_scan_name(self, name):
+        self.base_scan_name = name
+        return True
+
+    def set_target_type(self, target_type):
+        if target_type not in ('FlatPlate', 'Artefact'):
+            raise RuntimeError(f'Unknown calibration target type {target_type}.')
+        self.target_type = target_type
+        return True
+
+    def set_base_path(self, path):
+        self.base_path = path
+        return True
+
+    def set_reference_data_path(self, path):
+        if path and self.artifacts and not isfile(path):
+            raise RuntimeError(f'Reference data file {path} does not exist.')
+        self.reference_data_path = path
+        return True
+
+    def start_calibration(self):
+        self.tab = 'Calibration'
+        self.calibration_step = 1
+        return True
+
+    def step_forwards(self):
+        self.calibration_step += 1
+        return True
+
+    def switch_tab(self, tab):
+        if tab not in ScanSoftwareServer.TABS:
+            raise RuntimeError(f'Unknown navigation tab {tab}.')
+        self.tab = tab
+        return True
+
+    ############################ HARNESS ############################
+    def serve(self, reader, writer, echo=None):
+        """
+        answer requests read from 'reader' on 'writer' until the reader
+        closes. other lines are copied to 'echo' if given.
+        """
+        for line in reader:
+            response = self.handle_line(line)
+            if response is None:
+                if echo is not None:
+                    echo.write(line)
+                    echo.flush()
+                continue
+            writer.write(response)
+            writer.flush()
+        return None
+
+    def run_script(self, argv):
+        """
+        launch a python script the way the gui does, with its stdin and
+        stdout connected to this server. returns the script's exit code.
+        """
+        process = subprocess.Popen(
+            [sys.executable] + list(argv), stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, text=True, bufsize=1)
+        try:
+            self.serve(process.stdout, process.stdin, sys.stdout)
+        finally:
+            process.stdin.close()
+        return process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run a script against a stand-in for the 3D Scan gui json rpc interface.')
+    parser.add_argument('--latency-scale', type=float, default=1.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--no-artifacts', action='store_true', help="don't write zips and projects")
+    parser.add_argument('script', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    server = ScanSoftwareServer(
+        latency=LatencyModel(scale=args.latency_scale, jitter=args.jitter, seed=args.seed),
+        failures=FailureModel(args.failure_rate, args.seed),
+        artifacts=not args.no_artifacts)
+    code = server.run_script(args.script)
+    logger.info(f'calls {dict(server.calls)}, failures {dict(server.failures)}')
+    print(f'calls: {dict(server.calls)}\nfailures: {dict(server.failures)}\nfiles: {server.files}')
+    return code
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+"""
+Client side mirror of the 3D Scan gui settings that scripts set.
+
+Setting the tab, calibration target type, base scan name, basepath
+evaluation export path or scan reference data path to the value it
+already has doesn't change anything in the gui. UIState remembers what
+was last set successfully so UI_Scripting can skip those requests. Any
+failed request, and requests known to change gui state themselves,
+make the mirror forget what it knew.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UIState():
+    """
+    The gui state as far as it is known from successful requests.
+
+    Attributes
+    ----------
+    known : dict
+        {setting: value} of the settings known, e.g. {'tab': 'Scanning'}.
+    skipped : int
+        requests skipped because they would not change anything.
+    enabled : bool
+        False sends every request, as before.
+    """
+    # json rpc methods that set one setting to their parameter
+    SETTERS = {
+        'ChangeNavigationTab': 'tab',
+        'SetCalibrationTargetType': 'target_type',
+        'SetBaseScanName': 'scan_name',
+        'SetExportBasePathEvaluationResult': 'base_path',
+        'SetScanReferenceDataPath': 'reference_path',
+    }
+    # methods that change settings on their own: {method: {setting: new
+    # value, or None if it is unknown afterwards}}, None for all of them
+    EFFECTS = {
+        'ScanAddToFusion': {'tab': 'Alignment'},
+        'StartCalibration': {'tab': None},
+        'FlatPlateCalibrationStepForwards': {'tab': None},
+        'CalibrateUsingFlatPlateTarget': {'tab': None},
+        'ClearProject': None,
+        'ImportHardwareSetup': None,
+    }
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.known = {}
+        self.skipped = 0
+
+    def get(self, setting, default=None):
+        return self.known.get(setting, default)
+
+    def redundant(self, method, params=None):
+        """
+        True if 'method' would set a setting to the value it already has.
+        counts the request as skipped.
+        """
+        setting = UIState.SETTERS.get(method)
+        if not self.enabled or setting is None or setting not in self.known:
+            return False
+        if self.known[setting] != params:
+            return False
+        self.skipped += 1
+        logger.debug(f'Skipping {method}({params}), {setting} is already set.')
+        return True
+
+    def succeeded(self, method, params=None):
+        """
+        update the mirror after a successful request.
+        """
+        setting = UIState.SETTERS.get(method)
+        if setting is not None:
+            self.known[setting] = params
+        elif method in UIState.EFFECTS:
+            effects = UIState.EFFECTS[method]
+            if effects is None:
+                self.invalidate()
+            for setting, value in (effects or {}).items():
+                if value is None:
+                    self.known.pop(setting, None)
+                else:
+                    self.known[setting] = value
+
+    def failed(self, method, params=None):
+        """
+        forget everything after a failed request, the gui may be in any
+        state.
+        """
+        if self.known:
+            logger.debug(f'{method} failed, forgetting the gui state.')
+        self.invalidate()
+
+    def invalidate(self, setting=None):
+        """
+        forget 'setting', or all of them.
+        """
+        if setting is None:
+            self.known.clear()
+        else:
+            self.known.pop(setting, None)
@@ -13,6 +13,7 @@ setup(
     description='for controlling zaber-motion devices',
     author='marco pantoja',
     python_requires='>3.8',
-    install_requires=['zaber-motion','pythonnet','pyserial','pyautogui'],
-    packages=find_packages('.')
+    install_requires=['zaber-motion','pythonnet','pyserial','pyautogui','numpy'],
+    packages=find_packages('.'),
+    package_data={'py_drive_api': ['include/*.csv']}
     )
@@ -0,0 +1,51 @@
+"""
+Decoding and encoding of Modbus holding register data.
+"""
+import pytest
+
+from py_drive_api.oriental_motor.registers import decode, decode_value, encode
+
+
+@pytest.mark.parametrize('data, signed, unsigned', [
+    ('0000', 0, 0),
+    ('7fff', 32767, 32767),
+    ('8000', -32768, 32768),
+    ('ffff', -1, 65535),
+])
+def test_decode_value_16_bit(data, signed, unsigned):
+    assert decode_value(bytes.fromhex(data)) == signed
+    assert decode_value(bytes.fromhex(data), signed=False) == unsigned
+
+
+@pytest.mark.parametrize('data, signed, unsigned', [
+    ('00000000', 0, 0),
+    ('00007fff', 32767, 32767),
+    ('00008000', 32768, 32768),
+    ('0000ffff', 65535, 65535),
+    ('7fffffff', 2**31 - 1, 2**31 - 1),
+    ('80000000', -2**31, 2**31),
+    ('ffffffff', -1, 2**32 - 1),
+])
+def test_decode_value_32_bit(data, signed, unsigned):
+    # upper word first
+    assert decode_value(bytes.fromhex(data)) == signed
+    assert decode_value(bytes.fromhex(data), signed=False) == unsigned
+
+
+@pytest.mark.parametrize('size', [0, 1, 3, 6, 8])
+def test_decode_value_rejects_other_sizes(size):
+    with pytest.raises(ValueError):
+        decode_value(bytes(size))
+
+
+def test_decode_array():
+    data = bytes.fromhex('00000001ffffffff80000000')
+    assert list(decode(data)) == [1, -1, -2**31]
+    assert list(decode(data, 16, False)) == [0, 1, 65535, 65535, 32768, 0]
+    assert list(decode(data + b'\x00')) == [1, -1, -2**31] # partial value ignored
+
+
+def test_encode_round_trip():
+    values = [0, 1, -1, 2**31 - 1, -2**31]
+    assert encode(values) == bytes.fromhex('0000000000000001ffffffff7fffffff80000000')
+    assert list(decode(encode(values))) == values